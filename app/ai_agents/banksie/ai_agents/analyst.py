@@ -1,26 +1,36 @@
 from datetime import datetime
+from typing import Optional
 from agents import Agent
+from openai import AsyncOpenAI
 from pathlib import Path
 
+from ai_agents.utils.llm_client import build_model
 from ai_agents.utils.state import StateContext
+from ai_agents.banksie.tools.get_insights import get_insights
+from ai_agents.banksie.tools.get_report import get_report
 from ai_agents.banksie.tools.perform_analysis import perform_analysis
+from ai_agents.banksie.tools.search_knowledge import search_knowledge
 
 
-def analyst_agent() -> Agent:
+def analyst_agent(model: str = "gpt-4.1", openai_client: Optional[AsyncOpenAI] = None) -> Agent:
     """
     The analyst agent can access the user's transaction data using its tools and perform analysis on it.
+    
+    Args:
+        model: Model to run the agent on (chosen per prompt by the router)
+        openai_client: Shared, pooled client to send the model requests through
     """
     # Load the sys_msg from the md file
     sys_msg = Path("ai_agents/banksie/ai_agents/system_message/analyst.md").read_text(encoding="utf-8")
     sys_msg = sys_msg.replace("{datetime}", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
     
-    # Create the agent using gpt-4.1
+    # Create the agent on the routed model
     agent = Agent[StateContext](
         name="analyst Agent",
         instructions=sys_msg,
-        model="gpt-4.1",
+        model=build_model(model, openai_client),
         tool_use_behavior="run_llm_again",
-        tools=[perform_analysis],
+        tools=[get_report, get_insights, search_knowledge, perform_analysis],
         handoffs=[],
     )
     
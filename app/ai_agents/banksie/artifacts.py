@@ -0,0 +1,87 @@
+import json
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+# Rows beyond this are dropped from an artifact (the summary still reports the full size)
+MAX_ARTIFACT_ROWS = 1000
+# Rows of the table included in the summary the model narrates from
+SUMMARY_PREVIEW_ROWS = 3
+
+
+def table_artifact(artifact_id: str, df: pd.DataFrame, title: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build a JSON-safe table artifact from a DataFrame.
+
+    Args:
+        artifact_id: Reference the model uses to mention the artifact
+        df: Table to show the user
+        title: Optional caption
+
+    Returns:
+        Dict with id, kind, title, columns, rows, total_rows and truncated
+    """
+    df = df.reset_index() if not isinstance(df.index, pd.RangeIndex) else df
+    # to_json handles numpy scalars, NaN and timestamps; round-trip it into plain Python values
+    payload = json.loads(df.head(MAX_ARTIFACT_ROWS).to_json(orient="split", index=False, date_format="iso"))
+    return {
+        "id": artifact_id,
+        "kind": "table",
+        "title": title,
+        "columns": [str(column) for column in payload["columns"]],
+        "rows": payload["data"],
+        "total_rows": len(df),
+        "truncated": len(df) > MAX_ARTIFACT_ROWS,
+    }
+
+
+def series_artifact(artifact_id: str, series: pd.Series, title: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build a JSON-safe series artifact (index/value pairs) from a Series.
+
+    Args:
+        artifact_id: Reference the model uses to mention the artifact
+        series: Series to show the user
+        title: Optional caption
+
+    Returns:
+        Dict with id, kind, title, name, index, values, total_rows and truncated
+    """
+    head = series.head(MAX_ARTIFACT_ROWS)
+    payload = json.loads(head.to_json(orient="split", date_format="iso"))
+    return {
+        "id": artifact_id,
+        "kind": "series",
+        "title": title,
+        "name": str(series.name) if series.name is not None else "value",
+        "index": [str(label) for label in payload["index"]],
+        "values": payload["data"],
+        "total_rows": len(series),
+        "truncated": len(series) > MAX_ARTIFACT_ROWS,
+    }
+
+
+def summarize_artifact(artifact: Dict[str, Any], data: Any) -> str:
+    """
+    Describe an artifact compactly for the model: its reference, shape, numeric ranges and a short preview.
+
+    Args:
+        artifact: Artifact built by `table_artifact` or `series_artifact`
+        data: The DataFrame or Series the artifact was built from
+
+    Returns:
+        Multi-line summary string
+    """
+    title = f" '{artifact['title']}'" if artifact.get("title") else ""
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+
+    lines = [
+        f"[artifact:{artifact['id']}] {artifact['kind']}{title} shown to the user: "
+        f"{artifact['total_rows']} rows x {len(frame.columns)} columns ({', '.join(map(str, frame.columns))})"
+    ]
+    numeric = frame.select_dtypes(include="number")
+    for column in numeric.columns:
+        values = numeric[column]
+        lines.append(f"  {column}: min={values.min()}, max={values.max()}, sum={values.sum()}")
+    lines.append(frame.head(SUMMARY_PREVIEW_ROWS).to_string(max_colwidth=40))
+    return "\n".join(lines)
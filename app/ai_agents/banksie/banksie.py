@@ -1,8 +1,14 @@
+from typing import Optional
+
 from agents import Agent, Runner
 from ai_agents.banksie.ai_agents.analyst import analyst_agent
+from ai_agents.banksie.budget import MAX_STEPS, start_budget
 from ai_agents.banksie.hooks import BanksieRunHook
+from ai_agents.banksie.routing import classify_prompt, model_cost
 from ai_agents.utils.log import get_logger
 from ai_agents.utils.state import StateContext
+from ai_agents.utils.trace_store import RunTrace, current_trace
+from openai import AsyncOpenAI
 
 # Get configured logger for Banksie
 logger = get_logger("banksie")
@@ -12,21 +18,48 @@ class BanksieAgent(Agent):
     The BanksieAgent is a specialized agent to help the user with business banking needs.
     """
 
-    def __init__(self):
+    def __init__(self, openai_client: Optional[AsyncOpenAI] = None):
         super().__init__(name="banksie")
         self.logger = logger  # Use the configured logger
+        # Shared, pooled client created at startup (None uses the SDK default client)
+        self.openai_client = openai_client
         
     async def run(self, state_context: StateContext, prompt: str):
         output = None
         
         try:
-            self.logger.info(f"[Banksie] Received prompt: {prompt}")
+            # Prompts can be long and sensitive; only the full text is logged at DEBUG
+            self.logger.info(f"[Banksie] Received prompt ({len(prompt)} chars)", extra={"prompt_chars": len(prompt)})
+            self.logger.debug(f"[Banksie] Prompt: {prompt}")
+            
+            # Route the prompt to a model tier
+            decision = classify_prompt(prompt)
+            state_context.model_tier = decision.tier.name
+            self.logger.info(
+                f"[Banksie] Routed to {decision.tier.name} ({decision.tier.model}): {'; '.join(decision.reasons)}",
+                extra={"tier": decision.tier.name, "model": decision.tier.model},
+            )
+            
+            # Spans for the trace store; the chat endpoint links them to the saved message
+            state_context.trace = RunTrace(
+                model=decision.tier.model,
+                user_id=state_context.user_id,
+                model_tier=decision.tier.name,
+                prompt_type=decision.prompt_type,
+                cost=model_cost,
+            )
+            current_trace.set(state_context.trace)
+            
+            # Deadline and step budget, enforced by the run hook; max_turns is the backstop
+            start_budget(state_context)
+            
             # Agents SDK flow
             output = Runner.run_streamed(
-                    analyst_agent(),
+                    analyst_agent(model=decision.tier.model, openai_client=self.openai_client),
                     context=state_context,
                     input=prompt,
-                    hooks=BanksieRunHook(),
+                    hooks=BanksieRunHook(openai_client=self.openai_client),
+                    max_turns=MAX_STEPS + 2,
                 )
             
             return output
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import time
+from dataclasses import replace
+from typing import AsyncIterator, Optional
+
+from agents import Agent, RunResultStreaming, StreamEvent
+from ai_agents.utils import metrics
+from ai_agents.utils.log import get_logger
+from ai_agents.utils.state import StateContext
+
+logger = get_logger("banksie.budget")
+
+# Wall-clock budget for one agent run, from prompt to final answer
+RUN_TIMEOUT_SECONDS = float(os.getenv("BANKSIE_RUN_TIMEOUT_SECONDS", "90"))
+# Maximum number of tool calls in one run
+MAX_STEPS = int(os.getenv("BANKSIE_MAX_STEPS", "6"))
+# Time kept back from tools so the model can still write an answer before the deadline
+ANSWER_RESERVE_SECONDS = float(os.getenv("BANKSIE_ANSWER_RESERVE_SECONDS", "10"))
+# Bounds on the analysis code timeout
+MIN_EXEC_TIMEOUT_SECONDS = 1.0
+MAX_EXEC_TIMEOUT_SECONDS = float(os.getenv("BANKSIE_MAX_EXEC_TIMEOUT_SECONDS", "30"))
+
+# Appended to a streamed answer that was cut off at the deadline or turn limit
+INCOMPLETE_ANSWER_NOTE = "\n\n_Stopped early: this question hit its time or step limit, so the answer may be incomplete._"
+
+BUDGET_EXHAUSTED_MESSAGE = (
+    "Budget exhausted: no more tool calls are allowed for this question. "
+    "Answer now with the results you already have and briefly say what could not be completed."
+)
+
+
+def start_budget(
+    state: StateContext, timeout_seconds: float = RUN_TIMEOUT_SECONDS, max_steps: int = MAX_STEPS
+) -> None:
+    """
+    Set the run's deadline and step budget on its state context.
+
+    Args:
+        state: Run state context
+        timeout_seconds: Wall-clock budget for the run
+        max_steps: Maximum number of tool calls
+    """
+    state.deadline = time.monotonic() + timeout_seconds
+    state.max_steps = max_steps
+    state.step = 0
+
+
+def remaining_seconds(state: StateContext) -> Optional[float]:
+    """Seconds left before the run's deadline, or None if the run has no deadline."""
+    if state.deadline is None:
+        return None
+    return state.deadline - time.monotonic()
+
+
+def exhaustion_reason(state: StateContext) -> Optional[str]:
+    """
+    Check the run's budget.
+
+    Returns:
+        "steps" or "deadline" when the budget is used up, otherwise None
+    """
+    if state.max_steps and state.step > state.max_steps:
+        return "steps"
+    remaining = remaining_seconds(state)
+    if remaining is not None and remaining <= ANSWER_RESERVE_SECONDS:
+        return "deadline"
+    return None
+
+
+def exhaust_budget(state: StateContext, agent: Agent, reason: str) -> None:
+    """
+    Mark the budget as exhausted and stop the agent from calling more tools.
+
+    The next model turn runs with `tool_choice="none"`, so the model has to answer with what it has.
+
+    Args:
+        state: Run state context
+        agent: Agent being run
+        reason: "steps", "deadline" or "stream_deadline"
+    """
+    if state.budget_exhausted:
+        return
+    state.budget_exhausted = reason
+    agent.model_settings = replace(agent.model_settings, tool_choice="none")
+    agent.reset_tool_choice = False
+    metrics.increment("banksie.budget_exhausted", reason=reason, tier=state.model_tier)
+    logger.warning(f"Run budget exhausted ({reason}) after {state.step} tool calls", extra={"reason": reason})
+
+
+def exec_timeout(state: StateContext) -> float:
+    """
+    Timeout for the analysis code: what is left of the run budget minus the answer reserve.
+
+    Returns:
+        Seconds, between MIN_EXEC_TIMEOUT_SECONDS and MAX_EXEC_TIMEOUT_SECONDS
+    """
+    remaining = remaining_seconds(state)
+    if remaining is None:
+        return MAX_EXEC_TIMEOUT_SECONDS
+    return min(MAX_EXEC_TIMEOUT_SECONDS, max(MIN_EXEC_TIMEOUT_SECONDS, remaining - ANSWER_RESERVE_SECONDS))
+
+
+async def events_until_deadline(result: RunResultStreaming, state: StateContext) -> AsyncIterator[StreamEvent]:
+    """
+    Stream a run's events, cancelling the run if no event arrives before its deadline.
+
+    Args:
+        result: Streamed run result
+        state: Run state context carrying the deadline
+
+    Yields:
+        Stream events until the run completes or the deadline passes
+    """
+    events = result.stream_events().__aiter__()
+    while True:
+        remaining = remaining_seconds(state)
+        next_event = asyncio.ensure_future(events.__anext__())
+        done, _ = await asyncio.wait({next_event}, timeout=None if remaining is None else max(remaining, 0))
+        if not done:
+            # The stream ends itself on cancellation; retrieve its outcome so it is not logged as unhandled
+            next_event.add_done_callback(lambda task: task.cancelled() or task.exception())
+            next_event.cancel()
+            result.cancel()
+            exhaust_budget(state, result.current_agent, "stream_deadline")
+            return
+        try:
+            event = next_event.result()
+        except StopAsyncIteration:
+            return
+        yield event
@@ -0,0 +1,481 @@
+import ast
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+import pandas as pd
+
+from ai_agents.utils import metrics
+from ai_agents.utils.log import get_logger
+
+logger = get_logger("banksie.code_rewriter")
+
+# Names the preloaded transaction rows are available under in the analysis namespace
+DATA_NAMES = {"transaction_data", "data"}
+# Global injected next to the rows: returns a copy of one cached DataFrame built from them
+FRAME_HELPER = "_transaction_frame"
+# Imports already satisfied by the analysis namespace: module -> global it is loaded as
+MODULE_GLOBALS = {"pandas": "pd", "numpy": "np"}
+# Preloaded `datetime` module classes
+DATETIME_NAMES = {"datetime", "date", "timedelta"}
+# datetime attributes and no-argument methods with a `.dt` accessor equivalent
+DATE_ATTRIBUTES = {"year", "month", "day", "hour", "minute", "second"}
+DATE_METHODS = {"weekday", "date"}
+# Stand-in for missing values in rewritten strptime parses, so they still fail like strptime(None)
+MISSING_DATE = "<missing>"
+# Operators a per-value lambda may use and still be applied to a whole column at once
+VECTOR_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod)
+# Python raises ZeroDivisionError where pandas returns inf/NaN, so these need a non-zero constant divisor
+DIVISION_BINOPS = (ast.Div, ast.FloorDiv, ast.Mod)
+VECTOR_COMPARES = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+HINTS = {
+    "row_loop": "line {line}: `for ... in {name}` runs Python once per transaction; build "
+                "`df = pd.DataFrame({name})` once and use boolean filters, `groupby` or `sql(...)` instead",
+    "iterrows": "line {line}: `.{name}()` runs Python once per row; use column expressions "
+                "(e.g. `df['amount_cents'] * 2`), `np.where` or `groupby(...).agg(...)`",
+    "row_apply": "line {line}: `apply(..., axis=1)` runs Python once per row; combine columns directly "
+                 "(`df['a'] - df['b']`) and use `np.where(condition, a, b)` for conditionals",
+    "value_apply": "line {line}: `.{name}(lambda ...)` runs Python once per value; prefer vectorized operators, "
+                   "the `.str` / `.dt` accessors, `pd.to_datetime` or `np.where`",
+    "concat_in_loop": "line {line}: `{name}` inside a loop copies the data every iteration; collect the pieces "
+                      "in a list and combine them once after the loop",
+    "repeated_frame": "line {line}: `pd.DataFrame({name})` is built more than once; build it once and reuse it",
+    "import": "line {line}: `{name}` cannot be imported; only the preloaded names (pd, np, datetime, date, "
+              "timedelta and the helpers) are available",
+}
+
+
+@dataclass
+class RewriteResult:
+    # Code to execute (the input unchanged if it could not be parsed)
+    code: str
+    # Rule name of every rewrite applied, one entry per rewritten site
+    rewrites: List[str] = field(default_factory=list)
+    # Import statements dropped or replaced (the preloaded modules cannot be imported)
+    imports_rewritten: int = 0
+    # Hint kinds and messages for slow idioms that were left as they are
+    hint_kinds: List[str] = field(default_factory=list)
+    hints: List[str] = field(default_factory=list)
+    parsed: bool = True
+
+
+class FrameCache:
+    """
+    The `_transaction_frame()` helper: builds `pd.DataFrame(rows)` on first use and returns a
+    copy on every call, so code that modifies one frame never sees it in another. Copying a
+    frame is far cheaper than rebuilding it from a list of dicts; the saving is measured.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.frame: Optional[pd.DataFrame] = None
+        self.calls = 0
+        self.build_ms = 0.0
+        self.copy_ms = 0.0
+
+    def __call__(self) -> pd.DataFrame:
+        self.calls += 1
+        if self.frame is None:
+            started = time.perf_counter()
+            self.frame = pd.DataFrame(self.rows)
+            self.build_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        frame = self.frame.copy()
+        self.copy_ms += (time.perf_counter() - started) * 1000
+        return frame
+
+    def saved_ms(self) -> float:
+        # Every call would have built the frame; the cache built it once and copied it each time
+        return self.build_ms * (self.calls - 1) - self.copy_ms
+
+
+def _is_name(node: ast.AST, names) -> bool:
+    return isinstance(node, ast.Name) and node.id in names
+
+
+def _is_pd_call(node: ast.AST, function: str) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == function
+        and _is_name(node.func.value, {"pd"})
+    )
+
+
+def _bound_names(tree: ast.AST) -> Set[str]:
+    # Every name the code assigns, deletes or binds as a parameter
+    bound = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            bound.add(node.id)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.alias):
+            bound.add((node.asname or node.name).split(".")[0])
+    return bound
+
+
+def _parents(tree: ast.AST) -> Dict[ast.AST, ast.AST]:
+    parents = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+    return parents
+
+
+def _in_repeated_scope(node: ast.AST, parents: Dict[ast.AST, ast.AST]) -> bool:
+    # True when the node can run more than once: inside a loop, comprehension, lambda or function
+    repeated = (ast.For, ast.While, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp,
+                ast.Lambda, ast.FunctionDef, ast.AsyncFunctionDef)
+    while node in parents:
+        node = parents[node]
+        if isinstance(node, repeated):
+            return True
+    return False
+
+
+class _ImportRewriter(ast.NodeTransformer):
+    """Drops imports of preloaded names and turns other pandas/numpy imports into assignments."""
+
+    def __init__(self, result: RewriteResult):
+        self.result = result
+        self.unsupported: List[ast.AST] = []
+
+    def _assign(self, target: str, value: str, attribute: Optional[str] = None) -> ast.Assign:
+        expression = ast.Name(value, ast.Load())
+        if attribute:
+            expression = ast.Attribute(expression, attribute, ast.Load())
+        return ast.Assign(targets=[ast.Name(target, ast.Store())], value=expression, lineno=0)
+
+    def visit_Import(self, node: ast.Import):
+        replacement, kept = [], []
+        for alias in node.names:
+            module_global = MODULE_GLOBALS.get(alias.name)
+            if module_global is None:
+                kept.append(alias)
+                continue
+            if (alias.asname or alias.name) != module_global:
+                replacement.append(self._assign(alias.asname or alias.name, module_global))
+            self.result.imports_rewritten += 1
+        if kept:
+            node.names = kept
+            self.unsupported.append(node)
+            replacement.append(node)
+        return replacement
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        module_global = MODULE_GLOBALS.get(node.module or "")
+        replacement, kept = [], []
+        for alias in node.names:
+            if module_global and alias.name != "*":
+                replacement.append(self._assign(alias.asname or alias.name, module_global, alias.name))
+            elif not (
+                module_global
+                or (node.module == "datetime" and alias.name in DATETIME_NAMES and alias.asname in (None, alias.name))
+            ):
+                kept.append(alias)
+                continue
+            self.result.imports_rewritten += 1
+        if kept:
+            node.names = kept
+            self.unsupported.append(node)
+            replacement.append(node)
+        return replacement
+
+
+class _VectorizeRewriter(ast.NodeTransformer):
+    """
+    Rewrites per-value and per-row lambdas whose vectorized form gives the same result:
+
+    - `s.apply(lambda x: datetime.strptime(x, fmt))` -> `pd.to_datetime(s.fillna(MISSING_DATE).astype(str),
+      format=fmt)` (so a missing value still raises instead of becoming NaT) and
+      `s.apply(lambda x: pd.to_datetime(x))` -> `pd.to_datetime(s)`, including a trailing `.year` / `.month` / ... / `.strftime(...)` / `.weekday()` via
+      the `.dt` accessor (same values; date parts come back as int32 like every `.dt` field)
+    - `s.apply(lambda x: x * 100)` and other arithmetic/comparisons of the value -> `(s * 100)`; division
+      only by a non-zero constant
+    - `df.apply(lambda row: row['a'] - row['b'], axis=1)` -> `(df['a'] - df['b'])`
+    """
+
+    def __init__(self, result: RewriteResult, bound: Set[str]):
+        self.result = result
+        self.bound = bound
+
+    @staticmethod
+    def _single_arg_lambda(node: ast.AST) -> Optional[str]:
+        if not isinstance(node, ast.Lambda):
+            return None
+        args = node.args
+        if args.posonlyargs or args.vararg or args.kwonlyargs or args.kwarg or args.defaults or len(args.args) != 1:
+            return None
+        return args.args[0].arg
+
+    def _date_parse(self, node: ast.AST, arg: str, series: ast.AST) -> Optional[ast.AST]:
+        # datetime.strptime(x, "fmt") or pd.to_datetime(x[, format="fmt"]) -> pd.to_datetime(series, format=...)
+        if not isinstance(node, ast.Call) or not node.args or not _is_name(node.args[0], {arg}):
+            return None
+        keywords = []
+        if (
+            isinstance(node.func, ast.Attribute)
+            and node.func.attr == "strptime"
+            and _is_name(node.func.value, {"datetime"})
+            and not self.bound & {"datetime", "str"}
+            and len(node.args) == 2
+            and not node.keywords
+            and isinstance(node.args[1], ast.Constant)
+            and isinstance(node.args[1].value, str)
+        ):
+            keywords = [ast.keyword("format", node.args[1])]
+            # pandas turns missing values into NaT where strptime raises, so fill them with a value that fails to parse
+            series = ast.Call(ast.Attribute(series, "fillna", ast.Load()), [ast.Constant(MISSING_DATE)], [])
+            series = ast.Call(ast.Attribute(series, "astype", ast.Load()), [ast.Name("str", ast.Load())], [])
+        elif _is_pd_call(node, "to_datetime") and len(node.args) == 1 and all(
+            keyword.arg == "format" and isinstance(keyword.value, ast.Constant) for keyword in node.keywords
+        ):
+            keywords = node.keywords
+        else:
+            return None
+        return ast.Call(ast.Attribute(ast.Name("pd", ast.Load()), "to_datetime", ast.Load()), [series], keywords)
+
+    def _date_expression(self, node: ast.AST, arg: str, series: ast.AST) -> Optional[ast.AST]:
+        if "pd" in self.bound:
+            return None
+        parsed = self._date_parse(node, arg, series)
+        if parsed is not None:
+            return parsed
+        # <parse>.year etc.
+        if isinstance(node, ast.Attribute) and node.attr in DATE_ATTRIBUTES:
+            parsed = self._date_parse(node.value, arg, series)
+            if parsed is not None:
+                return ast.Attribute(ast.Attribute(parsed, "dt", ast.Load()), node.attr, ast.Load())
+        # <parse>.strftime("fmt") and <parse>.weekday() / .date()
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and not node.keywords:
+            parsed = self._date_parse(node.func.value, arg, series)
+            if parsed is None:
+                return None
+            accessor = ast.Attribute(parsed, "dt", ast.Load())
+            if node.func.attr == "strftime" and len(node.args) == 1 and isinstance(node.args[0], ast.Constant):
+                return ast.Call(ast.Attribute(accessor, "strftime", ast.Load()), node.args, [])
+            if node.func.attr in DATE_METHODS and not node.args:
+                return ast.Attribute(accessor, node.func.attr, ast.Load())
+        return None
+
+    def _arithmetic(self, node: ast.AST, substitute, strings: bool = False) -> Optional[ast.AST]:
+        # Rebuild an arithmetic/comparison expression with the lambda's value replaced by a column;
+        # None if the expression uses anything else (calls, names, attributes, conditionals).
+        # String constants are only allowed as the other side of == / !=
+        if isinstance(node, ast.Constant) and not isinstance(node.value, bool) and (
+            isinstance(node.value, (int, float)) or (strings and isinstance(node.value, str))
+        ):
+            return node
+        replaced = substitute(node)
+        if replaced is not None:
+            return replaced
+        if isinstance(node, ast.BinOp) and isinstance(node.op, VECTOR_BINOPS):
+            if isinstance(node.op, DIVISION_BINOPS) and not (
+                isinstance(node.right, ast.Constant)
+                and isinstance(node.right.value, (int, float))
+                and not isinstance(node.right.value, bool)
+                and node.right.value != 0
+            ):
+                return None
+            left, right = self._arithmetic(node.left, substitute), self._arithmetic(node.right, substitute)
+            return ast.BinOp(left, node.op, right) if left is not None and right is not None else None
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = self._arithmetic(node.operand, substitute)
+            return ast.UnaryOp(node.op, operand) if operand is not None else None
+        if isinstance(node, ast.Compare) and len(node.ops) == 1 and isinstance(node.ops[0], VECTOR_COMPARES):
+            equality = isinstance(node.ops[0], (ast.Eq, ast.NotEq))
+            left = self._arithmetic(node.left, substitute, equality)
+            right = self._arithmetic(node.comparators[0], substitute, equality)
+            return ast.Compare(left, node.ops, [right]) if left is not None and right is not None else None
+        if isinstance(node, ast.Call) and _is_name(node.func, {"abs"}) and len(node.args) == 1 and not node.keywords:
+            operand = self._arithmetic(node.args[0], substitute)
+            return ast.Call(ast.Attribute(operand, "abs", ast.Load()), [], []) if operand is not None else None
+        return None
+
+    @staticmethod
+    def _uses(node: ast.AST, arg: str) -> bool:
+        return any(_is_name(child, {arg}) for child in ast.walk(node))
+
+    def visit_Call(self, node: ast.Call):
+        self.generic_visit(node)
+        if not (
+            isinstance(node.func, ast.Attribute)
+            and node.func.attr in ("apply", "map")
+            and len(node.args) == 1
+        ):
+            return node
+        arg = self._single_arg_lambda(node.args[0])
+        if arg is None:
+            return node
+        body = node.args[0].body
+        receiver = node.func.value
+        axis = {keyword.arg: keyword.value for keyword in node.keywords}.get("axis")
+        row_wise = isinstance(axis, ast.Constant) and axis.value in (1, "columns")
+
+        if not node.keywords:
+            # Per-value lambda on a column (`df['col']`), which is a Series
+            if not (isinstance(receiver, ast.Subscript) and isinstance(receiver.slice, ast.Constant)
+                    and isinstance(receiver.slice.value, str)):
+                return node
+            rewritten = self._date_expression(body, arg, receiver)
+            rule = "date_parse"
+            # The column may appear several times in the expression, so only plain `name['col']` is repeated
+            if rewritten is None and self._uses(body, arg) and isinstance(receiver.value, ast.Name):
+                rewritten = self._arithmetic(body, lambda n: receiver if _is_name(n, {arg}) else None)
+                rule = "vectorize_apply"
+        elif row_wise and len(node.keywords) == 1 and isinstance(receiver, ast.Name) and receiver.id not in {arg}:
+            # Row-wise lambda over named columns: row['a'] -> df['a']
+            def column(n: ast.AST) -> Optional[ast.AST]:
+                if (isinstance(n, ast.Subscript) and _is_name(n.value, {arg}) and isinstance(n.slice, ast.Constant)
+                        and isinstance(n.slice.value, str)):
+                    return ast.Subscript(ast.Name(receiver.id, ast.Load()), n.slice, ast.Load())
+                return None
+            rewritten = self._arithmetic(body, column) if self._uses(body, arg) else None
+            if rewritten is not None:
+                # apply(axis=1) returns an unnamed Series; a single-column expression would keep its name
+                rewritten = ast.Call(ast.Attribute(rewritten, "rename", ast.Load()), [ast.Constant(None)], [])
+            rule = "vectorize_row_apply"
+        else:
+            return node
+
+        if rewritten is None:
+            return node
+        self.result.rewrites.append(rule)
+        return rewritten
+
+
+def _cache_frames(tree: ast.Module, result: RewriteResult, bound: Set[str]) -> List[ast.Call]:
+    """
+    Replace `pd.DataFrame(transaction_data)` with the cached-frame helper when it is built more
+    than once and the rows can never change: the row names are never rebound and only ever
+    used as the DataFrame's sole argument. Returns the constructions left as they are.
+    """
+    parents = _parents(tree)
+    constructions, other_uses = [], 0
+    for node in ast.walk(tree):
+        if _is_name(node, DATA_NAMES) and isinstance(node.ctx, ast.Load):
+            parent = parents.get(node)
+            if (_is_pd_call(parent, "DataFrame") and parent.args == [node] and not parent.keywords):
+                constructions.append(parent)
+            else:
+                other_uses += 1
+
+    repeated = len(constructions) > 1 or any(_in_repeated_scope(call, parents) for call in constructions)
+    if not repeated:
+        return []
+    if other_uses or bound & (DATA_NAMES | {"pd", FRAME_HELPER}):
+        return constructions
+
+    for call in constructions:
+        call.func = ast.Name(FRAME_HELPER, ast.Load())
+        call.args = []
+        result.rewrites.append("frame_cache")
+    return []
+
+
+def _collect_hints(tree: ast.Module, result: RewriteResult):
+    parents = _parents(tree)
+
+    def hint(kind: str, node: ast.AST, name: str):
+        if kind in result.hint_kinds:
+            return
+        result.hint_kinds.append(kind)
+        result.hints.append(HINTS[kind].format(line=getattr(node, "lineno", "?"), name=name))
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.For, ast.comprehension)) and _is_name(node.iter, DATA_NAMES):
+            hint("row_loop", node.iter, node.iter.id)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            attr = node.func.attr
+            if attr in ("iterrows", "itertuples"):
+                hint("iterrows", node, attr)
+            elif attr in ("apply", "map", "applymap") and node.args and isinstance(node.args[0], ast.Lambda):
+                axis = {keyword.arg: keyword.value for keyword in node.keywords}.get("axis")
+                if isinstance(axis, ast.Constant) and axis.value in (1, "columns"):
+                    hint("row_apply", node, attr)
+                else:
+                    hint("value_apply", node, attr)
+            elif attr == "concat" and _is_name(node.func.value, {"pd"}) and _in_repeated_scope(node, parents):
+                hint("concat_in_loop", node, "pd.concat")
+
+
+def rewrite_analysis_code(code: str) -> RewriteResult:
+    """
+    Parse generated analysis code and rewrite known slow idioms into equivalent vectorized code.
+
+    Imports of preloaded modules are dropped (or turned into assignments such as `DataFrame = pd.DataFrame`),
+    repeated `pd.DataFrame(transaction_data)` builds share one cached frame, and per-value or
+    per-row lambdas that only do date parsing or arithmetic are applied to whole columns. Slow
+    idioms that cannot be rewritten safely (row loops, `iterrows`, other lambdas) produce hints.
+
+    Args:
+        code: Python code from the model
+
+    Returns:
+        RewriteResult with the code to execute, the rewrites applied and hints for the model
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        # Let the execution report the syntax error
+        return RewriteResult(code=code, parsed=False)
+
+    result = RewriteResult(code=code)
+    try:
+        importer = _ImportRewriter(result)
+        tree = importer.visit(tree)
+        for node in importer.unsupported:
+            names = ", ".join(alias.name for alias in node.names)
+            module = f"from {node.module} import {names}" if isinstance(node, ast.ImportFrom) else f"import {names}"
+            result.hint_kinds.append("import")
+            result.hints.append(HINTS["import"].format(line=node.lineno, name=module))
+
+        bound = _bound_names(tree)
+        vectorizer = _VectorizeRewriter(result, bound)
+        tree = vectorizer.visit(tree)
+        uncached = _cache_frames(tree, result, bound)
+        if uncached:
+            result.hint_kinds.append("repeated_frame")
+            result.hints.append(HINTS["repeated_frame"].format(line=uncached[1 if len(uncached) > 1 else 0].lineno,
+                                                               name=uncached[0].args[0].id))
+        _collect_hints(tree, result)
+        # Hints in line order (each message starts with "line N:")
+        ordered = sorted(zip(result.hints, result.hint_kinds), key=lambda hint: int(hint[0].split(":")[0][5:]))
+        result.hints, result.hint_kinds = [h for h, _ in ordered], [k for _, k in ordered]
+
+        # Blocks emptied by dropped imports need a statement
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Module) and getattr(node, "body", None) == []:
+                node.body = [ast.Pass()]
+        if result.rewrites or result.imports_rewritten:
+            result.code = ast.unparse(ast.fix_missing_locations(tree))
+    except Exception as e:
+        # The rewriter is an optimization; on any failure run the code as written
+        logger.warning(f"Analysis code rewrite failed: {e}")
+        return RewriteResult(code=code, hints=result.hints, hint_kinds=result.hint_kinds)
+    return result
+
+
+def record_rewrite(result: RewriteResult, wall_ms: float, frames: Optional[FrameCache] = None):
+    """
+    Record how often code is rewritten, which rules fire, execution time with and without
+    rewrites, and the measured saving of the frame cache.
+
+    Args:
+        result: Outcome of rewrite_analysis_code
+        wall_ms: Execution wall time of the (rewritten) code
+        frames: The FrameCache the code ran with
+    """
+    rewritten = "yes" if result.rewrites else "no"
+    metrics.increment("analysis.rewrite_runs", rewritten=rewritten)
+    metrics.observe("analysis.exec_ms_by_rewrite", wall_ms, rewritten=rewritten)
+    for rule in result.rewrites:
+        metrics.increment("analysis.rewrites", rule=rule)
+    for kind in result.hint_kinds:
+        metrics.increment("analysis.rewrite_hints", kind=kind)
+    if frames is not None and frames.calls > 1:
+        metrics.observe("analysis.rewrite_saved_ms", frames.saved_ms(), rule="frame_cache")
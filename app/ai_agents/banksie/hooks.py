@@ -1,17 +1,62 @@
 from agents import RunHooks, RunContextWrapper, Agent, Tool
+from ai_agents.banksie.budget import exhaust_budget, exhaustion_reason
+from ai_agents.banksie.routing import escalation_tier
+from ai_agents.utils.llm_client import build_model
+from ai_agents.utils.log import get_logger
 from ai_agents.utils.state import StateContext
-from typing import Any
+from openai import AsyncOpenAI
+from typing import Any, Optional
+
+logger = get_logger("banksie.hooks")
 
 class BanksieRunHook(RunHooks):
     """
     The main hook on the Banksie Agent.
     """
 
+    def __init__(self, openai_client: Optional[AsyncOpenAI] = None):
+        # Client escalated models are bound to, so they share the run's connection pool
+        self.openai_client = openai_client
+
     async def on_tool_start(self, context: RunContextWrapper[StateContext], agent: Agent, tool: Tool) -> None:
         """
-        placeholder for ui updates for what the tool the agent is using and what its doing
+        Count the tool call against the run's step budget and check the deadline.
+        
+        Once the budget is exhausted the tool returns a "budget exhausted" message instead of running.
         """
-        pass
+        state = context.context
+        state.step += 1
+        if state.trace:
+            state.trace.tool_started(tool.name)
+        reason = exhaustion_reason(state)
+        if reason:
+            exhaust_budget(state, agent, reason)
     
     async def on_tool_end(self, context: RunContextWrapper[StateContext], agent: Agent, tool: Tool, result: Any) -> None:
-        pass
\ No newline at end of file
+        """
+        Enforce the run budget and escalate a cheap run to the larger model when its analysis code fails.
+        
+        The runner resolves `agent.model` on every turn, so the retry after the failed
+        tool call is already made by the escalated model.
+        """
+        state = context.context
+        if state.trace:
+            status = "error" if str(result).startswith("Error executing code") else "ok"
+            state.trace.tool_ended(tool.name, step=state.step, status=status)
+        
+        # Check the deadline before the next model turn, so a slow tool cannot start another round
+        reason = exhaustion_reason(state)
+        if reason:
+            exhaust_budget(state, agent, reason)
+            return
+        
+        if not str(result).startswith("Error executing code") or state.escalated:
+            return
+        
+        tier = escalation_tier(state.model_tier)
+        if tier is None:
+            return
+        
+        logger.info(f"Escalating from {state.model_tier} to {tier.name} ({tier.model}) after tool error")
+        agent.model = build_model(tier.model, self.openai_client)
+        state.escalated = True
\ No newline at end of file
@@ -0,0 +1,199 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import sqlite3
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from ai_agents.utils import metrics
+from ai_agents.utils.log import get_logger
+from ai_agents.utils.state import StateContext
+from ledger.version import ledger_version
+
+logger = get_logger("banksie.profiling")
+
+# Opt-in: record slow analysis executions in `slow_analyses`
+PROFILING_ENABLED = os.getenv("ANALYSIS_PROFILING_ENABLED", "false").lower() == "true"
+# Share of executions run under cProfile and tracemalloc (wall and CPU time are always measured)
+PROFILE_SAMPLE_RATE = float(os.getenv("ANALYSIS_PROFILE_SAMPLE_RATE", "0.1"))
+# Executions at least this slow are written to the slow-analysis log
+SLOW_ANALYSIS_MS = float(os.getenv("SLOW_ANALYSIS_MS", "2000"))
+# Functions kept from the cProfile summary
+PROFILE_TOP_N = int(os.getenv("ANALYSIS_PROFILE_TOP_N", "15"))
+
+
+@dataclass
+class ExecutionProfile:
+    # Whether this execution ran under cProfile and tracemalloc
+    sampled: bool = False
+    wall_ms: float = 0.0
+    cpu_ms: float = 0.0
+    # Only set for sampled executions
+    peak_memory_kb: Optional[float] = None
+    top_functions: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def ensure_slow_analysis_schema(conn: sqlite3.Connection) -> None:
+    """Create the `slow_analyses` table logging analysis executions over SLOW_ANALYSIS_MS."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS slow_analyses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at DATETIME NOT NULL,
+            user_id INTEGER,
+            username TEXT,
+            ledger_version INTEGER,
+            model_tier TEXT,
+            prompt TEXT,
+            code TEXT NOT NULL,
+            status TEXT NOT NULL,
+            wall_ms REAL NOT NULL,
+            cpu_ms REAL NOT NULL,
+            peak_memory_kb REAL,
+            profile TEXT
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_slow_analyses_wall ON slow_analyses (wall_ms DESC)")
+
+
+def top_functions(profiler: cProfile.Profile, limit: int = PROFILE_TOP_N) -> List[Dict[str, Any]]:
+    """
+    Summarize a profile as its `limit` most expensive functions by cumulative time.
+
+    Returns:
+        List of dicts with function ("file:line(name)"), calls, total_ms and cumulative_ms
+    """
+    stats = pstats.Stats(profiler).strip_dirs()
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": pstats.func_std_string(func),
+            "calls": calls,
+            "total_ms": round(total * 1000, 2),
+            "cumulative_ms": round(cumulative * 1000, 2),
+        }
+        for func, (_, calls, total, cumulative, _) in rows
+    ]
+
+
+@contextmanager
+def profile_execution(sample_rate: float = PROFILE_SAMPLE_RATE) -> Iterator[ExecutionProfile]:
+    """
+    Measure a block of analysis code.
+
+    Wall and CPU time are always measured. If profiling is enabled and the execution is sampled,
+    the block also runs under cProfile and tracemalloc for a top-N function summary and peak memory.
+    The profile is filled in when the block exits, also when it raises.
+
+    Args:
+        sample_rate: Share of executions to run under the profilers
+
+    Yields:
+        ExecutionProfile filled in on exit
+    """
+    profile = ExecutionProfile(sampled=PROFILING_ENABLED and random.random() < sample_rate)
+    profiler = cProfile.Profile() if profile.sampled else None
+    # Leave tracemalloc alone if something else is already tracing
+    own_tracemalloc = profile.sampled and not tracemalloc.is_tracing()
+    if own_tracemalloc:
+        tracemalloc.start()
+    if profile.sampled:
+        tracemalloc.reset_peak()
+
+    started, cpu_started = time.perf_counter(), time.process_time()
+    if profiler:
+        profiler.enable()
+    try:
+        yield profile
+    finally:
+        if profiler:
+            profiler.disable()
+        profile.wall_ms = round((time.perf_counter() - started) * 1000, 2)
+        profile.cpu_ms = round((time.process_time() - cpu_started) * 1000, 2)
+        if profile.sampled:
+            profile.peak_memory_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            if own_tracemalloc:
+                tracemalloc.stop()
+            profile.top_functions = top_functions(profiler)
+
+
+def record_execution(state: StateContext, code: str, profile: ExecutionProfile, status: str) -> None:
+    """
+    Record an analysis execution's timing and, when it is slow and profiling is enabled, log it
+    in `slow_analyses` with its code, the ledger version it ran against and the user.
+
+    Args:
+        state: Run state context
+        code: Executed analysis code
+        profile: Measurements from profile_execution
+        status: "ok", "error" or "timeout"
+    """
+    metrics.observe("analysis.exec_ms", profile.wall_ms, tier=state.model_tier)
+    if not PROFILING_ENABLED or profile.wall_ms < SLOW_ANALYSIS_MS:
+        return
+
+    metrics.increment("analysis.slow", tier=state.model_tier)
+    logger.warning(
+        f"Slow analysis: {profile.wall_ms}ms wall, {profile.cpu_ms}ms CPU ({status})",
+        extra={"latency_ms": profile.wall_ms, "cpu_ms": profile.cpu_ms, "username": state.username},
+    )
+    try:
+        conn = sqlite3.connect(state.transactions.database_path)
+        try:
+            conn.execute(
+                "INSERT INTO slow_analyses (created_at, user_id, username, ledger_version, model_tier, prompt, code, "
+                "status, wall_ms, cpu_ms, peak_memory_kb, profile) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    datetime.now().isoformat(timespec="seconds"), state.user_id, state.username,
+                    ledger_version(conn), state.model_tier, state.prompt, code, status,
+                    profile.wall_ms, profile.cpu_ms, profile.peak_memory_kb,
+                    json.dumps(profile.top_functions) if profile.sampled else None,
+                )
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        # The slow-analysis log is diagnostic only; never fail the tool call over it
+        logger.error(f"Could not record slow analysis: {e}")
+
+
+def slowest_analyses(db_path: str, limit: int = 20, days: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Return the slowest logged analysis executions, slowest first.
+
+    Args:
+        db_path: Path to the SQLite database
+        limit: Maximum number of executions
+        days: Only include executions from the last `days` days
+
+    Returns:
+        List of slow_analyses rows as dicts, with the profile decoded
+    """
+    query = "SELECT * FROM slow_analyses"
+    params: List[Any] = []
+    if days:
+        query += " WHERE created_at >= ?"
+        params.append((datetime.now() - timedelta(days=days)).isoformat(timespec="seconds"))
+    query += " ORDER BY wall_ms DESC LIMIT ?"
+    params.append(limit)
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+    analyses = []
+    for row in rows:
+        analysis = dict(row)
+        analysis["profile"] = json.loads(analysis["profile"]) if analysis["profile"] else None
+        analyses.append(analysis)
+    return analyses
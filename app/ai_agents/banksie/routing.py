@@ -0,0 +1,152 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from agents import Usage
+from ai_agents.utils import metrics
+
+
+@dataclass
+class ModelTier:
+    # Tier name used in metrics and logs
+    name: str
+    # Model the analyst agent runs on for this tier
+    model: str
+    # USD per million input / output tokens, used for cost metrics
+    input_cost_per_million: float = 0.0
+    output_cost_per_million: float = 0.0
+
+
+@dataclass
+class RoutingDecision:
+    tier: ModelTier
+    # Heuristics that fired, for logging and threshold tuning
+    reasons: List[str] = field(default_factory=list)
+    # Coarse kind of question ("lookup", "insight", "multi_question" or "long"), for per-type trace stats
+    prompt_type: str = "lookup"
+
+
+SIMPLE_TIER = "simple"
+COMPLEX_TIER = "complex"
+
+TIERS: Dict[str, ModelTier] = {
+    SIMPLE_TIER: ModelTier(
+        name=SIMPLE_TIER,
+        model=os.getenv("BANKSIE_MODEL_SIMPLE", "gpt-4.1-mini"),
+        input_cost_per_million=float(os.getenv("BANKSIE_SIMPLE_INPUT_COST", "0.40")),
+        output_cost_per_million=float(os.getenv("BANKSIE_SIMPLE_OUTPUT_COST", "1.60")),
+    ),
+    COMPLEX_TIER: ModelTier(
+        name=COMPLEX_TIER,
+        model=os.getenv("BANKSIE_MODEL_COMPLEX", "gpt-4.1"),
+        input_cost_per_million=float(os.getenv("BANKSIE_COMPLEX_INPUT_COST", "2.00")),
+        output_cost_per_million=float(os.getenv("BANKSIE_COMPLEX_OUTPUT_COST", "8.00")),
+    ),
+}
+
+# Prompts longer than this many words are treated as complex
+COMPLEX_WORD_THRESHOLD = int(os.getenv("BANKSIE_COMPLEX_WORD_THRESHOLD", "40"))
+# Set to "false" to send every prompt to the complex tier
+ROUTING_ENABLED = os.getenv("BANKSIE_ROUTING_ENABLED", "true").lower() == "true"
+
+# Questions asking for interpretation, comparison or prediction rather than a lookup
+INSIGHT_PATTERN = re.compile(
+    r"\b(why|trend\w*|insight\w*|forecast\w*|predict\w*|project\w*|anomal\w*|unusual|compar\w*|"
+    r"recommend\w*|advice|advise|suggest\w*|should|improve|optimi[sz]\w*|explain\w*|analy[sz]\w*|"
+    r"pattern\w*|seasonal\w*|correlat\w*|cash ?flow|runway|budget\w*|risk\w*|health|strateg\w*)\b",
+    re.IGNORECASE,
+)
+
+
+def classify_prompt(prompt: str) -> RoutingDecision:
+    """
+    Pick a model tier for a prompt using cheap local heuristics.
+
+    Lookups and simple aggregates ("show me transactions over $30,000 for aug 2024") go to the
+    simple tier; interpretive, multi-part or long questions go to the complex tier.
+
+    Args:
+        prompt: The user's message
+
+    Returns:
+        RoutingDecision with the chosen tier and the heuristics that fired
+    """
+    reasons = []
+    insight_terms = sorted({match.group(0).lower() for match in INSIGHT_PATTERN.finditer(prompt)})
+    if insight_terms:
+        reasons.append(f"insight terms: {', '.join(insight_terms)}")
+
+    word_count = len(prompt.split())
+    if word_count > COMPLEX_WORD_THRESHOLD:
+        reasons.append(f"{word_count} words")
+
+    if prompt.count("?") > 1:
+        reasons.append("multiple questions")
+
+    prompt_type = (
+        "insight" if insight_terms else "long" if word_count > COMPLEX_WORD_THRESHOLD
+        else "multi_question" if prompt.count("?") > 1 else "lookup"
+    )
+    if not ROUTING_ENABLED:
+        return RoutingDecision(tier=TIERS[COMPLEX_TIER], reasons=["routing disabled"], prompt_type=prompt_type)
+
+    tier = COMPLEX_TIER if reasons else SIMPLE_TIER
+    return RoutingDecision(tier=TIERS[tier], reasons=reasons or ["lookup"], prompt_type=prompt_type)
+
+
+def escalation_tier(tier_name: str) -> Optional[ModelTier]:
+    """
+    Return the tier a failing run should move up to, or None if it is already on the top tier.
+
+    Args:
+        tier_name: Current tier name
+    """
+    if tier_name == SIMPLE_TIER:
+        return TIERS[COMPLEX_TIER]
+    return None
+
+
+def tier_cost(tier: ModelTier, input_tokens: int, output_tokens: int) -> float:
+    """Price token usage in USD at a tier's rates."""
+    return (input_tokens * tier.input_cost_per_million + output_tokens * tier.output_cost_per_million) / 1_000_000
+
+
+def model_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """
+    Price a model call in USD with the rates of the tier running that model (0 for unknown models).
+
+    Args:
+        model: Model name as reported by the API (e.g. "gpt-4.1-mini-2025-04-14") or configured
+        input_tokens: Input tokens used
+        output_tokens: Output tokens used
+    """
+    # Responses report dated snapshots, so match the longest configured name the model starts with
+    tier = max((t for t in TIERS.values() if model.startswith(t.model)), key=lambda t: len(t.model), default=None)
+    if tier is None:
+        return 0.0
+    return tier_cost(tier, input_tokens, output_tokens)
+
+
+def record_run(tier_name: str, latency_ms: float, usage: Optional[Usage], escalated: bool) -> None:
+    """
+    Record latency, token and cost metrics for a finished agent run.
+
+    Args:
+        tier_name: Tier the run started on
+        latency_ms: Wall-clock duration of the run
+        usage: Token usage reported by the Agents SDK
+        escalated: Whether the run was escalated to a larger model
+    """
+    metrics.increment("banksie.runs", tier=tier_name)
+    metrics.observe("banksie.latency_ms", latency_ms, tier=tier_name)
+    if escalated:
+        metrics.increment("banksie.escalations", tier=tier_name)
+
+    if usage is None:
+        return
+    # Escalated runs are priced at the larger model, an upper bound on their cost
+    tier = (escalated and escalation_tier(tier_name)) or TIERS[tier_name]
+    metrics.increment("banksie.input_tokens", usage.input_tokens, tier=tier_name)
+    metrics.increment("banksie.output_tokens", usage.output_tokens, tier=tier_name)
+    metrics.increment("banksie.cost_usd", tier_cost(tier, usage.input_tokens, usage.output_tokens), tier=tier_name)
@@ -0,0 +1,60 @@
+from typing import Any, Dict, List, Optional
+
+from agents import RunContextWrapper, function_tool
+from ai_agents.utils.state import StateContext
+from ledger.insights import DIMENSIONS, insight_summary
+
+
+def _dollars(cents: int) -> str:
+    return f"{'-' if cents < 0 else ''}${abs(cents) / 100:,.2f}"
+
+
+def _section(title: str, lines: List[str]) -> str:
+    return f"{title}:\n" + ("\n".join(f"- {line}" for line in lines) if lines else "- none")
+
+
+@function_tool
+def get_insights(wrapper: RunContextWrapper[StateContext], dimension: Optional[str] = None, days: int = 90) -> str:
+    """
+    Get precomputed insights instantly: outlier transactions, shifts in transaction sizes, months that deviate
+    from their seasonal baseline, and the usual transaction size per category and counterparty.
+    Use it first for "what should I focus on", anomaly, unusual-spend and trend questions; the statistics are
+    maintained as transactions are written, so there is no need to recompute them with code.
+
+    Args:
+        dimension: Optional "category" or "counterparty" to only get findings for one of them.
+        days: Window in days for recent outliers and shifts (default 90).
+
+    Returns:
+        str: Findings grouped by outliers, shifts, seasonal deviations and baselines.
+    """
+    if dimension is not None and dimension not in DIMENSIONS:
+        return f"Unknown dimension '{dimension}'. Use one of: {', '.join(DIMENSIONS)}"
+
+    summary = insight_summary(wrapper.context.transactions.database_path, dimension=dimension, days=days)
+
+    def name(entry: Dict[str, Any]) -> str:
+        return f"{entry['name']} ({entry['dimension']})"
+
+    return "\n\n".join([
+        _section(f"Outlier transactions (last {days} days)", [
+            f"{name(f)} on {f['transaction_date']}, {_dollars(f['amount_cents'])}: {f['detail']}"
+            for f in summary["outliers"]
+        ]),
+        _section(f"Shifts in transaction size (last {days} days)", [
+            f"{name(f)} from {f['transaction_date']}: {f['detail']}" for f in summary["shifts"]
+        ]),
+        _section("Last month vs seasonal baseline", [
+            f"{name(d)} {d['month']}: {_dollars(d['total_cents'])} vs {_dollars(d['baseline_cents'])} "
+            f"({d['change']:+.0%}, baseline: {d['basis']})"
+            for d in summary["seasonal"]
+        ]),
+        _section("Current trends (recent vs long-run transaction size)", [
+            f"{name(b)}: {b['trend']:+.0%}" for b in summary["trends"]
+        ]),
+        _section("Baselines (largest first; typical transaction size)", [
+            f"{name(b)}: {b['transactions']} transactions, mean {_dollars(b['mean_cents'])} "
+            f"(std {_dollars(b['std_cents'])}), median {_dollars(b['p50_cents'])}, p95 {_dollars(b['p95_cents'])}"
+            for b in summary["baselines"]
+        ]),
+    ])
@@ -0,0 +1,46 @@
+import pandas as pd
+from agents import RunContextWrapper, function_tool
+from ai_agents.banksie.artifacts import summarize_artifact, table_artifact
+from ai_agents.utils.state import StateContext
+from ledger.reports import STANDARD_REPORTS, latest_reports
+
+
+@function_tool
+def get_report(wrapper: RunContextWrapper[StateContext], name: str) -> str:
+    """
+    Get a precomputed standard report instantly instead of computing it with code.
+    Available reports:
+    - monthly_pnl: income, expenses and net result per month
+    - top_categories: largest income and expense categories over the last 90 days
+    - cash_flow_trend: monthly net cash flow, closing balance, 3-month average and trend direction
+    The report table is shown to the user directly; you get its summary to narrate.
+
+    Args:
+        name: Report name (monthly_pnl, top_categories or cash_flow_trend)
+
+    Returns:
+        str: Report summary, when it was computed, and a reference to the table shown to the user.
+    """
+    if name not in STANDARD_REPORTS:
+        return f"Unknown report '{name}'. Available reports: {', '.join(STANDARD_REPORTS)}"
+
+    reports = latest_reports(wrapper.context.transactions.database_path, name)
+    if not reports:
+        return f"Report '{name}' has not been computed yet; use perform_analysis instead."
+    report = reports[0]
+    payload = report["payload"]
+
+    # Show money in dollars; the stored report keeps exact cents
+    df = pd.DataFrame(payload["rows"], columns=payload["columns"])
+    for column in [c for c in df.columns if c.endswith("_cents")]:
+        df[column.removesuffix("_cents")] = df.pop(column) / 100
+
+    artifact = table_artifact(f"a{len(wrapper.context.artifacts) + 1}", df, name.replace("_", " ").title())
+    wrapper.context.artifacts.append(artifact)
+
+    freshness = "stale, the ledger changed since" if report["stale"] else "up to date"
+    return (
+        f"{payload['summary']}\n"
+        f"Computed at {report['generated_at']} ({freshness}).\n"
+        f"{summarize_artifact(artifact, df)}"
+    )
@@ -1,15 +1,51 @@
+import ast
 import io
 import re
-from contextlib import redirect_stderr, redirect_stdout
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
 from datetime import date, datetime, timedelta
+from typing import Optional
 import numpy as np
 import pandas as pd
 from agents import RunContextWrapper, function_tool
+from ai_agents.banksie.budget import BUDGET_EXHAUSTED_MESSAGE, exec_timeout, exhaustion_reason
+from ai_agents.banksie.artifacts import series_artifact, summarize_artifact, table_artifact
+from ai_agents.banksie.profiling import profile_execution, record_execution
+from ai_agents.banksie.code_rewriter import FRAME_HELPER, FrameCache, record_rewrite, rewrite_analysis_code
 from ai_agents.utils.state import StateContext
+from ledger.archive import archived_through
+from ledger.counterparties import counterparty_rollup
+from ledger.money import cents_to_dollars, groupby_sum_cents, sum_cents
+from ledger.readonly import run_readonly_query
+
+# Filename the analysis code is compiled under, so the deadline only interrupts (or traces) its frames
+ANALYSIS_FILENAME = "<analysis>"
+# Once the deadline passes, the alarm repeats this often until the analysis stops
+DEADLINE_REPEAT_SECONDS = 0.1
+# The fallback deadline tracer reads the clock every this many lines of analysis code
+DEADLINE_CHECK_LINES = 1000
+
+
+class AnalysisTimeout(BaseException):
+    """
+    Raised inside the analysis code when it runs past its time budget.
+
+    A BaseException, like KeyboardInterrupt, so `except Exception` in the analysis code does not swallow it.
+    """
 
 
 @function_tool
-def perform_analysis(wrapper: RunContextWrapper[StateContext], code: str) -> str:
+def perform_analysis(
+    wrapper: RunContextWrapper[StateContext],
+    code: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    categories: Optional[list[str]] = None,
+    columns: Optional[list[str]] = None,
+) -> str:
     
     """
     Perform analysis on the user's transaction data using python code. 
@@ -17,28 +53,88 @@ def perform_analysis(wrapper: RunContextWrapper[StateContext], code: str) -> str
     - Its run in a restricted environment
     - You can only use the libraries and variables that are already imported.
         - The code must use the variable `transaction_data` as its source of transaction data.
+        - Scope `transaction_data` with `start_date`, `end_date`, `categories` and `columns` whenever the
+          question only needs part of the ledger; the scope is applied in the database before loading.
+        - `load_transactions(start_date, end_date, categories, columns)` loads another scoped slice.
+        - `sql(query, params, start_date, end_date)` runs a read-only SELECT over the whole ledger (archived months
+          included) and returns a DataFrame; prefer it for filters and aggregates. Tables: `transactions_ledger`
+          (transactions with corrected balances), `counterparties`. Pass `start_date`/`end_date` to limit the
+          ledger tables to a date range, so older archived months are not read.
         - Pandas and Numpy are already imported so you can use them.
+        - Money is exact in `amount_cents` / `balance_cents` (int); use `sum_cents(values)`,
+          `groupby_sum_cents(df, by)` and `cents_to_dollars(x)` for totals instead of summing float `amount`.
+        - Each transaction has a normalized `counterparty` name; `counterparty_summary(start_date, end_date,
+          transaction_type, limit)` returns precomputed per-counterparty totals as a DataFrame.
+        - To show the user a table or series, call `show_table(df, title)` / `show_series(series, title)`; it is sent
+          straight to the user's screen and you get back a reference plus a summary. Do not print the table or
+          re-type its rows in your answer, just narrate the summary.
     - The code must print out the final conclusion of the analysis and any data the user needs to see using f-string.
     - DO NOT include import statements in your code - pandas is available as 'pd' and numpy as 'np'
     - DO NOT  use triple quotes in your code
 
     Args:
         Code: Python code to be executed to perform the analysis and achieve the user's goal.
+        start_date: Optional first transaction_date (YYYY-MM-DD) to load into `transaction_data`.
+        end_date: Optional last transaction_date (YYYY-MM-DD) to load into `transaction_data`.
+        categories: Optional list of categories to load into `transaction_data`.
+        columns: Optional list of columns to load into `transaction_data`.
         
     Returns:
         str: final conclusion of the analysis and any data the user needs to see.
     """
     
-    # Access transaction data from the context
-    data = wrapper.context.transaction_data
+    # Stop here if the run's step or time budget is already used up
+    if wrapper.context.budget_exhausted or exhaustion_reason(wrapper.context):
+        return BUDGET_EXHAUSTED_MESSAGE
+    
+    # Lazy handle on the transaction data, nothing has been read from the database yet
+    source = wrapper.context.transactions
+    
+    def load_transactions(start_date=None, end_date=None, categories=None, columns=None):
+        """Load a scoped slice of the transactions (filters run in the database)."""
+        return source.load(start_date=start_date, end_date=end_date, categories=categories, columns=columns)
+    
+    def sql(query, params=None, start_date=None, end_date=None):
+        """Run a read-only SELECT against the ledger tables (hot rows plus archive) and return a DataFrame."""
+        return run_readonly_query(
+            source.database_path, query, params,
+            archive_dir=source.archive_dir, start_date=start_date, end_date=end_date,
+        )
+    
+    def counterparty_summary(start_date=None, end_date=None, transaction_type=None, limit=None):
+        """Per-counterparty totals (cents) from the indexed counterparty column."""
+        return pd.DataFrame(
+            counterparty_rollup(
+                source.database_path, source.archive_dir,
+                start_date=start_date, end_date=end_date, transaction_type=transaction_type, limit=limit,
+            )
+        )
+    
+    def show_table(df, title=None):
+        """Send a DataFrame to the user as a table artifact and print its reference and summary."""
+        df = pd.DataFrame(df)
+        artifact = table_artifact(f"a{len(wrapper.context.artifacts) + 1}", df, title)
+        wrapper.context.artifacts.append(artifact)
+        print(summarize_artifact(artifact, df))
+    
+    def show_series(series, title=None):
+        """Send a Series to the user as a series artifact and print its reference and summary."""
+        series = pd.Series(series)
+        artifact = series_artifact(f"a{len(wrapper.context.artifacts) + 1}", series, title)
+        wrapper.context.artifacts.append(artifact)
+        print(summarize_artifact(artifact, series))
     
     python_code = extract_python_code_block(code)
     
-    # Remove common import statements that won't work in restricted environment
-    python_code = re.sub(r'^import pandas as pd\s*\n?', '', python_code, flags=re.MULTILINE)
-    python_code = re.sub(r'^import numpy as np\s*\n?', '', python_code, flags=re.MULTILINE)
-    python_code = re.sub(r'^from pandas import .*\n?', '', python_code, flags=re.MULTILINE)
-    python_code = re.sub(r'^from numpy import .*\n?', '', python_code, flags=re.MULTILINE)
+    # Materialize rows only if the code actually reads them
+    data = []
+    if references_transaction_data(python_code):
+        data = load_transactions(start_date, end_date, categories, columns)
+    
+    # Drop imports of preloaded modules and rewrite slow idioms into vectorized equivalents
+    rewrite = rewrite_analysis_code(python_code)
+    python_code = rewrite.code
+    frames = FrameCache(data)
     
     # Create a restricted namespace for code execution
     # Include common libraries and the transaction data
@@ -69,21 +165,39 @@ def perform_analysis(wrapper: RunContextWrapper[StateContext], code: str) -> str
         },
         'data': data,
         'transaction_data': data,  # Provide both names for convenience
+        FRAME_HELPER: frames,  # Shared DataFrame of `data` for code that builds it repeatedly
         'datetime': datetime,
         'date': date,
         'timedelta': timedelta,
         'pd': pd,
         'np': np,
+        'sum_cents': sum_cents,
+        'groupby_sum_cents': groupby_sum_cents,
+        'cents_to_dollars': cents_to_dollars,
+        'counterparty_summary': counterparty_summary,
+        'load_transactions': load_transactions,
+        'sql': sql,
+        'show_table': show_table,
+        'show_series': show_series,
+        'archived_through': archived_through(source.archive_dir),
     }
     
     # Capture stdout and stderr
     stdout_capture = io.StringIO()
     stderr_capture = io.StringIO()
     
+    # The analysis gets what is left of the run budget
+    timeout = exec_timeout(wrapper.context)
+    profile = None
+    status = "ok"
+    
     try:
-        # Execute the code in the restricted environment
-        with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
-            exec(python_code, restricted_globals, {})
+        # Execute the code in the restricted environment, interrupting it at the deadline
+        compiled = compile(python_code, ANALYSIS_FILENAME, "exec")
+        with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture), profile_execution() as profile:
+            # Innermost, so the deadline is disarmed before the other context managers restore their state
+            with analysis_deadline(timeout):
+                exec(compiled, restricted_globals, {})
         
         # Get the captured output
         output = stdout_capture.getvalue()
@@ -94,16 +208,118 @@ def perform_analysis(wrapper: RunContextWrapper[StateContext], code: str) -> str
         else:
             result = output if output else "Code executed successfully but produced no output."
             
+    except AnalysisTimeout:
+        status = "timeout"
+        result = (
+            f"Analysis timed out after {timeout:.0f}s. Use a simpler or vectorized approach, or scope the data.\n"
+            f"Partial output:\n{stdout_capture.getvalue()}"
+        )
+    
     except Exception as e:
         # Handle any execution errors
+        status = "error"
         error_output = stderr_capture.getvalue()
         result = f"Error executing code: {str(e)}\n"
         if error_output:
             result += f"Additional errors: {error_output}\n"
     
+    # Timing for every execution; slow ones go to the slow-analysis log (profile is None if the code did not compile)
+    if profile is not None:
+        record_execution(wrapper.context, python_code, profile, status)
+        record_rewrite(rewrite, profile.wall_ms, frames)
+    
+    # Slow idioms that could not be rewritten, so the next analysis avoids them
+    if rewrite.hints:
+        result += "\n\nPerformance hints:\n" + "\n".join(f"- {hint}" for hint in rewrite.hints)
+    
     return result
 
 
+@contextmanager
+def analysis_deadline(timeout: float):
+    """
+    Raise AnalysisTimeout inside the block once `timeout` seconds have passed.
+
+    On the main thread, where the event loop runs sync tools, a SIGALRM timer interrupts the
+    code, so it runs untraced: no per-line cost, and a debugger's trace function stays in place.
+    Elsewhere (or without setitimer, on Windows) deadline_tracer is installed instead, unless a
+    debugger's trace function is already set. Either way the exception is raised between
+    bytecodes, so a single long C call (e.g. one large pandas operation) finishes first.
+    """
+    if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+        armed = True
+
+        def on_alarm(signum, frame):
+            if not armed:
+                return
+            # Repeat in case the analysis catches the exception with a bare `except:`. It is only
+            # raised inside the analysis code, never in the exits running after it has returned
+            signal.setitimer(signal.ITIMER_REAL, DEADLINE_REPEAT_SECONDS)
+            if _in_analysis(frame):
+                raise AnalysisTimeout()
+
+        previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, max(timeout, 0.001))
+        try:
+            yield
+        finally:
+            # Disarm first: an alarm arriving after this returns without raising
+            armed = False
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    elif sys.gettrace() is None:
+        sys.settrace(deadline_tracer(time.monotonic() + timeout))
+        try:
+            yield
+        finally:
+            sys.settrace(None)
+    else:
+        yield
+
+
+def _in_analysis(frame) -> bool:
+    # Whether the analysis code is on the interrupted stack
+    while frame is not None:
+        if frame.f_code.co_filename == ANALYSIS_FILENAME:
+            return True
+        frame = frame.f_back
+    return False
+
+
+def deadline_tracer(deadline: float):
+    # Trace function raising AnalysisTimeout once the deadline passes. Only the analysis code's own
+    # frames are traced line by line, and the clock is read on calls and every DEADLINE_CHECK_LINES lines
+    lines = 0
+
+    def trace_lines(frame, event, arg):
+        nonlocal lines
+        lines += 1
+        if lines % DEADLINE_CHECK_LINES == 0 and time.monotonic() > deadline:
+            raise AnalysisTimeout()
+        return trace_lines
+    
+    def trace_calls(frame, event, arg):
+        if time.monotonic() > deadline:
+            raise AnalysisTimeout()
+        return trace_lines if frame.f_code.co_filename == ANALYSIS_FILENAME else None
+    
+    return trace_calls
+
+
+def references_transaction_data(python_code: str) -> bool:
+    # Check whether the code reads the preloaded rows (`transaction_data` or its `data` alias)
+    names = {"transaction_data", "data"}
+    try:
+        tree = ast.parse(python_code)
+    except SyntaxError:
+        return any(re.search(rf"\b{name}\b", python_code) for name in names)
+    
+    return any(
+        isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in names
+        for node in ast.walk(tree)
+    )
+
+
 def extract_python_code_block(code: str) -> str:
     # Extract the python code block from the code
     code = code.replace("```python\n", "").replace("```", "").strip()
@@ -0,0 +1,56 @@
+import sqlite3
+from typing import Optional
+
+from agents import RunContextWrapper, function_tool
+from ai_agents.utils.knowledge_store import SOURCES, get_knowledge_store
+from ai_agents.utils.state import StateContext
+from ledger.version import ledger_version
+
+SOURCE_LABELS = {"chat": "Earlier answer", "document": "Document"}
+
+
+@function_tool
+def search_knowledge(
+    wrapper: RunContextWrapper[StateContext], query: str, source: Optional[str] = None, limit: int = 5
+) -> str:
+    """
+    Search the user's earlier answers and their business documents in milliseconds.
+    Use it first when the question resembles something asked before (to reuse the computed result instead of
+    recomputing it) and for questions about the business itself (policies, contracts, suppliers, plans) that the
+    transaction data cannot answer.
+
+    Args:
+        query: What to look for, in plain words (e.g. "payroll cost by month", "supplier payment terms").
+        source: Optional "chat" (earlier answers only) or "document" (business documents only).
+        limit: Maximum number of passages (default 5).
+
+    Returns:
+        str: Matching passages, best first, with their source, date and relevance; earlier answers are flagged when
+        the transactions have changed since they were computed.
+    """
+    if source is not None and source not in SOURCES:
+        return f"Unknown source '{source}'. Use one of: {', '.join(SOURCES)}"
+    if wrapper.context.user_id is None:
+        return "No earlier answers or documents are available."
+
+    database_path = wrapper.context.transactions.database_path
+    results = get_knowledge_store(database_path).search(wrapper.context.user_id, query, max(1, min(limit, 20)), source)
+    if not results:
+        return "No relevant earlier answers or documents found."
+
+    conn = sqlite3.connect(database_path)
+    try:
+        version = ledger_version(conn)
+    finally:
+        conn.close()
+
+    passages = []
+    for result in results:
+        notes = [f"{result['created_at'][:10]}", f"relevance {result['score']:.2f}"]
+        if result["source"] == "chat" and result["ledger_version"] != version:
+            notes.append("transactions changed since; verify figures before reusing")
+        passages.append(
+            f"[{SOURCE_LABELS[result['source']]} #{result['source_id']}: {result['title']} ({', '.join(notes)})]\n"
+            f"{result['text']}"
+        )
+    return "\n\n".join(passages)
@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import zlib
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from ai_agents.utils.log import get_logger
+
+logger = get_logger("chat_store")
+
+# Responses and artifact JSON longer than this (UTF-8 bytes) are stored zlib-compressed
+CHAT_COMPRESS_MIN_BYTES = int(os.getenv("CHAT_COMPRESS_MIN_BYTES", "1024"))
+CHAT_COMPRESS_LEVEL = 6
+# Characters of the response kept as the list-view preview
+CHAT_PREVIEW_CHARS = int(os.getenv("CHAT_PREVIEW_CHARS", "280"))
+# History page size limits
+CHAT_PAGE_SIZE = 20
+CHAT_MAX_PAGE_SIZE = 100
+
+
+def encode_text(text: Optional[str]) -> Optional[Union[str, bytes]]:
+    """
+    Prepare text for storage: short text is stored as is, longer text as a zlib BLOB.
+
+    SQLite keeps BLOBs in TEXT columns untouched, so the value type tells `decode_text` which it is.
+    """
+    if text is None:
+        return None
+    raw = text.encode("utf-8")
+    if len(raw) < CHAT_COMPRESS_MIN_BYTES:
+        return text
+    return zlib.compress(raw, CHAT_COMPRESS_LEVEL)
+
+
+def decode_text(value: Optional[Union[str, bytes]]) -> Optional[str]:
+    """Inverse of `encode_text`."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+def make_preview(response: Optional[str]) -> Tuple[str, bool]:
+    """
+    Short plain preview of a response for the history list: markdown table rows are skipped
+    (tables dominate long answers) and whitespace is collapsed.
+
+    Returns:
+        The preview, and whether it leaves anything out (table rows or text past the length cut);
+        collapsed whitespace alone does not count
+    """
+    if not response:
+        return "", False
+    all_lines = response.splitlines()
+    lines = [line for line in all_lines if not line.lstrip().startswith("|")]
+    text = " ".join(" ".join(lines).split())
+    if len(text) <= CHAT_PREVIEW_CHARS:
+        return text, len(lines) < len(all_lines)
+    return text[:CHAT_PREVIEW_CHARS].rsplit(" ", 1)[0] + "…", True
+
+
+def ensure_chat_schema(conn: sqlite3.Connection):
+    """
+    Add the preview columns and history index to chat_messages, and compress and preview
+    rows written before they existed.
+
+    Args:
+        conn: Open SQLite connection (the caller commits)
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(chat_messages)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "preview" not in columns:
+        cursor.execute("ALTER TABLE chat_messages ADD COLUMN preview TEXT")
+    # Whether the preview leaves part of the response out
+    if "preview_truncated" not in columns:
+        cursor.execute("ALTER TABLE chat_messages ADD COLUMN preview_truncated INTEGER")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_user ON chat_messages (user_id, id)")
+
+    cursor.execute("SELECT id, response, artifacts FROM chat_messages WHERE preview_truncated IS NULL")
+    rows = cursor.fetchall()
+    for message_id, response, artifacts in rows:
+        response = decode_text(response)
+        preview, truncated = make_preview(response)
+        cursor.execute(
+            "UPDATE chat_messages SET response = ?, artifacts = ?, preview = ?, preview_truncated = ? WHERE id = ?",
+            (encode_text(response), encode_text(decode_text(artifacts)), preview, truncated, message_id),
+        )
+    if rows:
+        logger.info(f"Compressed and previewed {len(rows)} chat messages")
+
+
+def save_chat_message(
+    conn: sqlite3.Connection,
+    user_id: int,
+    message: str,
+    response: str,
+    artifacts: Optional[List[Dict[str, Any]]] = None,
+) -> int:
+    """
+    Store a chat turn, compressing a long response and large artifacts.
+
+    Args:
+        conn: Open SQLite connection (the caller commits)
+        user_id: Owner of the message
+        message: The user's prompt
+        response: The full answer
+        artifacts: Tables/series shown alongside the answer
+
+    Returns:
+        The new chat_messages.id
+    """
+    preview, truncated = make_preview(response)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO chat_messages (user_id, message, response, artifacts, preview, preview_truncated) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            user_id,
+            message,
+            encode_text(response),
+            encode_text(json.dumps(artifacts)) if artifacts else None,
+            preview,
+            truncated,
+        ),
+    )
+    return cursor.lastrowid
+
+
+def chat_history_page(
+    db_path: str, user_id: int, before: Optional[int] = None, limit: int = CHAT_PAGE_SIZE
+) -> Dict[str, Any]:
+    """
+    One page of a user's chat history, newest first, without full responses or artifacts.
+
+    Args:
+        db_path: Path to the SQLite database
+        user_id: Owner of the messages
+        before: Only messages with a smaller id (the previous page's `next_before`)
+        limit: Page size
+
+    Returns:
+        Dict with `messages` (id, message, preview, created_at, has_artifacts and `truncated`, true when
+        the preview is not the whole answer) and `next_before` (None on the last page)
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT id, message, preview, created_at, artifacts IS NOT NULL, preview_truncated "
+            "FROM chat_messages WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (user_id, before if before is not None else 2 ** 63 - 1, limit + 1),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    messages = [
+        {
+            "id": message_id,
+            "message": message,
+            "preview": preview or "",
+            "created_at": created_at,
+            "has_artifacts": bool(has_artifacts),
+            "truncated": bool(truncated),
+        }
+        for message_id, message, preview, created_at, has_artifacts, truncated in rows[:limit]
+    ]
+    return {"messages": messages, "next_before": rows[limit - 1][0] if len(rows) > limit else None}
+
+
+def get_chat_message(db_path: str, message_id: int) -> Optional[Dict[str, Any]]:
+    """
+    A full chat message with its decompressed response and artifacts.
+
+    Args:
+        db_path: Path to the SQLite database
+        message_id: chat_messages.id
+
+    Returns:
+        Dict with id, user_id, message, response, created_at and artifacts, or None if it does not exist
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT id, user_id, message, response, created_at, artifacts FROM chat_messages WHERE id = ?",
+            (message_id,),
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+
+    artifacts = decode_text(row[5])
+    return {
+        "id": row[0],
+        "user_id": row[1],
+        "message": row[2],
+        "response": decode_text(row[3]),
+        "created_at": row[4],
+        "artifacts": json.loads(artifacts) if artifacts else [],
+    }
@@ -0,0 +1,110 @@
+import hashlib
+import math
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+
+# "hashing" (default, no model download) or a sentence-transformers model name, e.g. "all-MiniLM-L6-v2"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "hashing")
+HASH_EMBEDDING_DIM = int(os.getenv("HASH_EMBEDDING_DIM", "256"))
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+# Crude suffix stripping, so "costs"/"cost" and "reviewed"/"review" share a feature
+_SUFFIXES = ("ing", "ed", "es", "s")
+
+
+def _stem(token: str) -> str:
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)]
+    return token
+
+
+class Embedder(ABC):
+    """
+    Turns texts into L2-normalized float32 vectors, so a dot product is the cosine similarity.
+
+    `name` identifies the model and its settings; vectors from different names are not comparable.
+    """
+
+    name: str = ""
+    dim: int = 0
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Array of shape (len(texts), dim)
+        """
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic local embedder: suffix-stripped word unigrams and bigrams feature-hashed into
+    `dim` buckets with a sign bit, weighted by log term frequency.
+
+    It needs no model or network and gives the same vectors on every machine, which makes it
+    the default and the stand-in for tests. It matches shared wording, not paraphrases.
+    """
+
+    def __init__(self, dim: int = HASH_EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _bucket(self, feature: str) -> int:
+        # blake2b is stable across processes, unlike hash()
+        return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = [_stem(token) for token in _TOKEN.findall(text.lower())]
+            counts = {}
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                counts[feature] = counts.get(feature, 0) + 1
+            for feature, count in counts.items():
+                bucket = self._bucket(feature)
+                sign = 1.0 if bucket >> 63 else -1.0
+                vectors[row, bucket % self.dim] += sign * (1.0 + math.log(count))
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Local sentence-transformers model (optional dependency, loaded once)."""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return _normalize(np.asarray(self._model.encode(texts, convert_to_numpy=True), dtype=np.float32))
+
+
+def create_embedder(model: Optional[str] = None) -> Embedder:
+    """
+    Build the configured embedder.
+
+    Args:
+        model: "hashing" or a sentence-transformers model name (default: EMBEDDING_MODEL)
+
+    Raises:
+        ImportError: If a sentence-transformers model is configured but the package is not installed
+    """
+    model = model or EMBEDDING_MODEL
+    if model == "hashing":
+        return HashingEmbedder()
+    return SentenceTransformerEmbedder(model)
@@ -0,0 +1,414 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ai_agents.utils import metrics
+from ai_agents.utils.chat_store import decode_text, encode_text
+from ai_agents.utils.embeddings import Embedder, create_embedder
+from ai_agents.utils.log import get_logger
+from ai_agents.utils.vector_index import VectorIndex
+from ledger.version import ledger_version
+
+logger = get_logger("knowledge_store")
+
+# Chunk size in characters, and how much consecutive chunks of a long text overlap
+KNOWLEDGE_CHUNK_CHARS = int(os.getenv("KNOWLEDGE_CHUNK_CHARS", "1000"))
+KNOWLEDGE_CHUNK_OVERLAP = int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP", "150"))
+# Passages scoring below this cosine similarity are not returned
+KNOWLEDGE_MIN_SCORE = float(os.getenv("KNOWLEDGE_MIN_SCORE", "0.15"))
+# Candidates fetched from the index per requested result, reranked with exact vectors
+KNOWLEDGE_RERANK_FACTOR = 4
+EMBED_BATCH_SIZE = 256
+SOURCES = ("chat", "document")
+
+# (chunk id, user id, vector) of a chunk written but not yet added to the vector index
+PendingChunk = Tuple[int, int, np.ndarray]
+
+
+def ensure_knowledge_schema(conn: sqlite3.Connection) -> None:
+    """
+    Create the business document table and the chunk table searched by `search_knowledge`.
+
+    Chunks hold their text and float32 embedding; the in-memory vector index is rebuilt from
+    them on first use and updated as chunks are added. A chunk is unique by (source, source_id,
+    chunk_index), so indexing the same message twice adds nothing.
+
+    Args:
+        conn: Open SQLite connection (the caller commits)
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS knowledge_documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            content TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS knowledge_chunks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            source_id INTEGER NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            title TEXT,
+            text TEXT NOT NULL,
+            embedder TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            ledger_version INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_knowledge_chunks_unique'")
+    if cursor.fetchone() is None:
+        # Drop duplicates left by concurrent indexing of one message before chunks were unique
+        cursor.execute('''
+            DELETE FROM knowledge_chunks WHERE id NOT IN (
+                SELECT MIN(id) FROM knowledge_chunks GROUP BY source, source_id, chunk_index
+            )
+        ''')
+        cursor.execute("DROP INDEX IF EXISTS idx_knowledge_chunks_source")
+        cursor.execute(
+            "CREATE UNIQUE INDEX idx_knowledge_chunks_unique ON knowledge_chunks (source, source_id, chunk_index)"
+        )
+
+
+def chunk_text(text: str, max_chars: int = KNOWLEDGE_CHUNK_CHARS, overlap: int = KNOWLEDGE_CHUNK_OVERLAP) -> List[str]:
+    """
+    Split text into chunks of at most `max_chars`, packing whole paragraphs where possible.
+
+    Paragraphs longer than a chunk are cut at sentence or word boundaries, with `overlap`
+    characters repeated at the start of the next piece so a fact split across a cut is still
+    found.
+    """
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text or "") if p.strip()]
+    pieces: List[str] = []
+    for paragraph in paragraphs:
+        while len(paragraph) > max_chars:
+            cut = max(paragraph.rfind(". ", 0, max_chars), paragraph.rfind(" ", 0, max_chars))
+            cut = cut + 1 if cut > max_chars // 2 else max_chars
+            pieces.append(paragraph[:cut].strip())
+            paragraph = paragraph[max(cut - overlap, 1):].lstrip()
+            # Start the carried-over part on a word
+            if " " in paragraph[:overlap]:
+                paragraph = paragraph[paragraph.index(" ") + 1:]
+        pieces.append(paragraph)
+
+    chunks: List[str] = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + 2 + len(piece) <= max_chars:
+            chunks[-1] = f"{chunks[-1]}\n\n{piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+class KnowledgeStore:
+    """
+    Retrieval over a user's earlier chat answers and business documents.
+
+    Chunks are stored in SQLite (`knowledge_chunks`) and searched through an in-memory
+    `VectorIndex` owned by user, loaded lazily and updated incrementally on every insert.
+    Chunks embedded by a different embedder (after EMBEDDING_MODEL changes) are re-embedded
+    when the index is loaded.
+    """
+
+    def __init__(self, db_path: str, embedder: Optional[Embedder] = None):
+        self.db_path = db_path
+        self._embedder = embedder
+        self._index: Optional[VectorIndex] = None
+        self._lock = threading.Lock()
+
+    @property
+    def embedder(self) -> Embedder:
+        if self._embedder is None:
+            self._embedder = create_embedder()
+        return self._embedder
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        started = time.perf_counter()
+        vectors = np.concatenate([
+            self.embedder.embed(texts[i:i + EMBED_BATCH_SIZE]) for i in range(0, len(texts), EMBED_BATCH_SIZE)
+        ]) if texts else np.zeros((0, self.embedder.dim), dtype=np.float32)
+        metrics.observe("knowledge.embed_ms", (time.perf_counter() - started) * 1000)
+        return vectors
+
+    def _load_index(self) -> VectorIndex:
+        with self._lock:
+            if self._index is not None:
+                return self._index
+
+            started = time.perf_counter()
+            conn = sqlite3.connect(self.db_path)
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id, text FROM knowledge_chunks WHERE embedder != ?", (self.embedder.name,))
+                stale = cursor.fetchall()
+                if stale:
+                    vectors = self._embed([text for _, text in stale])
+                    cursor.executemany(
+                        "UPDATE knowledge_chunks SET embedder = ?, embedding = ? WHERE id = ?",
+                        [(self.embedder.name, vector.tobytes(), chunk_id) for (chunk_id, _), vector in zip(stale, vectors)],
+                    )
+                    conn.commit()
+                    logger.info(f"Re-embedded {len(stale)} knowledge chunks with {self.embedder.name}")
+
+                cursor.execute("SELECT id, user_id, embedding FROM knowledge_chunks")
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
+
+            index = VectorIndex(self.embedder.dim)
+            if rows:
+                index.add(
+                    [row[0] for row in rows],
+                    [row[1] for row in rows],
+                    np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32).reshape(len(rows), -1),
+                )
+            self._index = index
+            logger.info(
+                f"Loaded {len(rows)} knowledge chunks into the vector index",
+                extra={"latency_ms": round((time.perf_counter() - started) * 1000, 2), "ivf": index.is_ivf},
+            )
+            return index
+
+    def _add_chunks(
+        self,
+        conn: sqlite3.Connection,
+        user_id: int,
+        source: str,
+        source_id: int,
+        title: str,
+        chunks: List[str],
+    ) -> List[PendingChunk]:
+        """
+        Embed and store chunks, skipping any already stored for the same source.
+
+        Callers load the index before opening their write transaction, since loading may re-embed
+        (and rewrite) stale chunks on a connection of its own, and pass the returned chunks to
+        `_index_chunks` once that transaction has committed.
+
+        Returns:
+            The chunks actually inserted
+        """
+        if not chunks:
+            return []
+        vectors = self._embed(chunks)
+        version = ledger_version(conn)
+        cursor = conn.cursor()
+        added = []
+        for chunk_index, (text, vector) in enumerate(zip(chunks, vectors)):
+            cursor.execute(
+                "INSERT OR IGNORE INTO knowledge_chunks "
+                "(user_id, source, source_id, chunk_index, title, text, embedder, embedding, ledger_version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id, source, source_id, chunk_index, title, text, self.embedder.name, vector.tobytes(), version),
+            )
+            if cursor.rowcount == 1:
+                added.append((cursor.lastrowid, user_id, vector))
+        return added
+
+    def _index_chunks(self, source: str, added: List[PendingChunk]) -> int:
+        """
+        Add committed chunks to the vector index.
+
+        Returns:
+            Number of chunks added
+        """
+        if added:
+            ids, owners, vectors = zip(*added)
+            self._index.add(list(ids), list(owners), np.stack(vectors))
+            metrics.increment("knowledge.chunks_indexed", len(added), source=source)
+        return len(added)
+
+    def _chat_chunks(self, message: str, response: str) -> List[str]:
+        # Every chunk carries the question, so an answer is found by what was asked as well as by its content
+        return [f"Question: {message}\nAnswer: {chunk}" for chunk in chunk_text(response)]
+
+    def index_chat_message(self, message_id: int, user_id: int, message: str, response: Optional[str]) -> int:
+        """
+        Index a saved chat answer so later questions can reuse it.
+
+        Returns:
+            Number of chunks added
+        """
+        if not response:
+            return 0
+        self._load_index()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            added = self._add_chunks(conn, user_id, "chat", message_id, message[:200], self._chat_chunks(message, response))
+            conn.commit()
+        finally:
+            conn.close()
+        return self._index_chunks("chat", added)
+
+    def sync_chat_messages(self, stop: Optional[threading.Event] = None) -> int:
+        """
+        Index chat answers saved before the knowledge store existed (or while indexing failed).
+
+        Args:
+            stop: Set to end the sync early (at shutdown); messages indexed so far are kept
+
+        Returns:
+            Number of messages indexed
+        """
+        self._load_index()
+        conn = sqlite3.connect(self.db_path)
+        added: List[PendingChunk] = []
+        indexed = 0
+        try:
+            rows = conn.execute('''
+                SELECT id, user_id, message, response FROM chat_messages
+                WHERE response IS NOT NULL
+                  AND id NOT IN (SELECT source_id FROM knowledge_chunks WHERE source = 'chat')
+                ORDER BY id
+            ''').fetchall()
+            for message_id, user_id, message, response in rows:
+                if stop is not None and stop.is_set():
+                    break
+                response = decode_text(response)
+                if response:
+                    added += self._add_chunks(conn, user_id, "chat", message_id, message[:200], self._chat_chunks(message, response))
+                indexed += 1
+            conn.commit()
+        finally:
+            conn.close()
+        self._index_chunks("chat", added)
+        if indexed:
+            logger.info(f"Indexed {indexed} earlier chat messages for retrieval")
+        return indexed
+
+    def add_document(self, user_id: int, title: str, content: str) -> Dict[str, Any]:
+        """
+        Store a business document and index its passages.
+
+        Returns:
+            Dict with the document id, title and number of chunks
+        """
+        self._load_index()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO knowledge_documents (user_id, title, content) VALUES (?, ?, ?)",
+                (user_id, title, encode_text(content)),
+            )
+            document_id = cursor.lastrowid
+            added = self._add_chunks(conn, user_id, "document", document_id, title, chunk_text(content))
+            conn.commit()
+        finally:
+            conn.close()
+        return {"id": document_id, "title": title, "chunks": self._index_chunks("document", added)}
+
+    def list_documents(self, user_id: int) -> List[Dict[str, Any]]:
+        """A user's documents (without content), newest first."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute('''
+                SELECT d.id, d.title, d.created_at, COUNT(c.id)
+                FROM knowledge_documents d
+                LEFT JOIN knowledge_chunks c ON c.source = 'document' AND c.source_id = d.id
+                WHERE d.user_id = ?
+                GROUP BY d.id
+                ORDER BY d.id DESC
+            ''', (user_id,)).fetchall()
+        finally:
+            conn.close()
+        return [{"id": i, "title": title, "created_at": created_at, "chunks": chunks} for i, title, created_at, chunks in rows]
+
+    def delete_document(self, user_id: int, document_id: int) -> bool:
+        """
+        Delete one of the user's documents and its chunks.
+
+        Returns:
+            False if the user has no such document
+        """
+        index = self._load_index()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM knowledge_documents WHERE id = ? AND user_id = ?", (document_id, user_id))
+            if cursor.rowcount == 0:
+                return False
+            cursor.execute("SELECT id FROM knowledge_chunks WHERE source = 'document' AND source_id = ?", (document_id,))
+            chunk_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("DELETE FROM knowledge_chunks WHERE source = 'document' AND source_id = ?", (document_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        index.remove(chunk_ids)
+        return True
+
+    def search(
+        self, user_id: int, query: str, limit: int = 5, source: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        The user's passages most similar to `query`.
+
+        Args:
+            user_id: Owner of the chat answers and documents searched
+            query: Search text
+            limit: Maximum passages returned
+            source: Only "chat" or "document" passages
+
+        Returns:
+            Passages (chunk id, source, source_id, title, text, created_at, score, ledger_version), best first
+        """
+        started = time.perf_counter()
+        index = self._load_index()
+        query_vector = self._embed([query])[0]
+        candidates = index.search(query_vector, user_id, limit * KNOWLEDGE_RERANK_FACTOR * (2 if source else 1))
+        if not candidates:
+            return []
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                "SELECT id, source, source_id, title, text, created_at, embedding, ledger_version FROM knowledge_chunks "
+                f"WHERE id IN ({', '.join('?' for _ in candidates)})",
+                [chunk_id for chunk_id, _ in candidates],
+            ).fetchall()
+        finally:
+            conn.close()
+
+        results = []
+        for chunk_id, chunk_source, source_id, title, text, created_at, embedding, version in rows:
+            if source and chunk_source != source:
+                continue
+            # Exact rerank: index scores are approximate once the index is quantized
+            score = float(np.frombuffer(embedding, dtype=np.float32) @ query_vector)
+            if score >= KNOWLEDGE_MIN_SCORE:
+                results.append({
+                    "id": chunk_id,
+                    "source": chunk_source,
+                    "source_id": source_id,
+                    "title": title,
+                    "text": text,
+                    "created_at": created_at,
+                    "score": round(score, 3),
+                    "ledger_version": version,
+                })
+        results.sort(key=lambda result: result["score"], reverse=True)
+        metrics.observe("knowledge.search_ms", (time.perf_counter() - started) * 1000, ivf=index.is_ivf)
+        return results[:limit]
+
+
+_stores: Dict[str, KnowledgeStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_knowledge_store(db_path: str) -> KnowledgeStore:
+    """The process-wide store for a database, so the API and the agent tools share one index."""
+    with _stores_lock:
+        if db_path not in _stores:
+            _stores[db_path] = KnowledgeStore(db_path)
+        return _stores[db_path]
@@ -0,0 +1,274 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, List, Optional, Tuple, Union
+
+import httpx
+from agents import Model, OpenAIResponsesModel
+from ai_agents.utils import metrics
+from ai_agents.utils.log import get_logger
+from ai_agents.utils.trace_store import current_trace
+from openai import AsyncOpenAI
+from openai.types.responses import ResponseStreamEvent
+
+logger = get_logger("llm_client")
+
+# Connection pool
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "30"))
+
+# Timeouts; the read timeout bounds the gap between streamed chunks, not the whole response
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+READ_TIMEOUT_SECONDS = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", "60"))
+
+# Bounded retries with full-jitter exponential backoff on 429/5xx and connection errors
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Hedging: send a duplicate request when the first byte is slower than this percentile of recent requests
+HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1.0"))
+HEDGE_WINDOW = 200
+
+# Point at a local stub server (e.g. http://127.0.0.1:8081/v1) for testing
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+
+class _PrimedStream(httpx.AsyncByteStream):
+    """Response body that replays the already-read first chunk before the rest of the stream."""
+
+    def __init__(self, first_chunk: bytes, iterator: AsyncIterator[bytes], response: httpx.Response):
+        self._first_chunk = first_chunk
+        self._iterator = iterator
+        self._response = response
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        if self._first_chunk:
+            yield self._first_chunk
+        async for chunk in self._iterator:
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._response.aclose()
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport adding bounded retries and optional first-byte hedging around a pooled transport.
+
+    The time to the first body byte is used as the time-to-first-token signal: for streamed
+    responses it arrives with the first SSE event.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        max_retries: int = MAX_RETRIES,
+        hedge_enabled: bool = HEDGE_ENABLED,
+        hedge_percentile: float = HEDGE_PERCENTILE,
+        hedge_min_samples: int = HEDGE_MIN_SAMPLES,
+        hedge_min_delay: float = HEDGE_MIN_DELAY_SECONDS,
+    ):
+        self._transport = transport
+        self.max_retries = max_retries
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self._first_byte_seconds: Deque[float] = deque(maxlen=HEDGE_WINDOW)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for the first byte before hedging, or None while there are too few samples."""
+        if len(self._first_byte_seconds) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._first_byte_seconds)
+        index = min(len(ordered) - 1, int(self.hedge_percentile * len(ordered)))
+        return max(self.hedge_min_delay, ordered[index])
+
+    async def _send_primed(self, request: httpx.Request) -> httpx.Response:
+        # Send once and wait for the first body chunk so "done" means the first token has arrived
+        started = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        iterator = response.stream.__aiter__()
+        try:
+            first_chunk = await iterator.__anext__()
+        except StopAsyncIteration:
+            first_chunk = b""
+        except BaseException:
+            await response.aclose()
+            raise
+
+        elapsed = time.perf_counter() - started
+        if response.status_code < 400:
+            self._first_byte_seconds.append(elapsed)
+            metrics.observe("llm.first_byte_ms", round(elapsed * 1000, 2))
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_PrimedStream(first_chunk, iterator, response),
+            extensions=response.extensions,
+        )
+
+    async def _send_with_retries(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = await self._send_primed(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"LLM request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                delay = backoff_delay(attempt, response.headers.get("retry-after"))
+                await response.aclose()
+                logger.warning(f"LLM request returned {response.status_code}, retrying in {delay:.2f}s")
+
+            metrics.increment("llm.retries")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        delay = self.hedge_delay() if self.hedge_enabled else None
+        if delay is None:
+            return await self._send_with_retries(request)
+
+        primary = asyncio.create_task(self._send_with_retries(request))
+        hedge: Optional["asyncio.Task[httpx.Response]"] = None
+        winner: Optional["asyncio.Task[httpx.Response]"] = None
+        returned = False
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                winner = primary
+            else:
+                metrics.increment("llm.hedges")
+                logger.info(f"No first token after {delay:.2f}s, sending hedged request")
+                hedge = asyncio.create_task(self._send_with_retries(request))
+                winner, _ = await _first_successful(primary, hedge)
+                if winner is hedge:
+                    metrics.increment("llm.hedge_wins")
+            response = winner.result()
+            returned = True
+            return response
+        finally:
+            # asyncio.wait leaves its tasks running when the caller is cancelled (e.g. at a run deadline),
+            # so every request that is not returned is cancelled and its response closed. The cleanup
+            # is shielded so a second cancellation cannot interrupt it halfway.
+            unused = [task for task in (primary, hedge) if task is not None and not (returned and task is winner)]
+            await asyncio.shield(_cancel_all(unused))
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+async def _first_successful(
+    first: "asyncio.Task[httpx.Response]", second: "asyncio.Task[httpx.Response]"
+) -> Tuple["asyncio.Task[httpx.Response]", "asyncio.Task[httpx.Response]"]:
+    # Prefer whichever finishes first without raising; if both fail, the first one's error surfaces
+    done, _ = await asyncio.wait({first, second}, return_when=asyncio.FIRST_COMPLETED)
+    winner = done.pop()
+    other = second if winner is first else first
+    if winner.exception() is not None:
+        await asyncio.wait({other})
+        if other.exception() is None:
+            return other, winner
+    return winner, other
+
+
+async def _cancel_all(tasks: List["asyncio.Task[httpx.Response]"]) -> None:
+    # Cancel requests still in flight and close the responses of those that already arrived
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.wait(tasks)
+    for task in tasks:
+        if not task.cancelled() and task.exception() is None:
+            await task.result().aclose()
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """
+    Full-jitter exponential backoff, honouring a numeric Retry-After header when present.
+
+    Args:
+        attempt: Zero-based retry attempt
+        retry_after: Value of the Retry-After response header
+
+    Returns:
+        Seconds to wait before the next attempt
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def create_llm_client(
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = OPENAI_BASE_URL,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> AsyncOpenAI:
+    """
+    Create the shared AsyncOpenAI client with a tuned connection pool, timeouts, retries and hedging.
+
+    The SDK's own retries are disabled so every request gets exactly the retry policy above.
+
+    Args:
+        api_key: OpenAI API key (default: OPENAI_API_KEY env var)
+        base_url: API base URL override, e.g. a local stub server
+        transport: Inner transport to wrap (default: a pooled AsyncHTTPTransport)
+
+    Returns:
+        Configured AsyncOpenAI client
+    """
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+    )
+    timeout = httpx.Timeout(READ_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS)
+    http_client = httpx.AsyncClient(
+        transport=ResilientTransport(transport or httpx.AsyncHTTPTransport(limits=limits)),
+        timeout=timeout,
+    )
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout, http_client=http_client)
+
+
+class TracedResponsesModel(OpenAIResponsesModel):
+    """Responses model that reports each streamed call to the trace of the run in progress."""
+
+    async def stream_response(self, *args, **kwargs) -> AsyncIterator[ResponseStreamEvent]:
+        trace = current_trace.get()
+        if trace is not None:
+            trace.model_started()
+        async for event in super().stream_response(*args, **kwargs):
+            if trace is not None:
+                trace.observe_event(event)
+            yield event
+
+
+def build_model(model: str, openai_client: Optional[AsyncOpenAI] = None) -> Union[str, Model]:
+    """
+    Bind a model name to the shared client (its calls are recorded in the run's trace), or leave it
+    as a name for the SDK default client.
+
+    Args:
+        model: Model name, e.g. "gpt-4.1"
+        openai_client: Shared client from `create_llm_client`
+    """
+    if openai_client is None:
+        return model
+    return TracedResponsesModel(model=model, openai_client=openai_client)
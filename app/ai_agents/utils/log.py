@@ -1,72 +1,172 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+import uuid
+from datetime import datetime, timezone
 from typing import Optional
 
+# Correlation ID of the request being handled, attached to every record logged while handling it
+correlation_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("correlation_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is emitted as a field
+_RESERVED_ATTRS = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {
+    "message", "asctime", "correlation_id", "sample_rate", "taskName",
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def new_correlation_id() -> str:
+    """Start a new correlation ID for the current context and return it."""
+    correlation_id = uuid.uuid4().hex[:16]
+    correlation_id_var.set(correlation_id)
+    return correlation_id
+
+
+class CorrelationFilter(logging.Filter):
+    """Attach the current correlation ID to each record (runs in the caller's context)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drop a share of high-volume records.
+
+    A record opts in with `extra={"sample_rate": 0.1}` to be kept 10% of the time.
+    Warnings and errors are never sampled.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        sample_rate = getattr(record, "sample_rate", None)
+        if sample_rate is None or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < sample_rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including `extra=` fields such as latency_ms."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        correlation_id = getattr(record, "correlation_id", None)
+        if correlation_id:
+            payload["correlation_id"] = correlation_id
+
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+
+        return json.dumps(payload, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """VS Code friendly single-line format with the correlation ID appended when present."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        correlation_id = getattr(record, "correlation_id", None)
+        return f"{line} | {correlation_id}" if correlation_id else line
+
+
+def _default_log_format() -> str:
+    if os.getenv("LOG_FORMAT"):
+        return os.getenv("LOG_FORMAT", "console").lower()
+    return "console" if os.getenv("DEBUG", "False").lower() == "true" else "json"
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 
 def setup_logging(
     level: int = logging.INFO,
     logger_name: Optional[str] = None,
     format_string: str = '%(asctime)s | %(name)s | %(levelname)s | %(message)s',
-    date_format: str = '%H:%M:%S'
+    date_format: str = '%H:%M:%S',
+    log_format: Optional[str] = None,
 ) -> logging.Logger:
     """
-    Set up logging configuration optimized for VS Code debug console.
-    
+    Set up queue-based logging so request handlers never block on stdout.
+
+    The root logger gets a single QueueHandler; a QueueListener thread formats and writes
+    records to stdout. Records carry the current correlation ID and can be sampled.
+
     Args:
         level: Logging level (default: INFO)
         logger_name: Name for the logger (default: None for root logger)
-        format_string: Log message format
-        date_format: Date format for timestamps
-    
+        format_string: Log message format for the console format
+        date_format: Date format for timestamps in the console format
+        log_format: "json" for structured records or "console" for the VS Code debug console
+            (default: LOG_FORMAT env var, else console when DEBUG=true and json otherwise)
+
     Returns:
         Configured logger instance
     """
-    
+    global _listener
+
     # Configure root logger only once
     root_logger = logging.getLogger()
-    if not root_logger.handlers:
-        # Enhanced logging configuration for VS Code debug console
-        logging.basicConfig(
-            level=level,
-            format=format_string,
-            datefmt=date_format,
-            handlers=[
-                logging.StreamHandler(sys.stdout)  # Ensures output goes to console that VS Code can capture
-            ]
-        )
-    
+    if _listener is None:
+        log_format = log_format or _default_log_format()
+
+        stream_handler = logging.StreamHandler(sys.stdout)  # Ensures output goes to console that VS Code can capture
+        if log_format == "json":
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(ConsoleFormatter(fmt=format_string, datefmt=date_format))
+
+        log_queue: queue.Queue = queue.Queue(-1)
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(CorrelationFilter())
+        queue_handler.addFilter(SamplingFilter())
+
+        for handler in list(root_logger.handlers):
+            root_logger.removeHandler(handler)
+        root_logger.addHandler(queue_handler)
+        root_logger.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+
     # Get specific logger if name provided
     if logger_name:
         logger = logging.getLogger(logger_name)
-        
-        # Add dedicated handler for named loggers to ensure they show up in VS Code
-        if not logger.handlers:
-            console_handler = logging.StreamHandler(sys.stdout)
-            console_handler.setLevel(level)
-            
-            formatter = logging.Formatter(
-                fmt=format_string,
-                datefmt=date_format
-            )
-            console_handler.setFormatter(formatter)
-            
-            logger.addHandler(console_handler)
-            logger.setLevel(level)
-            logger.propagate = False  # Prevent duplicate messages
-            
+        # Named loggers propagate to the root queue handler
+        logger.setLevel(level)
         return logger
-    
+
     return root_logger
 
 
 def get_logger(name: str) -> logging.Logger:
     """
     Get a configured logger instance.
-    
+
     Args:
         name: Logger name
-        
+
     Returns:
         Configured logger instance
     """
-    return setup_logging(logger_name=name)
\ No newline at end of file
+    return setup_logging(logger_name=name)
@@ -0,0 +1,91 @@
+import threading
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Tuple
+
+# Number of recent observations kept per series for percentile estimates
+WINDOW_SIZE = 500
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Tuple[Tuple[str, Any], ...]], float] = defaultdict(float)
+_observations: Dict[Tuple[str, Tuple[Tuple[str, Any], ...]], Deque[float]] = {}
+_totals: Dict[Tuple[str, Tuple[Tuple[str, Any], ...]], Dict[str, float]] = {}
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Tuple[Tuple[str, Any], ...]]:
+    return name, tuple(sorted(labels.items()))
+
+
+def increment(name: str, amount: float = 1, **labels: Any) -> None:
+    """
+    Add to an in-process counter.
+
+    Args:
+        name: Counter name (e.g. "banksie.runs")
+        amount: Amount to add
+        **labels: Labels that split the counter into series (e.g. tier="simple")
+    """
+    with _lock:
+        _counters[_key(name, labels)] += amount
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """
+    Record one observation (e.g. a latency) for a series.
+
+    Args:
+        name: Series name (e.g. "banksie.latency_ms")
+        value: Observed value
+        **labels: Labels that split the observations into series
+    """
+    key = _key(name, labels)
+    with _lock:
+        window = _observations.setdefault(key, deque(maxlen=WINDOW_SIZE))
+        window.append(value)
+        totals = _totals.setdefault(key, {"count": 0, "sum": 0.0})
+        totals["count"] += 1
+        totals["sum"] += value
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _series_name(key: Tuple[str, Tuple[Tuple[str, Any], ...]]) -> str:
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    Return the current counters and observation summaries.
+
+    Returns:
+        Dict with "counters" (series -> value) and "observations" (series -> count, mean,
+        p50, p95 and max over the recent window)
+    """
+    with _lock:
+        counters = {_series_name(key): value for key, value in _counters.items()}
+        observations = {}
+        for key, window in _observations.items():
+            values = list(window)
+            totals = _totals[key]
+            observations[_series_name(key)] = {
+                "count": totals["count"],
+                "mean": round(totals["sum"] / totals["count"], 2),
+                "p50": _percentile(values, 0.5),
+                "p95": _percentile(values, 0.95),
+                "max": max(values),
+            }
+    return {"counters": counters, "observations": observations}
+
+
+def reset() -> None:
+    """Clear all counters and observations."""
+    with _lock:
+        _counters.clear()
+        _observations.clear()
+        _totals.clear()
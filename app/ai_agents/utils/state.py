@@ -1,13 +1,31 @@
 from dataclasses import dataclass, field
-from typing import Literal
+from typing import Any, Dict, List, Literal, Optional
+
+from ai_agents.utils.trace_store import RunTrace
+from ledger.loader import TransactionSource
 
 
 @dataclass
 class StateContext:
     # User prompt
     prompt: str = field(default="")
-    # Step number
+    # User the run is for
+    user_id: Optional[int] = None
+    username: str = ""
+    # Step number (tool calls made so far in this run)
     step: int = 0
-    # Transaction data
-    transaction_data: list[dict] = field(default_factory=list)
+    # Run budget: time.monotonic() deadline and maximum tool calls (set by budget.start_budget)
+    deadline: Optional[float] = None
+    max_steps: int = 0
+    # "steps", "deadline" or "stream_deadline" once the budget has run out
+    budget_exhausted: Optional[str] = None
+    # Lazy handle on the transaction data, rows are only read when a tool asks for them
+    transactions: Optional[TransactionSource] = None
+    # Model tier the prompt was routed to, and whether a failed tool call escalated it
+    model_tier: str = ""
+    escalated: bool = False
+    # Tables and series the analysis code showed to the user, streamed and saved with the message
+    artifacts: List[Dict[str, Any]] = field(default_factory=list)
+    # Spans of this run (model calls, tool executions), written to agent_spans when it finishes
+    trace: Optional[RunTrace] = None
     
\ No newline at end of file
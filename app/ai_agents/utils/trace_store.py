@@ -0,0 +1,355 @@
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import astuple, dataclass, fields
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from ai_agents.utils import metrics
+from ai_agents.utils.log import get_logger
+
+logger = get_logger("trace_store")
+
+# Spans are written in batches: when this many are buffered, or every TRACE_FLUSH_SECONDS
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "200"))
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "2"))
+# Oldest spans are dropped beyond this many buffered (e.g. while the database is locked)
+TRACE_MAX_BUFFER = int(os.getenv("TRACE_MAX_BUFFER", "10000"))
+
+# Stats can be grouped by these dimensions (query parameter -> column)
+GROUP_COLUMNS = {
+    "model": "name",
+    "tier": "model_tier",
+    "prompt_type": "prompt_type",
+    "user": "user_id",
+}
+SPAN_KINDS = ("run", "model", "tool")
+
+# Trace of the agent run in progress; the runner's task inherits it, so the model can report its calls
+current_trace: ContextVar[Optional["RunTrace"]] = ContextVar("current_trace", default=None)
+
+
+@dataclass
+class Span:
+    # Field order matches the agent_spans columns after id
+    run_id: str
+    # "run" (whole agent run), "model" (one model call) or "tool" (one tool execution)
+    kind: str
+    # Model name for run/model spans, tool name for tool spans
+    name: str
+    # Unix time the span started
+    started_at: float
+    duration_ms: float
+    step: int = 0
+    # Time from span start to the first streamed token (run and model spans)
+    first_token_ms: Optional[float] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    status: str = "ok"
+    # Filled in for every span of the run when it finishes
+    chat_message_id: Optional[int] = None
+    user_id: Optional[int] = None
+    model_tier: str = ""
+    prompt_type: str = ""
+
+
+SPAN_COLUMNS = [f.name for f in fields(Span)]
+
+
+def ensure_trace_schema(conn: sqlite3.Connection) -> None:
+    """Create the `agent_spans` table holding one row per run, model call and tool execution."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS agent_spans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            duration_ms REAL NOT NULL,
+            step INTEGER NOT NULL DEFAULT 0,
+            first_token_ms REAL,
+            input_tokens INTEGER NOT NULL DEFAULT 0,
+            output_tokens INTEGER NOT NULL DEFAULT 0,
+            cost_usd REAL NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'ok',
+            chat_message_id INTEGER REFERENCES chat_messages (id),
+            user_id INTEGER,
+            model_tier TEXT,
+            prompt_type TEXT
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_agent_spans_message ON agent_spans (chat_message_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_agent_spans_kind ON agent_spans (kind, started_at)")
+
+
+class RunTrace:
+    """
+    Collects the spans of one agent run in memory.
+
+    Model calls are reported by the traced model as they stream (start, first token, and the
+    `response.completed` event carrying the call's token usage); tool executions are timed by
+    the run hook. `finish` returns the spans for the TraceWriter.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        user_id: Optional[int] = None,
+        model_tier: str = "",
+        prompt_type: str = "",
+        cost: Optional[Callable[[str, int, int], float]] = None,
+    ):
+        self.run_id = uuid.uuid4().hex
+        self.model = model
+        self.user_id = user_id
+        self.model_tier = model_tier
+        self.prompt_type = prompt_type
+        # Prices a model call from (model, input_tokens, output_tokens)
+        self.cost = cost
+        self.spans: List[Span] = []
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._turn_started = self._started
+        self._first_token: Optional[float] = None
+        self._tools: Dict[str, List[float]] = {}
+
+    def _elapsed_ms(self, since: float, until: Optional[float] = None) -> float:
+        return round(((until or time.perf_counter()) - since) * 1000, 2)
+
+    def _unix(self, perf: float) -> float:
+        return self.started_at + (perf - self._started)
+
+    def model_started(self) -> None:
+        """Mark the start of a model call."""
+        self._turn_started = time.perf_counter()
+        self._first_token = None
+
+    def observe_event(self, event: Any) -> None:
+        """Update the current model call from one of its response stream events."""
+        event_type = getattr(event, "type", "")
+        if event_type.endswith(".delta") and self._first_token is None:
+            self._first_token = time.perf_counter()
+        elif event_type == "response.completed":
+            response = event.response
+            usage = response.usage
+            input_tokens = usage.input_tokens if usage else 0
+            output_tokens = usage.output_tokens if usage else 0
+            self.spans.append(Span(
+                run_id=self.run_id,
+                kind="model",
+                name=response.model or self.model,
+                started_at=self._unix(self._turn_started),
+                duration_ms=self._elapsed_ms(self._turn_started),
+                step=sum(1 for span in self.spans if span.kind == "model") + 1,
+                first_token_ms=self._elapsed_ms(self._turn_started, self._first_token) if self._first_token else None,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                cost_usd=self.cost(response.model or self.model, input_tokens, output_tokens) if self.cost else 0.0,
+                status=response.status or "ok",
+            ))
+
+    def tool_started(self, name: str) -> None:
+        """Mark the start of a tool execution."""
+        self._tools.setdefault(name, []).append(time.perf_counter())
+
+    def tool_ended(self, name: str, step: int, status: str = "ok") -> None:
+        """Record a finished tool execution."""
+        starts = self._tools.get(name)
+        started = starts.pop(0) if starts else self._turn_started
+        self.spans.append(Span(
+            run_id=self.run_id,
+            kind="tool",
+            name=name,
+            started_at=self._unix(started),
+            duration_ms=self._elapsed_ms(started),
+            step=step,
+            status=status,
+        ))
+
+    def finish(
+        self, chat_message_id: Optional[int] = None, status: str = "ok", first_token_ms: Optional[float] = None
+    ) -> List[Span]:
+        """
+        Close the run and return all its spans, linked to the saved chat message.
+
+        Args:
+            chat_message_id: chat_messages.id of the saved answer (None if it was not saved)
+            status: "ok", "incomplete" or "error"
+            first_token_ms: Time to the first answer chunk sent to the client
+
+        Returns:
+            The run span followed by its model and tool spans
+        """
+        model_spans = [span for span in self.spans if span.kind == "model"]
+        run_span = Span(
+            run_id=self.run_id,
+            kind="run",
+            name=self.model,
+            started_at=self.started_at,
+            duration_ms=self._elapsed_ms(self._started),
+            step=len(model_spans),
+            first_token_ms=first_token_ms,
+            input_tokens=sum(span.input_tokens for span in model_spans),
+            output_tokens=sum(span.output_tokens for span in model_spans),
+            cost_usd=sum(span.cost_usd for span in model_spans),
+            status=status,
+        )
+        spans = [run_span] + self.spans
+        for span in spans:
+            span.chat_message_id = chat_message_id
+            span.user_id = self.user_id
+            span.model_tier = self.model_tier
+            span.prompt_type = self.prompt_type
+        return spans
+
+
+class TraceWriter:
+    """
+    Buffers spans in memory and writes them to `agent_spans` in batches from a background task,
+    so recording a trace never waits on the database.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._buffer: List[Span] = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the flush loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def submit(self, spans: List[Span]) -> None:
+        """Queue spans for writing."""
+        self._buffer.extend(spans)
+        overflow = len(self._buffer) - TRACE_MAX_BUFFER
+        if overflow > 0:
+            del self._buffer[:overflow]
+            metrics.increment("traces.dropped", overflow)
+        if len(self._buffer) >= TRACE_BATCH_SIZE:
+            self._wake.set()
+
+    async def flush(self) -> None:
+        """Write the buffered spans in one transaction, keeping them for the next try on errors."""
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, batch)
+            metrics.increment("traces.spans_written", len(batch))
+        except sqlite3.Error as e:
+            logger.error(f"Could not write {len(batch)} trace spans: {e}")
+            self._buffer[:0] = batch
+
+    def _write(self, batch: List[Span]) -> None:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany(
+                f"INSERT INTO agent_spans ({', '.join(SPAN_COLUMNS)}) VALUES ({', '.join('?' * len(SPAN_COLUMNS))})",
+                [astuple(span) for span in batch]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=TRACE_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+
+def message_spans(db_path: str, chat_message_id: int) -> List[Dict[str, Any]]:
+    """
+    Return the spans recorded for one chat message, in start order.
+
+    Args:
+        db_path: Path to the SQLite database
+        chat_message_id: chat_messages.id
+
+    Returns:
+        List of span dicts
+    """
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            "SELECT * FROM agent_spans WHERE chat_message_id = ? ORDER BY started_at, id", (chat_message_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def span_stats(db_path: str, group_by: str = "model", kind: str = "model", days: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Latency and cost percentiles of spans of one kind, per group.
+
+    Args:
+        db_path: Path to the SQLite database
+        group_by: "model", "tier", "prompt_type" or "user"
+        kind: "run", "model" or "tool" spans
+        days: Only include spans from the last `days` days
+
+    Returns:
+        One dict per group with count, latency_ms and first_token_ms percentiles (p50/p95/p99),
+        cost_usd percentiles and total, and total input/output tokens; busiest group first
+
+    Raises:
+        KeyError: If group_by is unknown
+    """
+    column = GROUP_COLUMNS[group_by]
+    query = (
+        f"SELECT {column} AS grp, duration_ms, first_token_ms, cost_usd, input_tokens, output_tokens "
+        "FROM agent_spans WHERE kind = ?"
+    )
+    params: List[Any] = [kind]
+    if days:
+        query += " AND started_at >= ?"
+        params.append(time.time() - days * 86400)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+    def percentiles(values: pd.Series) -> Dict[str, Optional[float]]:
+        values = values.dropna()
+        if values.empty:
+            return {"p50": None, "p95": None, "p99": None}
+        return {f"p{int(q * 100)}": round(float(values.quantile(q)), 6) for q in (0.5, 0.95, 0.99)}
+
+    stats = []
+    for group, rows in df.groupby("grp", dropna=False):
+        stats.append({
+            group_by: None if pd.isna(group) else int(group) if group_by == "user" else group,
+            "count": len(rows),
+            "latency_ms": percentiles(rows["duration_ms"]),
+            "first_token_ms": percentiles(rows["first_token_ms"]),
+            "cost_usd": {**percentiles(rows["cost_usd"]), "total": round(float(rows["cost_usd"].sum()), 6)},
+            "input_tokens": int(rows["input_tokens"].sum()),
+            "output_tokens": int(rows["output_tokens"].sum()),
+        })
+    return sorted(stats, key=lambda group: group["count"], reverse=True)
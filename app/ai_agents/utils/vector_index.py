@@ -0,0 +1,202 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Below this many vectors search is an exact scan; above it vectors move into an IVF index
+VECTOR_IVF_MIN_VECTORS = int(os.getenv("VECTOR_IVF_MIN_VECTORS", "20000"))
+# IVF lists scanned per query
+VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+KMEANS_ITERATIONS = 10
+KMEANS_MAX_SAMPLE = 50000
+# Owner value of removed vectors; they stay in place until the next retrain
+REMOVED = -1
+
+
+class _Rows:
+    """Append-only parallel arrays (ids, owners, vectors) with amortized doubling."""
+
+    def __init__(self, dim: int, dtype: type):
+        self.size = 0
+        self.ids = np.zeros(16, dtype=np.int64)
+        self.owners = np.zeros(16, dtype=np.int64)
+        self.vectors = np.zeros((16, dim), dtype=dtype)
+        self.scales = np.zeros(16, dtype=np.float32)
+
+    def append(self, ids: np.ndarray, owners: np.ndarray, vectors: np.ndarray, scales: Optional[np.ndarray] = None):
+        needed = self.size + len(ids)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids))
+            for name in ("ids", "owners", "vectors", "scales"):
+                old = getattr(self, name)
+                new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[: self.size] = old[: self.size]
+                setattr(self, name, new)
+        self.ids[self.size:needed] = ids
+        self.owners[self.size:needed] = owners
+        self.vectors[self.size:needed] = vectors
+        if scales is not None:
+            self.scales[self.size:needed] = scales
+        self.size = needed
+
+
+def _quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric int8 quantization with one scale per vector (4x smaller than float32)."""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def _kmeans(vectors: np.ndarray, k: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on normalized vectors; returns (k, dim) normalized centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for cluster in range(k):
+            members = vectors[assignment == cluster]
+            # Re-seed empty clusters so every list gets used
+            centroids[cluster] = members.sum(axis=0) if len(members) else vectors[rng.integers(len(vectors))]
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+class VectorIndex:
+    """
+    In-memory cosine-similarity index over normalized vectors, each with an integer id and owner.
+
+    Small indexes keep float32 vectors in one matrix and scan it exactly. Once they reach
+    `ivf_min_vectors` the vectors are clustered with k-means (about sqrt(n) lists) and stored
+    int8-quantized per list; a query scans the `nprobe` closest lists, so results are
+    approximate and callers should rerank with exact vectors. Inserts are incremental in both
+    modes (new vectors join their closest list); the lists are retrained when the index has
+    doubled since the last training.
+    """
+
+    def __init__(self, dim: int, ivf_min_vectors: int = VECTOR_IVF_MIN_VECTORS, nprobe: int = VECTOR_IVF_NPROBE):
+        self.dim = dim
+        self.ivf_min_vectors = ivf_min_vectors
+        self.nprobe = nprobe
+        self._flat = _Rows(dim, np.float32)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[_Rows] = []
+        self._trained_size = 0
+        self._positions: Dict[int, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def is_ivf(self) -> bool:
+        return self._centroids is not None
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def add(self, ids: List[int], owners: List[int], vectors: np.ndarray) -> None:
+        """
+        Add vectors (already L2-normalized).
+
+        Args:
+            ids: Unique ids (e.g. chunk ids)
+            owners: Owner per vector; searches only return vectors of one owner
+            vectors: Array of shape (len(ids), dim)
+        """
+        if not len(ids):
+            return
+        ids_array = np.asarray(ids, dtype=np.int64)
+        owners_array = np.asarray(owners, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.is_ivf:
+                self._add_ivf(ids_array, owners_array, vectors)
+            else:
+                start = self._flat.size
+                self._flat.append(ids_array, owners_array, vectors)
+                self._positions.update((int(i), (-1, start + n)) for n, i in enumerate(ids_array))
+            if len(self._positions) >= self.ivf_min_vectors and len(self._positions) >= 2 * self._trained_size:
+                self._train()
+
+    def _add_ivf(self, ids: np.ndarray, owners: np.ndarray, vectors: np.ndarray) -> None:
+        codes, scales = _quantize(vectors)
+        assignment = np.argmax(vectors @ self._centroids.T, axis=1)
+        for cluster in np.unique(assignment):
+            members = assignment == cluster
+            rows = self._lists[cluster]
+            start = rows.size
+            rows.append(ids[members], owners[members], codes[members], scales[members])
+            self._positions.update((int(i), (int(cluster), start + n)) for n, i in enumerate(ids[members]))
+
+    def _live(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """All non-removed ids, owners and float32 vectors (dequantized in IVF mode)."""
+        if not self.is_ivf:
+            rows = self._flat
+            keep = rows.owners[: rows.size] != REMOVED
+            return rows.ids[: rows.size][keep], rows.owners[: rows.size][keep], rows.vectors[: rows.size][keep]
+        parts = []
+        for rows in self._lists:
+            keep = rows.owners[: rows.size] != REMOVED
+            vectors = rows.vectors[: rows.size][keep].astype(np.float32) * rows.scales[: rows.size][keep, None]
+            parts.append((rows.ids[: rows.size][keep], rows.owners[: rows.size][keep], vectors))
+        return (
+            np.concatenate([p[0] for p in parts]),
+            np.concatenate([p[1] for p in parts]),
+            np.concatenate([p[2] for p in parts]),
+        )
+
+    def _train(self) -> None:
+        ids, owners, vectors = self._live()
+        n_lists = max(1, int(np.sqrt(len(ids))))
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), KMEANS_MAX_SAMPLE), replace=False)]
+        self._centroids = _kmeans(sample, n_lists)
+        self._lists = [_Rows(self.dim, np.int8) for _ in range(n_lists)]
+        self._positions = {}
+        self._add_ivf(ids, owners, vectors)
+        self._trained_size = len(ids)
+        self._flat = _Rows(self.dim, np.float32)
+
+    def remove(self, ids: List[int]) -> None:
+        """Drop vectors by id (unknown ids are ignored)."""
+        with self._lock:
+            for i in ids:
+                position = self._positions.pop(int(i), None)
+                if position is None:
+                    continue
+                cluster, row = position
+                (self._flat if cluster < 0 else self._lists[cluster]).owners[row] = REMOVED
+
+    def search(self, query: np.ndarray, owner: int, k: int) -> List[Tuple[int, float]]:
+        """
+        Nearest vectors of one owner by cosine similarity.
+
+        Args:
+            query: Normalized query vector of shape (dim,)
+            owner: Only vectors added with this owner are returned
+            k: Number of results
+
+        Returns:
+            (id, score) pairs, best first; scores are approximate in IVF mode
+        """
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            if not self.is_ivf:
+                rows = self._flat
+                scores = rows.vectors[: rows.size] @ query
+                ids = rows.ids[: rows.size]
+                mask = rows.owners[: rows.size] == owner
+            else:
+                probes = np.argsort(self._centroids @ query)[::-1][: self.nprobe]
+                score_parts, id_parts, mask_parts = [], [], []
+                for cluster in probes:
+                    rows = self._lists[cluster]
+                    score_parts.append((rows.vectors[: rows.size] @ query) * rows.scales[: rows.size])
+                    id_parts.append(rows.ids[: rows.size])
+                    mask_parts.append(rows.owners[: rows.size] == owner)
+                scores, ids, mask = np.concatenate(score_parts), np.concatenate(id_parts), np.concatenate(mask_parts)
+
+            scores, ids = scores[mask], ids[mask]
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+                scores, ids = scores[top], ids[top]
+            order = np.argsort(-scores)
+            return [(int(ids[i]), float(scores[i])) for i in order]
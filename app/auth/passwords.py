@@ -0,0 +1,96 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import bcrypt
+
+from ai_agents.utils import metrics
+
+# bcrypt releases the GIL while hashing, so a small thread pool keeps it off the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hash requests waiting beyond this many are rejected instead of queueing up behind a login wave
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+# Checks for throttled clients may hold at most this many pool slots (running or waiting) at once
+PASSWORD_HASH_LIMITED_SLOTS = int(os.getenv("PASSWORD_HASH_LIMITED_SLOTS", "1"))
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash requests are already waiting."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and checks in a dedicated bounded thread pool.
+
+    At most `workers` hashes run at once (each takes hundreds of milliseconds of CPU), so an
+    auth burst cannot starve the event loop or the default executor that serves the rest of
+    the API; at most `max_pending` requests wait for a worker. Limited requests (from throttled
+    clients) share `limited_slots` slots, so they cannot take over the pool.
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        limited_slots: int = PASSWORD_HASH_LIMITED_SLOTS,
+    ):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.limited_slots = max(1, limited_slots)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._limited_pending = 0
+
+    async def _run(self, operation: str, fn: Callable[..., Any], *args: Any, limited: bool = False) -> Any:
+        if self._pending >= self.workers + self.max_pending or (limited and self._limited_pending >= self.limited_slots):
+            metrics.increment("auth.hash_rejected", operation=operation, limited=limited)
+            raise PasswordHasherBusy()
+
+        self._pending += 1
+        self._limited_pending += limited
+        queued = time.perf_counter()
+
+        def timed() -> Any:
+            started = time.perf_counter()
+            metrics.observe("auth.hash_wait_ms", (started - queued) * 1000, operation=operation)
+            try:
+                return fn(*args)
+            finally:
+                metrics.observe("auth.hash_ms", (time.perf_counter() - started) * 1000, operation=operation)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self._pending -= 1
+            self._limited_pending -= limited
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password with a fresh salt.
+
+        Raises:
+            PasswordHasherBusy: If the pool's queue is full
+        """
+        hashed = await self._run("hash", bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt())
+        return hashed.decode("utf-8")
+
+    async def verify(self, password: str, hashed: str, limited: bool = False) -> bool:
+        """
+        Check a password against a stored bcrypt hash.
+
+        Args:
+            password: Password to check
+            hashed: Stored bcrypt hash
+            limited: Run on the small budget shared by throttled clients
+
+        Raises:
+            PasswordHasherBusy: If the pool's queue (or the limited budget) is full
+        """
+        return await self._run(
+            "verify", bcrypt.checkpw, password.encode("utf-8"), hashed.encode("utf-8"), limited=limited
+        )
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque
+
+# Failed logins allowed per username from one client address, and per client address, within the window
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "20"))
+LOGIN_FAILURE_WINDOW_SECONDS = float(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", "300"))
+# Least recently failing keys are forgotten beyond this many
+LOGIN_THROTTLE_MAX_KEYS = 10000
+
+
+class LoginThrottle:
+    """
+    Sliding-window limit on failed logins per key (a client address and username, or a client address).
+
+    Throttled attempts are rejected before their password is hashed, so guessing cannot be used
+    to keep the bcrypt pool busy.
+    """
+
+    def __init__(
+        self,
+        max_failures: int = LOGIN_MAX_FAILURES,
+        window_seconds: float = LOGIN_FAILURE_WINDOW_SECONDS,
+        max_keys: int = LOGIN_THROTTLE_MAX_KEYS,
+    ):
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._failures: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recent(self, key: str, now: float) -> Deque[float]:
+        failures = self._failures.get(key)
+        if failures is None:
+            return deque()
+        while failures and now - failures[0] > self.window_seconds:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+        return failures
+
+    def retry_after(self, key: str) -> float:
+        """Seconds until `key` may try again (0 if it is not throttled)."""
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent(key, now)
+            if len(failures) < self.max_failures:
+                return 0.0
+            return max(0.0, failures[-self.max_failures] + self.window_seconds - now)
+
+    def record_failure(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent(key, now)
+            failures.append(now)
+            self._failures[key] = failures
+            self._failures.move_to_end(key)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    def reset(self, key: str):
+        with self._lock:
+            self._failures.pop(key, None)
@@ -0,0 +1,500 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ai_agents.utils.log import get_logger
+from ledger.balances import LEDGER_VIEW
+from ledger.money import to_cents
+
+logger = get_logger("ledger.archive")
+
+# Column order of the logical transactions table (hot SQLite rows and cold Parquet rows)
+TRANSACTION_COLUMNS = [
+    "id",
+    "transaction_date",
+    "description",
+    "category",
+    "transaction_type",
+    "amount_cents",
+    "balance_cents",
+    "reference_number",
+    "status",
+    "created_at",
+    "counterparty_id",
+]
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("transaction_date", pa.string()),
+    ("description", pa.string()),
+    ("category", pa.string()),
+    ("transaction_type", pa.string()),
+    ("amount_cents", pa.int64()),
+    ("balance_cents", pa.int64()),
+    ("reference_number", pa.string()),
+    ("status", pa.string()),
+    ("created_at", pa.string()),
+    ("counterparty_id", pa.int64()),
+])
+
+MANIFEST_FILE = "_manifest.json"
+PARTITION_FILE = "transactions.parquet"
+# SQLite copy of the archive that read-only SQL queries attach, rebuilt when the manifest changes
+QUERY_CACHE_FILE = "_query_cache.sqlite"
+QUERY_CACHE_BATCH_ROWS = 10000
+
+_query_cache_lock = threading.Lock()
+
+
+def archive_cutoff(hot_months: int, today: Optional[date] = None) -> str:
+    """
+    Return the first day of the oldest month that stays in SQLite.
+
+    Args:
+        hot_months: Number of months (including the current one) kept in the hot tier
+        today: Reference date (default: today)
+
+    Returns:
+        ISO date string; months strictly before it are considered closed
+    """
+    today = today or date.today()
+    month_index = today.year * 12 + (today.month - 1) - (hot_months - 1)
+    return date(month_index // 12, month_index % 12 + 1, 1).isoformat()
+
+
+def load_manifest(archive_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the partition manifest, keyed by month ("YYYY-MM").
+
+    The manifest holds per-partition column statistics (row count, date and amount ranges)
+    so the reader can prune partitions without opening any Parquet footers.
+    """
+    manifest_path = os.path.join(archive_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def archived_through(archive_dir: str) -> Optional[str]:
+    """Return the last transaction date held in the archive, or None if nothing is archived."""
+    manifest = load_manifest(archive_dir)
+    return max((stats["max_date"] for stats in manifest.values()), default=None)
+
+
+def _write_manifest(archive_dir: str, manifest: Dict[str, Dict[str, Any]]) -> None:
+    manifest_path = os.path.join(archive_dir, MANIFEST_FILE)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _partition_path(archive_dir: str, month: str) -> str:
+    return os.path.join(archive_dir, f"month={month}", PARTITION_FILE)
+
+
+def _partition_stats(table: pa.Table, month: str) -> Dict[str, Any]:
+    dates = table.column("transaction_date").to_pylist()
+    amounts = table.column("amount_cents").to_pylist()
+    return {
+        "file": os.path.join(f"month={month}", PARTITION_FILE),
+        "rows": table.num_rows,
+        "min_date": min(dates),
+        "max_date": max(dates),
+        "min_amount_cents": min(amounts),
+        "max_amount_cents": max(amounts),
+    }
+
+
+def archive_closed_months(db_path: str, archive_dir: str, hot_months: int) -> int:
+    """
+    Move closed months from the SQLite transactions table into per-month Parquet partitions.
+
+    Each month is written to its own partition (with Parquet column statistics) and the
+    manifest is updated before the rows are deleted from SQLite, so a crash part way through
+    can only leave rows duplicated in SQLite, never lost. Re-archiving a month merges with
+    the existing partition.
+
+    Args:
+        db_path: Path to the SQLite database
+        archive_dir: Root directory of the Parquet archive
+        hot_months: Number of recent months to keep in SQLite
+
+    Returns:
+        Number of rows moved to the archive
+    """
+    if hot_months <= 0:
+        return 0
+
+    cutoff = archive_cutoff(hot_months)
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = load_manifest(archive_dir)
+    archived_rows = 0
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT DISTINCT substr(transaction_date, 1, 7) FROM transactions WHERE transaction_date < ? ORDER BY 1",
+            (cutoff,)
+        )
+        months = [row[0] for row in cursor.fetchall()]
+
+        for month in months:
+            cursor.execute(
+                f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM {LEDGER_VIEW} "
+                "WHERE substr(transaction_date, 1, 7) = ? ORDER BY transaction_date, id",
+                (month,)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                continue
+
+            new_table = pa.Table.from_pylist(
+                [dict(zip(TRANSACTION_COLUMNS, row)) for row in rows], schema=ARCHIVE_SCHEMA
+            )
+
+            path = _partition_path(archive_dir, month)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                existing = pq.read_table(path, schema=ARCHIVE_SCHEMA)
+                new_table = pa.concat_tables([existing, new_table]).sort_by(
+                    [("transaction_date", "ascending"), ("id", "ascending")]
+                )
+
+            tmp_path = f"{path}.tmp"
+            pq.write_table(new_table, tmp_path, write_statistics=True)
+            os.replace(tmp_path, path)
+
+            manifest[month] = _partition_stats(new_table, month)
+            _write_manifest(archive_dir, manifest)
+
+            cursor.execute(
+                "DELETE FROM transactions WHERE substr(transaction_date, 1, 7) = ?",
+                (month,)
+            )
+            conn.commit()
+            archived_rows += len(rows)
+            logger.info(f"Archived {len(rows)} transactions for {month}")
+    finally:
+        conn.close()
+
+    if archived_rows:
+        query_cache_path(archive_dir)
+    return archived_rows
+
+
+def migrate_archive(archive_dir: str, resolve_counterparty: Callable[[str], int]) -> int:
+    """
+    Rewrite partitions written with an older schema to the current ARCHIVE_SCHEMA.
+
+    Upgrades REAL amount/balance columns to int64 cents and fills `counterparty_id`.
+
+    Args:
+        archive_dir: Root directory of the Parquet archive
+        resolve_counterparty: Maps a transaction description to its counterparty ID
+
+    Returns:
+        Number of partitions rewritten
+    """
+    manifest = load_manifest(archive_dir)
+    migrated = 0
+    for month, stats in sorted(manifest.items()):
+        path = os.path.join(archive_dir, stats["file"])
+        table = pq.read_table(path)
+        if set(ARCHIVE_SCHEMA.names) <= set(table.column_names):
+            continue
+
+        rows = table.to_pylist()
+        for row in rows:
+            if "amount" in row:
+                row["amount_cents"] = to_cents(row.pop("amount"))
+                row["balance_cents"] = to_cents(row.pop("balance"))
+            if row.get("counterparty_id") is None:
+                row["counterparty_id"] = resolve_counterparty(row["description"])
+        table = pa.Table.from_pylist(rows, schema=ARCHIVE_SCHEMA)
+
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path, write_statistics=True)
+        os.replace(tmp_path, path)
+        manifest[month] = _partition_stats(table, month)
+        migrated += 1
+
+    if migrated:
+        _write_manifest(archive_dir, manifest)
+        logger.info(f"Migrated {migrated} archive partitions to the current schema")
+        query_cache_path(archive_dir)
+    return migrated
+
+
+def clear_archive(archive_dir: str) -> None:
+    """Remove every archived partition (used when the database is regenerated)."""
+    if os.path.isdir(archive_dir):
+        shutil.rmtree(archive_dir)
+
+
+def _month_overlaps(stats: Dict[str, Any], start_date: Optional[str], end_date: Optional[str]) -> bool:
+    if start_date and stats["max_date"] < start_date:
+        return False
+    if end_date and stats["min_date"] > end_date:
+        return False
+    return True
+
+
+def read_archived_table(
+    archive_dir: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    categories: Optional[List[str]] = None,
+) -> pa.Table:
+    """
+    Read archived transactions as an Arrow table, pruning partitions by date before touching any file.
+
+    Args:
+        archive_dir: Root directory of the Parquet archive
+        start_date: Inclusive lower bound on transaction_date (ISO string)
+        end_date: Inclusive upper bound on transaction_date (ISO string)
+        columns: Subset of columns to read (default: all)
+        categories: Only read rows in these categories (pushed down as a Parquet filter)
+
+    Returns:
+        Arrow table with the requested columns (empty if nothing matches)
+    """
+    manifest = load_manifest(archive_dir)
+    columns = columns or TRANSACTION_COLUMNS
+
+    filters = []
+    if start_date:
+        filters.append(("transaction_date", ">=", start_date))
+    if end_date:
+        filters.append(("transaction_date", "<=", end_date))
+    category_filter = [("category", "in", list(categories))] if categories else []
+
+    tables: List[pa.Table] = []
+    for month in sorted(manifest):
+        stats = manifest[month]
+        if not _month_overlaps(stats, start_date, end_date):
+            continue
+
+        # Partitions fully inside the range need no row filter at all
+        fully_covered = (not start_date or stats["min_date"] >= start_date) and (
+            not end_date or stats["max_date"] <= end_date
+        )
+        table = pq.read_table(
+            os.path.join(archive_dir, stats["file"]),
+            columns=columns,
+            filters=(([] if fully_covered else filters) + category_filter) or None,
+            memory_map=True,
+        )
+        tables.append(table)
+
+    if not tables:
+        return ARCHIVE_SCHEMA.empty_table().select(columns)
+    return pa.concat_tables(tables)
+
+
+def _manifest_version(archive_dir: str) -> Optional[str]:
+    # The manifest is rewritten whenever a partition changes, so its mtime and size identify the archive
+    try:
+        stat = os.stat(os.path.join(archive_dir, MANIFEST_FILE))
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _query_cache_version(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM cache_meta WHERE key = 'manifest_version'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return None
+    return row[0] if row else None
+
+
+def _build_query_cache(archive_dir: str, path: str, version: str, deadline: Optional[float]) -> None:
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    sql_types = {pa.int64(): "INTEGER", pa.string(): "TEXT"}
+    columns = ", ".join(f"{field.name} {sql_types[field.type]}" for field in ARCHIVE_SCHEMA)
+    started = time.perf_counter()
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(f"CREATE TABLE archived_transactions ({columns})")
+        conn.execute("CREATE TABLE cache_meta (key TEXT PRIMARY KEY, value TEXT)")
+        insert = f"INSERT INTO archived_transactions VALUES ({', '.join('?' for _ in TRANSACTION_COLUMNS)})"
+        rows = 0
+        for batch in read_archived_table(archive_dir).to_batches(QUERY_CACHE_BATCH_ROWS):
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("Building the archive query cache ran past the deadline")
+            conn.executemany(insert, zip(*(batch.column(name).to_pylist() for name in TRANSACTION_COLUMNS)))
+            rows += batch.num_rows
+        conn.execute("CREATE INDEX idx_archived_transactions_date ON archived_transactions (transaction_date)")
+        conn.execute("INSERT INTO cache_meta (key, value) VALUES ('manifest_version', ?)", (version,))
+        conn.commit()
+        conn.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        conn.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    logger.info(f"Built the archive query cache ({rows} rows) in {time.perf_counter() - started:.2f}s")
+
+
+def query_cache_path(archive_dir: str, deadline: Optional[float] = None) -> Optional[str]:
+    """
+    Path of the SQLite copy of the archive used by read-only SQL, rebuilding it if it is stale.
+
+    The copy holds every archived row in `archived_transactions`, indexed by transaction_date,
+    and records the manifest version it was built from. The archive writers rebuild it, so
+    queries normally just attach it; it is only rebuilt here when the archive changed in
+    another way (or the copy is missing).
+
+    Args:
+        archive_dir: Root directory of the Parquet archive
+        deadline: time.monotonic() value after which a rebuild (or waiting for one) gives up
+
+    Returns:
+        Path of the copy, or None if nothing is archived
+
+    Raises:
+        TimeoutError: If the copy could not be rebuilt before the deadline
+    """
+    version = _manifest_version(archive_dir)
+    if version is None or not load_manifest(archive_dir):
+        return None
+    path = os.path.join(archive_dir, QUERY_CACHE_FILE)
+    if _query_cache_version(path) == version:
+        return path
+
+    wait = -1 if deadline is None else max(0.0, deadline - time.monotonic())
+    if not _query_cache_lock.acquire(timeout=wait):
+        raise TimeoutError("Timed out waiting for the archive query cache")
+    try:
+        # Another thread may have rebuilt it while this one waited
+        if _query_cache_version(path) != version:
+            _build_query_cache(archive_dir, path, version, deadline)
+    finally:
+        _query_cache_lock.release()
+    return path
+
+
+def read_archived_transactions(
+    archive_dir: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    categories: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Read archived transactions as dictionaries (see `read_archived_table`).
+    """
+    return read_archived_table(archive_dir, start_date, end_date, columns, categories).to_pylist()
+
+
+def archived_amount_totals(
+    archive_dir: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Sum archived amounts (in cents) per month, reading only the date and amount columns.
+
+    Args:
+        archive_dir: Root directory of the Parquet archive
+        start_date: Inclusive lower bound on transaction_date (ISO string)
+        end_date: Inclusive upper bound on transaction_date (ISO string)
+
+    Returns:
+        Dict mapping month ("YYYY-MM") to the net cents archived for it
+    """
+    totals: Dict[str, int] = {}
+    for row in read_archived_transactions(archive_dir, start_date, end_date, ["transaction_date", "amount_cents"]):
+        month = row["transaction_date"][:7]
+        totals[month] = totals.get(month, 0) + row["amount_cents"]
+    return totals
+
+
+def read_transactions(
+    db_path: str,
+    archive_dir: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    categories: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Read the logical transactions table: recent rows from SQLite plus archived Parquet rows.
+
+    Args:
+        db_path: Path to the SQLite database
+        archive_dir: Root directory of the Parquet archive
+        start_date: Inclusive lower bound on transaction_date (ISO string)
+        end_date: Inclusive upper bound on transaction_date (ISO string)
+        columns: Subset of columns to return (default: all)
+        categories: Only return rows in these categories
+
+    Returns:
+        List of transaction dictionaries ordered by date (newest first)
+    """
+    columns = [c for c in TRANSACTION_COLUMNS if c in columns] if columns else TRANSACTION_COLUMNS
+    # Sorting needs the date and id even when the caller did not ask for them
+    read_columns = list(dict.fromkeys(columns + ["transaction_date", "id"]))
+
+    clauses = []
+    params: List[Any] = []
+    if start_date:
+        clauses.append("transaction_date >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append("transaction_date <= ?")
+        params.append(end_date)
+    if categories:
+        clauses.append(f"category IN ({', '.join('?' for _ in categories)})")
+        params.extend(categories)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(read_columns)} FROM {LEDGER_VIEW} {where}", params)
+        data = [dict(zip(read_columns, row)) for row in cursor.fetchall()]
+
+        counterparty_names: Dict[int, str] = {}
+        if "counterparty_id" in columns:
+            cursor.execute("SELECT id, name FROM counterparties")
+            counterparty_names = dict(cursor.fetchall())
+    finally:
+        conn.close()
+
+    data.extend(read_archived_transactions(archive_dir, start_date, end_date, read_columns, categories))
+    data.sort(key=lambda row: (row["transaction_date"], row["id"]), reverse=True)
+
+    if len(read_columns) != len(columns):
+        data = [{c: row[c] for c in columns} for row in data]
+
+    # Resolve the counterparty dimension once for both tiers
+    if "counterparty_id" in columns:
+        for row in data:
+            row["counterparty"] = counterparty_names.get(row["counterparty_id"])
+
+    return data
@@ -0,0 +1,272 @@
+import sqlite3
+from typing import Any, Dict, Optional
+
+from ledger.insights import forget_transaction, observe_transaction
+from ledger.version import bump_ledger_version
+
+# Read-side view of transactions with balances corrected for back-dated changes
+LEDGER_VIEW = "transactions_ledger"
+
+# Columns a caller may set on a transaction; balance is always derived
+EDITABLE_COLUMNS = [
+    "transaction_date",
+    "description",
+    "category",
+    "transaction_type",
+    "amount_cents",
+    "reference_number",
+    "status",
+    "counterparty_id",
+]
+
+
+def ensure_balance_schema(conn: sqlite3.Connection) -> None:
+    """
+    Create the per-month balance checkpoint table and the corrected ledger view.
+
+    Each checkpoint row holds the month's net change and its opening balance. Row balances
+    stored in `transactions` are only rewritten for the month that changed; later months
+    record the opening balance their rows were materialized from (`materialized_opening_cents`)
+    and the view adds the difference on read, so a back-dated insert costs one month of
+    rewrites plus one small update per later month instead of touching every later row.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS balance_checkpoints (
+            month TEXT PRIMARY KEY,
+            net_change_cents INTEGER NOT NULL DEFAULT 0,
+            opening_balance_cents INTEGER NOT NULL DEFAULT 0,
+            materialized_opening_cents INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (transaction_date, id)")
+    cursor.execute(f"DROP VIEW IF EXISTS {LEDGER_VIEW}")
+    cursor.execute(f'''
+        CREATE VIEW {LEDGER_VIEW} AS
+        SELECT
+            t.id,
+            t.transaction_date,
+            t.description,
+            t.category,
+            t.transaction_type,
+            t.amount_cents,
+            t.balance_cents + COALESCE(c.opening_balance_cents - c.materialized_opening_cents, 0) AS balance_cents,
+            t.reference_number,
+            t.status,
+            t.created_at,
+            t.counterparty_id
+        FROM transactions t
+        LEFT JOIN balance_checkpoints c ON c.month = substr(t.transaction_date, 1, 7)
+    ''')
+
+
+def _month(transaction_date: str) -> str:
+    return transaction_date[:7]
+
+
+def _opening_before(cursor: sqlite3.Cursor, month: str) -> int:
+    cursor.execute("SELECT COALESCE(SUM(net_change_cents), 0) FROM balance_checkpoints WHERE month < ?", (month,))
+    return cursor.fetchone()[0]
+
+
+def _ensure_checkpoint(cursor: sqlite3.Cursor, month: str) -> None:
+    opening = _opening_before(cursor, month)
+    cursor.execute(
+        "INSERT OR IGNORE INTO balance_checkpoints "
+        "(month, net_change_cents, opening_balance_cents, materialized_opening_cents) "
+        "VALUES (?, 0, ?, ?)",
+        (month, opening, opening)
+    )
+
+
+def _apply_delta(cursor: sqlite3.Cursor, month: str, delta: int) -> None:
+    """Add `delta` cents to a month's net change and shift the opening balance of every later month."""
+    if not delta:
+        return
+    cursor.execute(
+        "UPDATE balance_checkpoints SET net_change_cents = net_change_cents + ? WHERE month = ?",
+        (delta, month)
+    )
+    cursor.execute(
+        "UPDATE balance_checkpoints SET opening_balance_cents = opening_balance_cents + ? WHERE month > ?",
+        (delta, month)
+    )
+
+
+def _materialize_month(cursor: sqlite3.Cursor, month: str) -> None:
+    """Recompute stored row balances for a single month from its checkpoint."""
+    cursor.execute("SELECT opening_balance_cents FROM balance_checkpoints WHERE month = ?", (month,))
+    row = cursor.fetchone()
+    if row is None:
+        return
+    opening = row[0]
+
+    cursor.execute(
+        "SELECT id, amount_cents FROM transactions WHERE substr(transaction_date, 1, 7) = ? "
+        "ORDER BY transaction_date, id",
+        (month,)
+    )
+    running_balance = opening
+    updates = []
+    for transaction_id, amount in cursor.fetchall():
+        running_balance += amount
+        updates.append((running_balance, transaction_id))
+
+    cursor.executemany("UPDATE transactions SET balance_cents = ? WHERE id = ?", updates)
+    cursor.execute(
+        "UPDATE balance_checkpoints SET materialized_opening_cents = opening_balance_cents WHERE month = ?",
+        (month,)
+    )
+
+
+def rebuild_balances(conn: sqlite3.Connection, archived_totals: Optional[Dict[str, int]] = None) -> None:
+    """
+    Rebuild every checkpoint and stored row balance from scratch.
+
+    This is the only O(n) balance operation and is meant for initial load or repair.
+
+    Args:
+        conn: Open SQLite connection
+        archived_totals: Net cents per month ("YYYY-MM") for rows no longer in SQLite
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT substr(transaction_date, 1, 7), SUM(amount_cents) FROM transactions GROUP BY 1"
+    )
+    totals: Dict[str, int] = dict(archived_totals or {})
+    for month, net_change in cursor.fetchall():
+        totals[month] = totals.get(month, 0) + net_change
+
+    cursor.execute("DELETE FROM balance_checkpoints")
+    opening = 0
+    for month in sorted(totals):
+        cursor.execute(
+            "INSERT INTO balance_checkpoints "
+            "(month, net_change_cents, opening_balance_cents, materialized_opening_cents) "
+            "VALUES (?, ?, ?, ?)",
+            (month, totals[month], opening, opening)
+        )
+        opening += totals[month]
+
+    cursor.execute("SELECT DISTINCT substr(transaction_date, 1, 7) FROM transactions")
+    for (month,) in cursor.fetchall():
+        _materialize_month(cursor, month)
+    bump_ledger_version(conn)
+
+
+def insert_transaction(conn: sqlite3.Connection, transaction: Dict[str, Any]) -> int:
+    """
+    Insert a (possibly back-dated) transaction and update balances for its month only.
+
+    Args:
+        conn: Open SQLite connection (the caller commits)
+        transaction: Column values; `transaction_date`, `description`, `category`,
+            `transaction_type` and `amount_cents` are required
+
+    Returns:
+        The new transaction ID
+    """
+    columns = [c for c in EDITABLE_COLUMNS if c in transaction]
+    cursor = conn.cursor()
+    cursor.execute(
+        f"INSERT INTO transactions ({', '.join(columns)}, balance_cents) VALUES ({', '.join('?' for _ in columns)}, 0)",
+        [transaction[c] for c in columns]
+    )
+    transaction_id = cursor.lastrowid
+    bump_ledger_version(conn)
+    observe_transaction(conn, transaction_id, transaction)
+
+    month = _month(transaction["transaction_date"])
+    _ensure_checkpoint(cursor, month)
+    _apply_delta(cursor, month, transaction["amount_cents"])
+    _materialize_month(cursor, month)
+
+    return transaction_id
+
+
+def update_transaction(conn: sqlite3.Connection, transaction_id: int, changes: Dict[str, Any]) -> None:
+    """
+    Edit a transaction, rewriting balances only for the month(s) it moved between.
+
+    Raises:
+        LookupError: If the transaction does not exist
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT transaction_date, amount_cents, category, counterparty_id FROM transactions WHERE id = ?",
+        (transaction_id,)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise LookupError(f"Transaction {transaction_id} not found")
+    old = dict(zip(["transaction_date", "amount_cents", "category", "counterparty_id"], row))
+    old_date, old_amount = old["transaction_date"], old["amount_cents"]
+
+    columns = [c for c in EDITABLE_COLUMNS if c in changes]
+    if not columns:
+        return
+    cursor.execute(
+        f"UPDATE transactions SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+        [changes[c] for c in columns] + [transaction_id]
+    )
+    bump_ledger_version(conn)
+    if any(changes.get(c, old[c]) != old[c] for c in old):
+        forget_transaction(conn, old)
+        observe_transaction(conn, transaction_id, {**old, **{c: changes[c] for c in old if c in changes}})
+
+    new_date = changes.get("transaction_date", old_date)
+    new_amount = changes.get("amount_cents", old_amount)
+    if new_date == old_date and new_amount == old_amount:
+        return
+
+    old_month, new_month = _month(old_date), _month(new_date)
+    _ensure_checkpoint(cursor, new_month)
+    _apply_delta(cursor, old_month, -old_amount)
+    _apply_delta(cursor, new_month, new_amount)
+    for month in {old_month, new_month}:
+        _materialize_month(cursor, month)
+
+
+def delete_transaction(conn: sqlite3.Connection, transaction_id: int) -> None:
+    """
+    Delete a transaction and update balances for its month only.
+
+    Raises:
+        LookupError: If the transaction does not exist
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT transaction_date, amount_cents, category, counterparty_id FROM transactions WHERE id = ?",
+        (transaction_id,)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise LookupError(f"Transaction {transaction_id} not found")
+    transaction_date, amount, category, counterparty_id = row
+
+    cursor.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
+    bump_ledger_version(conn)
+    forget_transaction(conn, {
+        "transaction_date": transaction_date, "amount_cents": amount,
+        "category": category, "counterparty_id": counterparty_id,
+    })
+    month = _month(transaction_date)
+    _apply_delta(cursor, month, -amount)
+    _materialize_month(cursor, month)
+
+
+def balance_as_of(conn: sqlite3.Connection, as_of: str) -> int:
+    """
+    Return the account balance in cents at the end of `as_of` (YYYY-MM-DD).
+
+    Sums the checkpoint rows before the month plus the month's own rows up to the date,
+    so the cost is bounded by the number of months and one month of transactions.
+    """
+    cursor = conn.cursor()
+    month = _month(as_of)
+    opening = _opening_before(cursor, month)
+    cursor.execute(
+        "SELECT COALESCE(SUM(amount_cents), 0) FROM transactions WHERE transaction_date >= ? AND transaction_date <= ?",
+        (f"{month}-01", as_of)
+    )
+    return opening + cursor.fetchone()[0]
@@ -0,0 +1,302 @@
+import asyncio
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from ai_agents.utils import metrics
+from ai_agents.utils.log import get_logger
+from ledger.balances import LEDGER_VIEW
+from ledger.money import present_transaction
+
+logger = get_logger("ledger.changes")
+
+# ledger_meta key holding the highest sequence number dropped by compaction
+COMPACTED_THROUGH_KEY = "changes_compacted_through"
+# The change log keeps at most this many entries, none older than the retention period
+CHANGE_LOG_MAX_ENTRIES = int(os.getenv("CHANGE_LOG_MAX_ENTRIES", "50000"))
+CHANGE_LOG_RETENTION_SECONDS = float(os.getenv("CHANGE_LOG_RETENTION_SECONDS", str(7 * 24 * 3600)))
+CHANGE_COMPACT_SECONDS = float(os.getenv("CHANGE_COMPACT_SECONDS", "300"))
+# A delta touching more rows than this is answered with a resync instead
+CHANGES_MAX_ROWS = int(os.getenv("CHANGES_MAX_ROWS", "5000"))
+
+# Columns compared by the update trigger; rewriting a row with the same values is not a change
+_TRACKED_COLUMNS = [
+    "transaction_date",
+    "description",
+    "category",
+    "transaction_type",
+    "amount_cents",
+    "balance_cents",
+    "reference_number",
+    "status",
+    "counterparty_id",
+]
+
+
+def ensure_change_schema(conn: sqlite3.Connection) -> None:
+    """
+    Create the `transaction_changes` log and the triggers that maintain it.
+
+    Every insert, update and delete on `transactions` appends the row id with a new sequence
+    number. Displayed balances of later months move through their checkpoint, not their rows,
+    so a change to a month's opening balance is logged as a `shift` of that month. Entries are
+    markers only: readers resolve them against the current ledger view, so replaying a delta
+    twice is harmless and superseded entries can be dropped.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER,
+            month TEXT,
+            op TEXT NOT NULL,
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_transaction_changes_key ON transaction_changes (transaction_id, month, seq)"
+    )
+    cursor.execute("INSERT OR IGNORE INTO ledger_meta (key, value) VALUES (?, 0)", (COMPACTED_THROUGH_KEY,))
+
+    changed = " OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in _TRACKED_COLUMNS)
+    cursor.executescript(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_insert_log AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO transaction_changes (transaction_id, op) VALUES (NEW.id, 'insert');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_update_log AFTER UPDATE ON transactions
+        WHEN {changed}
+        BEGIN
+            INSERT INTO transaction_changes (transaction_id, op) VALUES (NEW.id, 'update');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_delete_log AFTER DELETE ON transactions
+        BEGIN
+            INSERT INTO transaction_changes (transaction_id, op) VALUES (OLD.id, 'delete');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_balance_checkpoints_shift_log
+        AFTER UPDATE OF opening_balance_cents ON balance_checkpoints
+        WHEN OLD.opening_balance_cents IS NOT NEW.opening_balance_cents
+        BEGIN
+            INSERT INTO transaction_changes (month, op) VALUES (NEW.month, 'shift');
+        END;
+    ''')
+
+
+def current_seq(conn: sqlite3.Connection) -> int:
+    """Return the latest change sequence number (0 before the first change)."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transaction_changes'").fetchone()
+    return row[0] if row else 0
+
+
+def _compacted_through(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT value FROM ledger_meta WHERE key = ?", (COMPACTED_THROUGH_KEY,)).fetchone()
+    return row[0] if row else 0
+
+
+def reset_change_log(conn: sqlite3.Connection) -> None:
+    """
+    Drop every entry and move the watermark to the current sequence, so every client resyncs.
+
+    Used after bulk rewrites (seeding, balance rebuilds, archiving) that no delta should carry.
+    The caller commits.
+    """
+    seq = current_seq(conn)
+    conn.execute("DELETE FROM transaction_changes")
+    conn.execute("UPDATE ledger_meta SET value = ? WHERE key = ?", (seq, COMPACTED_THROUGH_KEY))
+
+
+def compact_changes(
+    conn: sqlite3.Connection,
+    max_entries: int = CHANGE_LOG_MAX_ENTRIES,
+    retention_seconds: float = CHANGE_LOG_RETENTION_SECONDS,
+) -> int:
+    """
+    Shrink the change log.
+
+    Entries superseded by a later entry for the same row or month are always safe to drop.
+    Beyond that, the oldest entries are trimmed to `max_entries` and `retention_seconds`, and
+    the watermark moves past them: clients that have not synced since then must resync.
+
+    Args:
+        conn: Open SQLite connection (the caller commits)
+        max_entries: Entries kept after compaction
+        retention_seconds: Entries older than this are trimmed
+
+    Returns:
+        Number of entries removed
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        DELETE FROM transaction_changes WHERE seq NOT IN (
+            SELECT MAX(seq) FROM transaction_changes GROUP BY transaction_id, month
+        )
+    ''')
+    removed = cursor.rowcount
+
+    cursor.execute(
+        "SELECT MAX(seq) FROM transaction_changes WHERE changed_at < datetime('now', ?)",
+        (f"-{int(retention_seconds)} seconds",),
+    )
+    cutoff = cursor.fetchone()[0] or 0
+    cursor.execute(
+        "SELECT seq FROM transaction_changes ORDER BY seq DESC LIMIT 1 OFFSET ?", (max(0, max_entries),)
+    )
+    row = cursor.fetchone()
+    if row:
+        cutoff = max(cutoff, row[0])
+
+    if cutoff:
+        cursor.execute("DELETE FROM transaction_changes WHERE seq <= ?", (cutoff,))
+        removed += cursor.rowcount
+        cursor.execute(
+            "UPDATE ledger_meta SET value = MAX(value, ?) WHERE key = ?", (cutoff, COMPACTED_THROUGH_KEY)
+        )
+    return removed
+
+
+def read_changes(
+    db_path: str,
+    since: int,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    max_rows: int = CHANGES_MAX_ROWS,
+) -> Dict[str, Any]:
+    """
+    Changes to the hot ledger after sequence number `since`, resolved to current rows.
+
+    Archived months are read-only, so only SQLite rows ever change. The log and the rows are
+    read in one transaction, so the returned rows are exactly the state as of `seq`.
+
+    Args:
+        db_path: Path to the SQLite database
+        since: The last `seq` the client applied (or the `X-Change-Seq` of its full fetch)
+        start_date: Inclusive lower bound of the client's copy; changed rows outside it are deletes
+        end_date: Inclusive upper bound of the client's copy
+        max_rows: Answer with a resync when more rows than this changed
+
+    Returns:
+        Dict with `since`, `seq` (pass it as the next `since`), `resync` (true when the client
+        must refetch /api/data instead), `upserts` (presented rows, newest first) and `deletes` (ids)
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("BEGIN")
+        seq = current_seq(conn)
+        delta: Dict[str, Any] = {"since": since, "seq": seq, "resync": False, "upserts": [], "deletes": []}
+        if since == seq:
+            return delta
+        if since < _compacted_through(conn) or since > seq:
+            delta["resync"] = True
+            return delta
+
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT DISTINCT transaction_id FROM transaction_changes WHERE seq > ? AND transaction_id IS NOT NULL",
+            (since,),
+        )
+        changed_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT DISTINCT month FROM transaction_changes WHERE seq > ? AND month IS NOT NULL", (since,)
+        )
+        shifted_months = [row[0] for row in cursor.fetchall()]
+
+        clauses = []
+        params: List[Any] = []
+        if changed_ids:
+            clauses.append("id IN (SELECT transaction_id FROM transaction_changes WHERE seq > ?)")
+            params.append(since)
+        if shifted_months:
+            clauses.append(f"substr(transaction_date, 1, 7) IN ({', '.join('?' for _ in shifted_months)})")
+            params.extend(shifted_months)
+        rows: List[Dict[str, Any]] = []
+        if clauses:
+            cursor.execute(f"SELECT * FROM {LEDGER_VIEW} WHERE {' OR '.join(clauses)} LIMIT ?", params + [max_rows + 1])
+            columns = [d[0] for d in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        if len(rows) > max_rows:
+            delta["resync"] = True
+            return delta
+
+        cursor.execute("SELECT id, name FROM counterparties")
+        counterparty_names = dict(cursor.fetchall())
+    finally:
+        conn.close()
+
+    present = set()
+    for row in rows:
+        present.add(row["id"])
+        if (start_date and row["transaction_date"] < start_date) or (end_date and row["transaction_date"] > end_date):
+            delta["deletes"].append(row["id"])
+            continue
+        row["counterparty"] = counterparty_names.get(row["counterparty_id"])
+        delta["upserts"].append(present_transaction(row))
+    delta["deletes"].extend(i for i in changed_ids if i not in present)
+    delta["upserts"].sort(key=lambda row: (row["transaction_date"], row["id"]), reverse=True)
+    return delta
+
+
+class ChangeFeed:
+    """
+    Wakes push subscribers when the ledger changes and compacts the change log in the background.
+
+    Writers call `notify()` after committing; subscribers wait on `wait()`, which also returns
+    after a timeout so writes from other processes are picked up by polling.
+    """
+
+    def __init__(self, db_path: str, compact_seconds: float = CHANGE_COMPACT_SECONDS):
+        self.db_path = db_path
+        self.compact_seconds = compact_seconds
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        """Wake every current subscriber."""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def waiter(self) -> asyncio.Event:
+        """The event the next `notify()` sets; take it before reading changes so none are missed."""
+        return self._changed
+
+    async def wait(self, waiter: asyncio.Event, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def start(self) -> None:
+        """Start the compaction loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def compact(self) -> int:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            removed = compact_changes(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        return removed
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.compact_seconds)
+            try:
+                removed = await asyncio.to_thread(self.compact)
+                if removed:
+                    metrics.increment("changes.compacted", removed)
+                    logger.info(f"Compacted {removed} change log entries")
+            except Exception as e:
+                logger.error(f"Change log compaction failed: {e}")
@@ -0,0 +1,217 @@
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from ledger.archive import read_archived_table
+from ledger.balances import LEDGER_VIEW
+
+# Trailing reference noise appended to counterparty names, e.g. "Acme Co - Invoice #1234"
+DESCRIPTION_NOISE = re.compile(
+    r"\s+-\s+(?:(?:Invoice|Order|Payment|Ref(?:erence)?)\s*#?\s*[\w-]+|Recent Transaction)\s*$",
+    re.IGNORECASE,
+)
+
+ROLLUP_COLUMNS = [
+    "counterparty_id",
+    "counterparty",
+    "transaction_count",
+    "total_cents",
+    "credit_cents",
+    "debit_cents",
+    "first_date",
+    "last_date",
+]
+
+
+def normalize_counterparty(description: str) -> str:
+    """
+    Strip reference noise from a transaction description to get the counterparty name.
+
+    Args:
+        description: Raw transaction description
+
+    Returns:
+        Counterparty name with whitespace collapsed
+    """
+    name = description.strip()
+    # Descriptions can stack several suffixes ("X - Order #1 - Payment #2")
+    while True:
+        stripped = DESCRIPTION_NOISE.sub("", name)
+        if stripped == name:
+            break
+        name = stripped
+    return " ".join(name.split())
+
+
+def ensure_counterparty_schema(conn: sqlite3.Connection) -> None:
+    """Create the counterparty dimension table, the `counterparty_id` column and its index."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS counterparties (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute("PRAGMA table_info(transactions)")
+    if "counterparty_id" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE transactions ADD COLUMN counterparty_id INTEGER REFERENCES counterparties (id)")
+
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_transactions_counterparty ON transactions (counterparty_id, transaction_date)"
+    )
+
+
+def counterparty_id_for(cursor: sqlite3.Cursor, description: str) -> int:
+    """
+    Return the counterparty ID for a description, creating the counterparty if it is new.
+    """
+    name = normalize_counterparty(description)
+    cursor.execute("INSERT OR IGNORE INTO counterparties (name) VALUES (?)", (name,))
+    cursor.execute("SELECT id FROM counterparties WHERE name = ?", (name,))
+    return cursor.fetchone()[0]
+
+
+def backfill_counterparties(conn: sqlite3.Connection) -> int:
+    """
+    Assign `counterparty_id` to every transaction that does not have one yet.
+
+    Returns:
+        Number of transactions updated
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, description FROM transactions WHERE counterparty_id IS NULL")
+    rows = cursor.fetchall()
+
+    ids_by_name: Dict[str, int] = {}
+    updates = []
+    for transaction_id, description in rows:
+        name = normalize_counterparty(description)
+        if name not in ids_by_name:
+            ids_by_name[name] = counterparty_id_for(cursor, name)
+        updates.append((ids_by_name[name], transaction_id))
+
+    cursor.executemany("UPDATE transactions SET counterparty_id = ? WHERE id = ?", updates)
+    return len(updates)
+
+
+def counterparty_rollup(
+    db_path: str,
+    archive_dir: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    transaction_type: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate transactions per counterparty across the SQLite and Parquet tiers.
+
+    The hot tier is a GROUP BY on the indexed `counterparty_id` column; archived partitions
+    are pruned by date and grouped with Arrow, so no description parsing happens at query time.
+
+    Args:
+        db_path: Path to the SQLite database
+        archive_dir: Root directory of the Parquet archive
+        start_date: Inclusive lower bound on transaction_date (ISO string)
+        end_date: Inclusive upper bound on transaction_date (ISO string)
+        transaction_type: Only include 'Credit' or 'Debit' transactions
+        limit: Return only the top N counterparties by absolute total
+
+    Returns:
+        List of rollup dictionaries (see ROLLUP_COLUMNS) ordered by absolute total, largest first
+    """
+    clauses = []
+    params: List[Any] = []
+    if start_date:
+        clauses.append("transaction_date >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append("transaction_date <= ?")
+        params.append(end_date)
+    if transaction_type:
+        clauses.append("transaction_type = ?")
+        params.append(transaction_type)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    totals: Dict[int, Dict[str, Any]] = {}
+
+    def merge(counterparty_id, count, total, credit, debit, first_date, last_date):
+        entry = totals.setdefault(counterparty_id, {
+            "counterparty_id": counterparty_id,
+            "transaction_count": 0,
+            "total_cents": 0,
+            "credit_cents": 0,
+            "debit_cents": 0,
+            "first_date": first_date,
+            "last_date": last_date,
+        })
+        entry["transaction_count"] += count
+        entry["total_cents"] += total
+        entry["credit_cents"] += credit
+        entry["debit_cents"] += debit
+        entry["first_date"] = min(entry["first_date"], first_date)
+        entry["last_date"] = max(entry["last_date"], last_date)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT counterparty_id,
+                   COUNT(*),
+                   SUM(amount_cents),
+                   SUM(CASE WHEN amount_cents > 0 THEN amount_cents ELSE 0 END),
+                   SUM(CASE WHEN amount_cents < 0 THEN amount_cents ELSE 0 END),
+                   MIN(transaction_date),
+                   MAX(transaction_date)
+            FROM {LEDGER_VIEW}
+            {where}
+            GROUP BY counterparty_id
+        ''', params)
+        for row in cursor.fetchall():
+            merge(*row)
+
+        cursor.execute("SELECT id, name FROM counterparties")
+        names = dict(cursor.fetchall())
+    finally:
+        conn.close()
+
+    archived = read_archived_table(
+        archive_dir, start_date, end_date,
+        ["counterparty_id", "transaction_date", "transaction_type", "amount_cents"],
+    )
+    if transaction_type and archived.num_rows:
+        archived = archived.filter(pc.equal(archived["transaction_type"], transaction_type))
+    if archived.num_rows:
+        amounts = archived["amount_cents"]
+        archived = archived.append_column("credit_cents", pc.max_element_wise(amounts, pa.scalar(0, pa.int64())))
+        archived = archived.append_column("debit_cents", pc.min_element_wise(amounts, pa.scalar(0, pa.int64())))
+        grouped = archived.group_by("counterparty_id").aggregate([
+            ("amount_cents", "count"),
+            ("amount_cents", "sum"),
+            ("credit_cents", "sum"),
+            ("debit_cents", "sum"),
+            ("transaction_date", "min"),
+            ("transaction_date", "max"),
+        ])
+        for row in grouped.to_pylist():
+            merge(
+                row["counterparty_id"],
+                row["amount_cents_count"],
+                row["amount_cents_sum"],
+                row["credit_cents_sum"],
+                row["debit_cents_sum"],
+                row["transaction_date_min"],
+                row["transaction_date_max"],
+            )
+
+    rollup = sorted(totals.values(), key=lambda entry: abs(entry["total_cents"]), reverse=True)
+    if limit:
+        rollup = rollup[:limit]
+    for entry in rollup:
+        entry["counterparty"] = names.get(entry["counterparty_id"])
+
+    return [{c: entry[c] for c in ROLLUP_COLUMNS} for entry in rollup]
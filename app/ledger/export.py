@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+from ai_agents.utils.log import get_logger
+from ledger.archive import TRANSACTION_COLUMNS, _month_overlaps, load_manifest
+from ledger.balances import LEDGER_VIEW
+
+logger = get_logger("ledger.export")
+
+# Format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+# Rows read, converted and written at a time; bounds export memory regardless of the row count
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+# Excel allows 1,048,576 rows per sheet; larger exports continue on the next sheet
+XLSX_SHEET_ROWS = 1_000_000
+# Spooled exports are reused until they are this old, and at most this many are kept
+EXPORT_CACHE_MAX_AGE_SECONDS = float(os.getenv("EXPORT_CACHE_MAX_AGE_SECONDS", "86400"))
+EXPORT_CACHE_MAX_FILES = int(os.getenv("EXPORT_CACHE_MAX_FILES", "50"))
+
+# Exported transaction shape: the data view's columns, with exact decimal dollars
+EXPORT_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("transaction_date", pa.string()),
+    ("description", pa.string()),
+    ("category", pa.string()),
+    ("transaction_type", pa.string()),
+    ("amount", pa.decimal128(19, 2)),
+    ("balance", pa.decimal128(19, 2)),
+    ("reference_number", pa.string()),
+    ("status", pa.string()),
+    ("created_at", pa.string()),
+    ("counterparty", pa.string()),
+])
+
+
+def _cents_to_decimal(cents: pa.Array) -> pa.Array:
+    # Exact: int64 cents scaled by 0.01 in decimal arithmetic, never through floats
+    scaled = pc.multiply(cents.cast(pa.decimal128(19, 0)), pa.scalar(Decimal("0.01"), pa.decimal128(3, 2)))
+    return scaled.cast(pa.decimal128(19, 2))
+
+
+def _present_batch(batch: pa.RecordBatch, counterparty_names: Dict[int, str]) -> pa.RecordBatch:
+    counterparty_ids = batch.column("counterparty_id").to_pylist()
+    columns = {
+        "amount": _cents_to_decimal(batch.column("amount_cents")),
+        "balance": _cents_to_decimal(batch.column("balance_cents")),
+        "counterparty": pa.array([counterparty_names.get(c) for c in counterparty_ids], pa.string()),
+    }
+    return pa.record_batch(
+        [columns[f.name] if f.name in columns else batch.column(f.name).cast(f.type) for f in EXPORT_SCHEMA],
+        schema=EXPORT_SCHEMA,
+    )
+
+
+def iter_transaction_batches(
+    db_path: str,
+    archive_dir: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    categories: Optional[List[str]] = None,
+    batch_rows: int = EXPORT_BATCH_ROWS,
+) -> Iterator[pa.RecordBatch]:
+    """
+    Yield the logical transactions table in EXPORT_SCHEMA batches, oldest first.
+
+    Archived partitions are streamed batch by batch (closed months come before every hot row),
+    then SQLite rows are fetched `batch_rows` at a time, so memory stays bounded by one batch.
+
+    Args:
+        db_path: Path to the SQLite database
+        archive_dir: Root directory of the Parquet archive
+        start_date: Inclusive lower bound on transaction_date (ISO string)
+        end_date: Inclusive upper bound on transaction_date (ISO string)
+        categories: Only export rows in these categories
+        batch_rows: Maximum rows per batch
+
+    Yields:
+        Record batches with the EXPORT_SCHEMA columns
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name FROM counterparties")
+        counterparty_names = dict(cursor.fetchall())
+
+        manifest = load_manifest(archive_dir)
+        for month in sorted(manifest):
+            stats = manifest[month]
+            if not _month_overlaps(stats, start_date, end_date):
+                continue
+            parquet_file = pq.ParquetFile(os.path.join(archive_dir, stats["file"]))
+            for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=TRANSACTION_COLUMNS):
+                mask = None
+                for condition in (
+                    pc.greater_equal(batch.column("transaction_date"), start_date) if start_date else None,
+                    pc.less_equal(batch.column("transaction_date"), end_date) if end_date else None,
+                    pc.is_in(batch.column("category"), pa.array(categories)) if categories else None,
+                ):
+                    if condition is not None:
+                        mask = condition if mask is None else pc.and_(mask, condition)
+                if mask is not None:
+                    batch = batch.filter(mask)
+                if batch.num_rows:
+                    yield _present_batch(batch, counterparty_names)
+
+        clauses = []
+        params: List[Any] = []
+        if start_date:
+            clauses.append("transaction_date >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append("transaction_date <= ?")
+            params.append(end_date)
+        if categories:
+            clauses.append(f"category IN ({', '.join('?' for _ in categories)})")
+            params.extend(categories)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor.execute(
+            f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM {LEDGER_VIEW} {where} ORDER BY transaction_date, id", params
+        )
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            batch = pa.record_batch(
+                [pa.array([row[i] for row in rows]) for i in range(len(TRANSACTION_COLUMNS))],
+                names=TRANSACTION_COLUMNS,
+            )
+            yield _present_batch(batch, counterparty_names)
+    finally:
+        conn.close()
+
+
+def result_table(result: Dict[str, Any]) -> pa.Table:
+    """
+    Rebuild a saved analysis result as an Arrow table.
+
+    Saved results are small (artifacts are capped at MAX_ARTIFACT_ROWS), so they are converted
+    in one go; columns pyarrow cannot type (mixed values) are exported as strings.
+
+    Args:
+        result: A chat table/series artifact or a report payload (tables have columns and rows,
+            series have name, index and values)
+
+    Returns:
+        Table of the stored rows
+    """
+    if "index" in result:
+        df = pd.DataFrame({"index": result["index"], result.get("name") or "value": result["values"]})
+    else:
+        df = pd.DataFrame(result["rows"], columns=result["columns"])
+    for column in df.columns:
+        try:
+            pa.array(df[column])
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[column] = df[column].map(lambda value: None if value is None else str(value))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_export(batches: Iterable[pa.RecordBatch], schema: pa.Schema, fmt: str, path: str) -> int:
+    """
+    Write batches to `path` incrementally: CSV batch by batch, Parquet one row group per batch,
+    XLSX through a write-only workbook, rolling over to a new sheet every XLSX_SHEET_ROWS rows.
+
+    Args:
+        batches: Record batches matching `schema`
+        schema: Arrow schema of the batches
+        fmt: "csv", "xlsx" or "parquet"
+        path: Output file
+
+    Returns:
+        Number of rows written
+    """
+    rows_written = 0
+    if fmt == "csv":
+        with pcsv.CSVWriter(path, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                rows_written += batch.num_rows
+    elif fmt == "parquet":
+        with pq.ParquetWriter(path, schema, write_statistics=True) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                rows_written += batch.num_rows
+    elif fmt == "xlsx":
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = None
+        for batch in batches:
+            for row in batch.to_pylist():
+                if rows_written % XLSX_SHEET_ROWS == 0:
+                    sheet = workbook.create_sheet(f"Sheet{rows_written // XLSX_SHEET_ROWS + 1}")
+                    sheet.append(schema.names)
+                sheet.append([row[name] for name in schema.names])
+                rows_written += 1
+        if sheet is None:
+            workbook.create_sheet("Sheet1").append(schema.names)
+        workbook.save(path)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return rows_written
+
+
+def prune_exports(export_dir: str) -> None:
+    """Delete spooled exports older than EXPORT_CACHE_MAX_AGE_SECONDS, then the oldest beyond EXPORT_CACHE_MAX_FILES."""
+    if not os.path.isdir(export_dir):
+        return
+    files = sorted(
+        (entry for entry in os.scandir(export_dir) if entry.is_file() and not entry.name.endswith(".tmp")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    now = time.time()
+    for index, entry in enumerate(files):
+        if index >= EXPORT_CACHE_MAX_FILES or now - entry.stat().st_mtime > EXPORT_CACHE_MAX_AGE_SECONDS:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def spool_export(
+    export_dir: str,
+    key: Dict[str, Any],
+    fmt: str,
+    schema: pa.Schema,
+    batches: Callable[[], Iterable[pa.RecordBatch]],
+) -> str:
+    """
+    Return the spooled export file for `key`, writing it first if it is not cached yet.
+
+    The file name is a hash of the key (which includes whatever versions the data), so repeated
+    and resumed downloads of the same export are served byte-identical from disk.
+
+    Args:
+        export_dir: Directory holding spooled exports
+        key: Everything that determines the export's content (filters, data version, ...)
+        fmt: "csv", "xlsx" or "parquet"
+        schema: Arrow schema of the batches
+        batches: Called to produce the batches when the export has to be written
+
+    Returns:
+        Path of the export file
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    digest = hashlib.sha256(json.dumps({**key, "format": fmt}, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+    path = os.path.join(export_dir, f"{digest}.{EXPORT_FORMATS[fmt][1]}")
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) <= EXPORT_CACHE_MAX_AGE_SECONDS:
+        return path
+
+    prune_exports(export_dir)
+    started = time.perf_counter()
+    # Concurrent requests for the same export each write their own temp file; the last rename wins
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        rows = write_export(batches(), schema, fmt, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.info(
+        f"Spooled {fmt} export of {rows} rows",
+        extra={"rows": rows, "latency_ms": round((time.perf_counter() - started) * 1000, 2)},
+    )
+    return path
@@ -0,0 +1,469 @@
+import json
+import math
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Streaming statistics are kept per category and per counterparty
+DIMENSIONS = ("category", "counterparty")
+# Keys need this many transactions before they can flag outliers or shifts
+MIN_SAMPLES = int(os.getenv("INSIGHTS_MIN_SAMPLES", "10"))
+# A transaction this many standard deviations above its key's mean size is an outlier
+OUTLIER_Z = float(os.getenv("INSIGHTS_OUTLIER_Z", "3.0"))
+# A shift is flagged when the fast EWMA of transaction size moves this far (relative) from the slow one
+SHIFT_RATIO = float(os.getenv("INSIGHTS_SHIFT_RATIO", "0.5"))
+# A month whose total is this far (relative) from its seasonal baseline is a seasonal deviation
+SEASONAL_DEVIATION = float(os.getenv("INSIGHTS_SEASONAL_DEVIATION", "0.5"))
+# Smoothing factors of the fast (recent) and slow (long-run) exponentially weighted averages
+EWMA_FAST_ALPHA = 0.3
+EWMA_SLOW_ALPHA = 0.05
+# Quantiles tracked with P² sketches
+SKETCH_QUANTILES = (0.5, 0.95)
+# Flags kept (older ones are pruned)
+FLAGS_KEPT = 1000
+
+
+class P2Quantile:
+    """
+    P² streaming quantile estimator (Jain & Chlamtac): five markers, O(1) memory and update.
+
+    The state is a plain dict so it can be stored as JSON between updates.
+    """
+
+    def __init__(self, p: float, state: Optional[Dict[str, Any]] = None):
+        self.p = p
+        state = state or {}
+        # Marker heights, actual positions and desired positions
+        self.heights: List[float] = state.get("heights", [])
+        self.positions: List[float] = state.get("positions", [1, 2, 3, 4, 5])
+        self.desired: List[float] = state.get("desired", [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5])
+
+    def state(self) -> Dict[str, Any]:
+        return {"heights": self.heights, "positions": self.positions, "desired": self.desired}
+
+    def add(self, x: float) -> None:
+        """Add one observation."""
+        q, n = self.heights, self.positions
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = max(i for i in range(4) if q[i] <= x)
+        for i in range(k + 1, 5):
+            n[i] += 1
+        increments = (0, self.p / 2, self.p, (1 + self.p) / 2, 1)
+        self.desired = [d + inc for d, inc in zip(self.desired, increments)]
+
+        # Move the middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                parabolic = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if q[i - 1] < parabolic < q[i + 1]:
+                    q[i] = parabolic
+                else:
+                    q[i] = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                n[i] += step
+
+    def value(self) -> Optional[float]:
+        """Current quantile estimate (exact while fewer than five observations were added)."""
+        if not self.heights:
+            return None
+        if len(self.heights) < 5:
+            return self.heights[min(len(self.heights) - 1, int(round(self.p * (len(self.heights) - 1))))]
+        return self.heights[2]
+
+
+def ensure_insight_schema(conn: sqlite3.Connection) -> None:
+    """
+    Create the insight engine tables.
+
+    `insight_stats` holds streaming statistics of transaction sizes per category and counterparty,
+    `insight_monthly` the signed monthly totals used for seasonal baselines, and `insight_flags`
+    the outliers and shifts detected as transactions were written.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS insight_stats (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            n INTEGER NOT NULL DEFAULT 0,
+            mean REAL NOT NULL DEFAULT 0,
+            m2 REAL NOT NULL DEFAULT 0,
+            ewma_fast REAL,
+            ewma_slow REAL,
+            sketch TEXT,
+            last_date TEXT,
+            last_shift_month TEXT,
+            PRIMARY KEY (dimension, key)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS insight_monthly (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            month TEXT NOT NULL,
+            total_cents INTEGER NOT NULL DEFAULT 0,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, key, month)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS insight_flags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            transaction_id INTEGER,
+            transaction_date TEXT NOT NULL,
+            amount_cents INTEGER,
+            score REAL NOT NULL,
+            detail TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_insight_flags_date ON insight_flags (transaction_date)")
+
+
+def _keys(transaction: Dict[str, Any]) -> List[Tuple[str, str]]:
+    keys = [("category", transaction["category"])]
+    if transaction.get("counterparty_id") is not None:
+        keys.append(("counterparty", str(transaction["counterparty_id"])))
+    return keys
+
+
+def _empty_stats(dimension: str, key: str) -> Dict[str, Any]:
+    return {
+        "dimension": dimension, "key": key, "n": 0, "mean": 0.0, "m2": 0.0, "ewma_fast": None,
+        "ewma_slow": None, "sketch": None, "last_date": None, "last_shift_month": None,
+    }
+
+
+def _std(stats: Dict[str, Any]) -> float:
+    return math.sqrt(stats["m2"] / (stats["n"] - 1)) if stats["n"] > 1 else 0.0
+
+
+def _observe(stats: Dict[str, Any], transaction: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Fold one transaction's size into a key's statistics; returns the flags it raised
+    x = abs(transaction["amount_cents"])
+    month = transaction["transaction_date"][:7]
+    flags = []
+
+    # Outlier test against the baseline before this transaction is part of it
+    std = _std(stats)
+    if stats["n"] >= MIN_SAMPLES and std > 0:
+        z = (x - stats["mean"]) / std
+        if z >= OUTLIER_Z:
+            flags.append({
+                "kind": "outlier", "score": round(z, 2),
+                "detail": f"${x / 100:,.2f} is {z:.1f} standard deviations above the usual ${stats['mean'] / 100:,.2f}",
+            })
+
+    # Welford running mean / variance
+    stats["n"] += 1
+    delta = x - stats["mean"]
+    stats["mean"] += delta / stats["n"]
+    stats["m2"] += delta * (x - stats["mean"])
+
+    # Fast and slow exponentially weighted averages; their gap is the recent trend
+    if stats["ewma_fast"] is None:
+        stats["ewma_fast"] = stats["ewma_slow"] = float(x)
+    else:
+        stats["ewma_fast"] += EWMA_FAST_ALPHA * (x - stats["ewma_fast"])
+        stats["ewma_slow"] += EWMA_SLOW_ALPHA * (x - stats["ewma_slow"])
+
+    sketch = stats["sketch"] or {}
+    for p in SKETCH_QUANTILES:
+        estimator = P2Quantile(p, sketch.get(str(p)))
+        estimator.add(x)
+        sketch[str(p)] = estimator.state()
+    stats["sketch"] = sketch
+    stats["last_date"] = max(stats["last_date"] or "", transaction["transaction_date"])
+
+    # At most one shift flag per key and month
+    trend = _trend(stats)
+    if stats["n"] >= MIN_SAMPLES and abs(trend) >= SHIFT_RATIO and stats["last_shift_month"] != month:
+        stats["last_shift_month"] = month
+        direction = "up" if trend > 0 else "down"
+        flags.append({
+            "kind": "shift", "score": round(trend, 2),
+            "detail": f"Recent transaction sizes are {direction} {abs(trend):.0%} on the long-run average "
+                      f"(${stats['ewma_fast'] / 100:,.2f} vs ${stats['ewma_slow'] / 100:,.2f})",
+        })
+    return flags
+
+
+def _forget(stats: Dict[str, Any], transaction: Dict[str, Any]) -> None:
+    # Reverse Welford update; the EWMAs and sketches cannot un-see a value and are left as they are
+    x = abs(transaction["amount_cents"])
+    if stats["n"] <= 1:
+        stats.update(n=0, mean=0.0, m2=0.0)
+        return
+    mean_without = (stats["n"] * stats["mean"] - x) / (stats["n"] - 1)
+    stats["m2"] = max(0.0, stats["m2"] - (x - mean_without) * (x - stats["mean"]))
+    stats["mean"] = mean_without
+    stats["n"] -= 1
+
+
+def _trend(stats: Dict[str, Any]) -> float:
+    if not stats["ewma_slow"]:
+        return 0.0
+    return (stats["ewma_fast"] - stats["ewma_slow"]) / stats["ewma_slow"]
+
+
+def _load_stats(cursor: sqlite3.Cursor, dimension: str, key: str) -> Dict[str, Any]:
+    cursor.execute(
+        "SELECT n, mean, m2, ewma_fast, ewma_slow, sketch, last_date, last_shift_month FROM insight_stats "
+        "WHERE dimension = ? AND key = ?", (dimension, key)
+    )
+    row = cursor.fetchone()
+    stats = _empty_stats(dimension, key)
+    if row:
+        stats.update(zip(["n", "mean", "m2", "ewma_fast", "ewma_slow", "sketch", "last_date", "last_shift_month"], row))
+        stats["sketch"] = json.loads(stats["sketch"]) if stats["sketch"] else None
+    return stats
+
+
+def _save_stats(cursor: sqlite3.Cursor, stats_list: Iterable[Dict[str, Any]]) -> None:
+    cursor.executemany(
+        "INSERT OR REPLACE INTO insight_stats "
+        "(dimension, key, n, mean, m2, ewma_fast, ewma_slow, sketch, last_date, last_shift_month) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (s["dimension"], s["key"], s["n"], s["mean"], s["m2"], s["ewma_fast"], s["ewma_slow"],
+             json.dumps(s["sketch"]) if s["sketch"] else None, s["last_date"], s["last_shift_month"])
+            for s in stats_list
+        ]
+    )
+
+
+def _save_flags(cursor: sqlite3.Cursor, flags: List[Tuple]) -> None:
+    if not flags:
+        return
+    cursor.executemany(
+        "INSERT INTO insight_flags (dimension, key, kind, transaction_id, transaction_date, amount_cents, score, detail) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        flags
+    )
+    cursor.execute(
+        "DELETE FROM insight_flags WHERE id NOT IN (SELECT id FROM insight_flags ORDER BY id DESC LIMIT ?)",
+        (FLAGS_KEPT,)
+    )
+
+
+def observe_transaction(conn: sqlite3.Connection, transaction_id: int, transaction: Dict[str, Any]) -> None:
+    """
+    Update the insight statistics of the transaction's category and counterparty, flagging it if
+    it is an outlier or moves its key's trend.
+
+    Args:
+        conn: Open SQLite connection (the caller commits, together with the write)
+        transaction_id: ID of the written transaction
+        transaction: Values with `transaction_date`, `category`, `amount_cents` and optional `counterparty_id`
+    """
+    cursor = conn.cursor()
+    flags = []
+    for dimension, key in _keys(transaction):
+        stats = _load_stats(cursor, dimension, key)
+        for flag in _observe(stats, transaction):
+            flags.append((dimension, key, flag["kind"], transaction_id, transaction["transaction_date"],
+                          transaction["amount_cents"], flag["score"], flag["detail"]))
+        _save_stats(cursor, [stats])
+        cursor.execute(
+            "INSERT INTO insight_monthly (dimension, key, month, total_cents, transaction_count) VALUES (?, ?, ?, ?, 1) "
+            "ON CONFLICT(dimension, key, month) DO UPDATE SET total_cents = total_cents + excluded.total_cents, "
+            "transaction_count = transaction_count + 1",
+            (dimension, key, transaction["transaction_date"][:7], transaction["amount_cents"])
+        )
+    _save_flags(cursor, flags)
+
+
+def forget_transaction(conn: sqlite3.Connection, transaction: Dict[str, Any]) -> None:
+    """
+    Remove a deleted (or about to be edited) transaction from the mean/variance and monthly totals.
+
+    Args:
+        conn: Open SQLite connection (the caller commits)
+        transaction: The transaction's previous `transaction_date`, `category`, `amount_cents`, `counterparty_id`
+    """
+    cursor = conn.cursor()
+    for dimension, key in _keys(transaction):
+        stats = _load_stats(cursor, dimension, key)
+        _forget(stats, transaction)
+        _save_stats(cursor, [stats])
+        cursor.execute(
+            "UPDATE insight_monthly SET total_cents = total_cents - ?, transaction_count = transaction_count - 1 "
+            "WHERE dimension = ? AND key = ? AND month = ?",
+            (transaction["amount_cents"], dimension, key, transaction["transaction_date"][:7])
+        )
+        cursor.execute(
+            "DELETE FROM insight_monthly WHERE dimension = ? AND key = ? AND month = ? AND transaction_count <= 0",
+            (dimension, key, transaction["transaction_date"][:7])
+        )
+
+
+def rebuild_insights(conn: sqlite3.Connection, transactions: Iterable[Dict[str, Any]]) -> int:
+    """
+    Recompute all insight state from scratch, replaying transactions in date order.
+
+    Used for new or migrated databases; afterwards the state is maintained incrementally.
+
+    Args:
+        conn: Open SQLite connection (the caller commits)
+        transactions: Every transaction (hot and archived) with `id`, `transaction_date`, `category`,
+            `amount_cents` and `counterparty_id`
+
+    Returns:
+        Number of transactions replayed
+    """
+    stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    monthly: Dict[Tuple[str, str, str], List[int]] = {}
+    flags = []
+    ordered = sorted(transactions, key=lambda t: (t["transaction_date"], t["id"]))
+    for transaction in ordered:
+        for dimension, key in _keys(transaction):
+            key_stats = stats.setdefault((dimension, key), _empty_stats(dimension, key))
+            for flag in _observe(key_stats, transaction):
+                flags.append((dimension, key, flag["kind"], transaction["id"], transaction["transaction_date"],
+                              transaction["amount_cents"], flag["score"], flag["detail"]))
+            totals = monthly.setdefault((dimension, key, transaction["transaction_date"][:7]), [0, 0])
+            totals[0] += transaction["amount_cents"]
+            totals[1] += 1
+
+    cursor = conn.cursor()
+    for table in ("insight_stats", "insight_monthly", "insight_flags"):
+        cursor.execute(f"DELETE FROM {table}")
+    _save_stats(cursor, stats.values())
+    cursor.executemany(
+        "INSERT INTO insight_monthly (dimension, key, month, total_cents, transaction_count) VALUES (?, ?, ?, ?, ?)",
+        [(dimension, key, month, total, count) for (dimension, key, month), (total, count) in monthly.items()]
+    )
+    _save_flags(cursor, flags[-FLAGS_KEPT:])
+    return len(ordered)
+
+
+def _seasonal_deviations(monthly: List[Tuple[str, str, str, int]], month: str) -> List[Dict[str, Any]]:
+    # Compare each key's total for `month` with the same month in earlier years, or with the
+    # three months before it when there is no history for that month yet
+    totals: Dict[Tuple[str, str], Dict[str, int]] = {}
+    for dimension, key, key_month, total in monthly:
+        totals.setdefault((dimension, key), {})[key_month] = total
+
+    year, month_number = int(month[:4]), int(month[5:7])
+    previous_months = [
+        f"{(year * 12 + month_number - 1 - offset) // 12}-{(month_number - 1 - offset) % 12 + 1:02d}"
+        for offset in (1, 2, 3)
+    ]
+    deviations = []
+    for (dimension, key), by_month in totals.items():
+        if month not in by_month:
+            continue
+        same_month = [total for m, total in by_month.items() if m[5:7] == month[5:7] and m < month]
+        history, basis = (same_month, "same month in earlier years") if same_month else (
+            [by_month[m] for m in previous_months if m in by_month], "previous 3 months"
+        )
+        if not history:
+            continue
+        baseline = sum(history) / len(history)
+        if baseline == 0:
+            continue
+        # Relative change in size, so lower spending reads as a decrease like lower income does
+        change = (abs(by_month[month]) - abs(baseline)) / abs(baseline)
+        if abs(change) >= SEASONAL_DEVIATION:
+            deviations.append({
+                "dimension": dimension, "key": key, "month": month, "total_cents": by_month[month],
+                "baseline_cents": round(baseline), "change": round(change, 3), "basis": basis,
+            })
+    return sorted(deviations, key=lambda d: abs(d["total_cents"] - d["baseline_cents"]), reverse=True)
+
+
+def insight_summary(
+    db_path: str, dimension: Optional[str] = None, limit: int = 10, days: int = 90
+) -> Dict[str, Any]:
+    """
+    Read the precomputed insight state: what stands out and what to focus on.
+
+    Args:
+        db_path: Path to the SQLite database
+        dimension: Only "category" or "counterparty" keys (default: both)
+        limit: Maximum entries per section
+        days: Window for recent outliers and shifts
+
+    Returns:
+        Dict with `outliers` and `shifts` (recent flags), `seasonal` (last complete month vs its
+        seasonal baseline), `trends` (keys whose recent transaction sizes moved most) and `baselines`
+        (mean, std, p50, p95 of transaction size per key). Money is in cents; counterparty keys
+        carry their name.
+
+    Raises:
+        ValueError: If the dimension is unknown
+    """
+    if dimension is not None and dimension not in DIMENSIONS:
+        raise ValueError(f"dimension must be one of {', '.join(DIMENSIONS)}")
+    dimensions = [dimension] if dimension else list(DIMENSIONS)
+    placeholders = ", ".join("?" for _ in dimensions)
+    since = (date.today() - timedelta(days=days)).isoformat()
+    last_month = (date.today().replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        names = {str(row[0]): row[1] for row in cursor.execute("SELECT id, name FROM counterparties")}
+        flags = cursor.execute(
+            "SELECT dimension, key, kind, transaction_id, transaction_date, amount_cents, score, detail FROM insight_flags "
+            f"WHERE dimension IN ({placeholders}) AND transaction_date >= ? ORDER BY ABS(score) DESC",
+            dimensions + [since]
+        ).fetchall()
+        stats_rows = cursor.execute(
+            "SELECT dimension, key, n, mean, m2, ewma_fast, ewma_slow, sketch, last_date FROM insight_stats "
+            f"WHERE dimension IN ({placeholders}) AND n >= ?",
+            dimensions + [MIN_SAMPLES]
+        ).fetchall()
+        monthly = cursor.execute(
+            f"SELECT dimension, key, month, total_cents FROM insight_monthly WHERE dimension IN ({placeholders})",
+            dimensions
+        ).fetchall()
+    finally:
+        conn.close()
+
+    def label(entry: Dict[str, Any]) -> Dict[str, Any]:
+        entry["name"] = names.get(entry["key"], entry["key"]) if entry["dimension"] == "counterparty" else entry["key"]
+        return entry
+
+    columns = ["dimension", "key", "kind", "transaction_id", "transaction_date", "amount_cents", "score", "detail"]
+    flag_entries = [label(dict(zip(columns, row))) for row in flags]
+
+    baselines = []
+    for dim, key, n, mean, m2, ewma_fast, ewma_slow, sketch, last_date in stats_rows:
+        stats = {"n": n, "m2": m2, "ewma_fast": ewma_fast, "ewma_slow": ewma_slow}
+        quantiles = {p: P2Quantile(float(p), state).value() for p, state in (json.loads(sketch) if sketch else {}).items()}
+        baselines.append(label({
+            "dimension": dim, "key": key, "transactions": n, "last_date": last_date,
+            "mean_cents": round(mean), "std_cents": round(_std(stats)),
+            "p50_cents": round(quantiles.get("0.5") or 0), "p95_cents": round(quantiles.get("0.95") or 0),
+            "trend": round(_trend(stats), 3),
+        }))
+
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "outliers": [f for f in flag_entries if f["kind"] == "outlier"][:limit],
+        "shifts": [f for f in flag_entries if f["kind"] == "shift"][:limit],
+        "seasonal": [label(d) for d in _seasonal_deviations(monthly, last_month)][:limit],
+        "trends": sorted(
+            [b for b in baselines if abs(b["trend"]) >= SHIFT_RATIO], key=lambda b: abs(b["trend"]), reverse=True
+        )[:limit],
+        "baselines": sorted(baselines, key=lambda b: b["mean_cents"] * b["transactions"], reverse=True)[:limit],
+    }
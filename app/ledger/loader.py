@@ -0,0 +1,74 @@
+from typing import Any, Dict, List, Optional
+
+from ai_agents.utils.log import get_logger
+from ledger.archive import TRANSACTION_COLUMNS, read_transactions
+from ledger.money import CENTS_COLUMNS, present_transaction
+
+logger = get_logger("ledger.loader")
+
+# Presentation column names the analyst may ask for, mapped to the stored columns they need
+COLUMN_ALIASES = {presented: stored for stored, presented in CENTS_COLUMNS.items()}
+COLUMN_ALIASES["counterparty"] = "counterparty_id"
+
+
+class TransactionSource:
+    """
+    Lazy handle on the logical transactions table (SQLite hot tier plus Parquet archive).
+
+    Nothing is read until a caller asks for rows. Date range, category and column
+    scopes are pushed down to SQL predicates and Parquet partition pruning, and the
+    unscoped full ledger is materialized at most once per handle.
+    """
+
+    def __init__(self, database_path: str, archive_dir: str):
+        self.database_path = database_path
+        self.archive_dir = archive_dir
+        self._all_rows: Optional[List[Dict[str, Any]]] = None
+        self.rows_loaded = 0
+
+    def load(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        categories: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Load transactions matching the given scope.
+
+        Args:
+            start_date: Inclusive lower bound on transaction_date (YYYY-MM-DD)
+            end_date: Inclusive upper bound on transaction_date (YYYY-MM-DD)
+            categories: Only load these categories
+            columns: Only load these columns (presentation names such as `amount` are accepted)
+
+        Returns:
+            List of transaction dictionaries (dollars plus exact cents columns), newest first
+        """
+        if not (start_date or end_date or categories or columns):
+            return self.all()
+
+        stored_columns = None
+        if columns:
+            stored_columns = [COLUMN_ALIASES.get(c, c) for c in columns]
+            stored_columns = [c for c in TRANSACTION_COLUMNS if c in stored_columns]
+
+        rows = read_transactions(
+            self.database_path, self.archive_dir,
+            start_date=start_date, end_date=end_date, columns=stored_columns, categories=categories,
+        )
+        self.rows_loaded += len(rows)
+        logger.info(
+            f"Loaded {len(rows)} transactions (start={start_date}, end={end_date}, "
+            f"categories={categories}, columns={columns})"
+        )
+        return [present_transaction(row, keep_cents=True) for row in rows]
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Materialize the whole ledger on first access and reuse it afterwards."""
+        if self._all_rows is None:
+            rows = read_transactions(self.database_path, self.archive_dir)
+            self._all_rows = [present_transaction(row, keep_cents=True) for row in rows]
+            self.rows_loaded += len(self._all_rows)
+            logger.info(f"Loaded {len(self._all_rows)} transactions (full ledger)")
+        return self._all_rows
@@ -0,0 +1,120 @@
+import sqlite3
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Iterable, List, Union
+
+import numpy as np
+import pandas as pd
+
+from ledger.balances import LEDGER_VIEW
+
+# Money columns stored as int64 cents and the presentation column each maps to
+CENTS_COLUMNS = {
+    "amount_cents": "amount",
+    "balance_cents": "balance",
+}
+
+
+def to_cents(value: Union[int, float, str, Decimal]) -> int:
+    """
+    Convert a dollar amount to integer cents, rounding half away from zero.
+
+    Floats go through their shortest repr so 0.1 + 0.2 style noise never shifts a cent.
+    """
+    if isinstance(value, float):
+        value = repr(value)
+    return int((Decimal(value) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> float:
+    """Convert integer cents to a dollar float (presentation only)."""
+    return cents / 100
+
+
+def sum_cents(values: Iterable[int]) -> int:
+    """Exact sum of cent values as a single int64 NumPy reduction."""
+    return int(np.asarray(values, dtype=np.int64).sum())
+
+
+def groupby_sum_cents(df: pd.DataFrame, by: Union[str, List[str]], column: str = "amount_cents") -> pd.Series:
+    """
+    Exact per-group totals of a cents column.
+
+    Args:
+        df: DataFrame holding the cents column
+        by: Column(s) to group by
+        column: Cents column to sum (default: amount_cents)
+
+    Returns:
+        int64 Series of cents indexed by group
+    """
+    return df[column].astype(np.int64).groupby([df[c] for c in ([by] if isinstance(by, str) else by)]).sum()
+
+
+def cents_to_dollars(values: Any) -> Any:
+    """Convert a cents scalar, Series or DataFrame to dollars for display."""
+    if isinstance(values, (pd.Series, pd.DataFrame)):
+        return values / 100
+    return from_cents(values)
+
+
+def present_transaction(row: Dict[str, Any], keep_cents: bool = False) -> Dict[str, Any]:
+    """
+    Convert a transaction row to its presentation shape: cents columns become dollar floats.
+
+    Args:
+        row: Transaction row with int64 cents columns
+        keep_cents: Also keep the original cents columns (for exact aggregation downstream)
+    """
+    presented = {}
+    for key, value in row.items():
+        if key in CENTS_COLUMNS:
+            presented[CENTS_COLUMNS[key]] = from_cents(value) if value is not None else None
+            if keep_cents:
+                presented[key] = value
+        else:
+            presented[key] = value
+    return presented
+
+
+def migrate_transactions_to_cents(conn: sqlite3.Connection) -> bool:
+    """
+    Rebuild a legacy transactions table (REAL amount/balance) with int64 cents columns.
+
+    Balance checkpoints are dropped so they are rebuilt in cents on the next startup pass.
+
+    Returns:
+        True if a migration was performed
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(transactions)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "amount" not in columns or "amount_cents" in columns:
+        return False
+
+    cursor.execute(f"DROP VIEW IF EXISTS {LEDGER_VIEW}")
+    cursor.execute("DROP TABLE IF EXISTS balance_checkpoints")
+    cursor.execute('''
+        CREATE TABLE transactions_cents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_date DATE NOT NULL,
+            description TEXT NOT NULL,
+            category TEXT NOT NULL,
+            transaction_type TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            balance_cents INTEGER NOT NULL,
+            reference_number TEXT,
+            status TEXT NOT NULL DEFAULT 'Completed',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO transactions_cents (id, transaction_date, description, category, transaction_type,
+                                        amount_cents, balance_cents, reference_number, status, created_at)
+        SELECT id, transaction_date, description, category, transaction_type,
+               CAST(ROUND(amount * 100) AS INTEGER), CAST(ROUND(balance * 100) AS INTEGER),
+               reference_number, status, created_at
+        FROM transactions
+    ''')
+    cursor.execute("DROP TABLE transactions")
+    cursor.execute("ALTER TABLE transactions_cents RENAME TO transactions")
+    return True
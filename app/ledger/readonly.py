@@ -0,0 +1,155 @@
+import sqlite3
+import time
+from datetime import date
+from typing import Any, Callable, Optional, Sequence, Set
+
+import pandas as pd
+
+from ledger.archive import TRANSACTION_COLUMNS, query_cache_path
+from ledger.balances import LEDGER_VIEW
+
+# Tables analysis code may read; users and chat history stay out of reach
+READABLE_TABLES = {"transactions", "transactions_ledger", "counterparties", "balance_checkpoints"}
+
+DEFAULT_MAX_ROWS = 10000
+DEFAULT_TIMEOUT_SECONDS = 5.0
+
+# Number of SQLite VM instructions between deadline checks
+PROGRESS_INTERVAL = 10000
+
+_ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+
+class QueryLimitError(Exception):
+    """Raised when a read-only query exceeds its row or time limit."""
+
+
+def _date_literal(value: str) -> str:
+    # Views cannot take parameters; only a validated ISO date is ever inlined
+    return f"'{date.fromisoformat(value).isoformat()}'"
+
+
+def _attach_archive(
+    conn: sqlite3.Connection,
+    archive_dir: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    deadline: float,
+) -> None:
+    """
+    Make the ledger tables cover the archive on this connection.
+
+    The archive's SQLite copy (see `query_cache_path`) is attached read-only as `archive`, and
+    TEMP views named `transactions_ledger` and `transactions` union its rows with the SQLite
+    rows, limited to the scope. Unqualified names resolve to the temp schema first, so queries
+    see one logical table; SQLite pushes their filters into both halves of the union, where the
+    archive's date index serves them. No rows are copied and the database file is never written.
+    """
+    clauses = []
+    if start_date:
+        clauses.append(f"transaction_date >= {_date_literal(start_date)}")
+    if end_date:
+        clauses.append(f"transaction_date <= {_date_literal(end_date)}")
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    columns = ", ".join(TRANSACTION_COLUMNS)
+
+    try:
+        cache_path = query_cache_path(archive_dir, deadline) if archive_dir else None
+    except TimeoutError as e:
+        raise QueryLimitError("The archive was still being prepared for queries; try again shortly") from e
+    if not cache_path and not where:
+        return
+    if cache_path:
+        conn.execute("ATTACH DATABASE ? AS archive", (f"file:{cache_path}?mode=ro",))
+    for name in (LEDGER_VIEW, "transactions"):
+        archived = f"UNION ALL SELECT {columns} FROM archive.archived_transactions {where}" if cache_path else ""
+        conn.execute(f"CREATE TEMP VIEW {name} AS SELECT {columns} FROM main.{name} {where} {archived}")
+
+
+def _make_authorizer(protected_tables: Set[str]) -> Callable[..., int]:
+    # CTE names are not schema objects, so only real tables outside the allow-list are denied
+    def authorizer(
+        action: int, arg1: Optional[str], arg2: Optional[str], db_name: Optional[str], source: Optional[str]
+    ) -> int:
+        if action not in _ALLOWED_ACTIONS:
+            return sqlite3.SQLITE_DENY
+        if action == sqlite3.SQLITE_READ and arg1 in protected_tables:
+            return sqlite3.SQLITE_DENY
+        return sqlite3.SQLITE_OK
+
+    return authorizer
+
+
+def run_readonly_query(
+    db_path: str,
+    query: str,
+    params: Optional[Sequence[Any]] = None,
+    max_rows: int = DEFAULT_MAX_ROWS,
+    timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+    archive_dir: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Run a single SELECT against a read-only, authorizer-restricted SQLite connection.
+
+    The connection is opened with `mode=ro`, every statement is checked by an authorizer that
+    only allows reading the ledger tables, and a progress handler aborts the query once the
+    time limit has passed. With an `archive_dir`, `transactions_ledger` and `transactions`
+    also include the archived months, so aggregates cover the whole ledger.
+
+    Args:
+        db_path: Path to the SQLite database
+        query: SQL SELECT statement (use `?` placeholders for values)
+        params: Values for the placeholders
+        max_rows: Maximum number of result rows
+        timeout_seconds: Maximum wall-clock time for the query
+        archive_dir: Root directory of the Parquet archive to include
+        start_date: Limit the ledger tables to transaction_date >= this (YYYY-MM-DD)
+        end_date: Limit the ledger tables to transaction_date <= this (YYYY-MM-DD)
+
+    Returns:
+        DataFrame with the query result
+
+    Raises:
+        QueryLimitError: If the result has more than `max_rows` rows or the query (including
+            preparing the archive) times out
+        sqlite3.DatabaseError: If the query is invalid or not authorized
+        ValueError: If `start_date` or `end_date` is not a YYYY-MM-DD date
+    """
+    # The limit covers preparing the archive as well as the query itself
+    deadline = time.monotonic() + timeout_seconds
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        if archive_dir or start_date or end_date:
+            _attach_archive(conn, archive_dir, start_date, end_date, deadline)
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
+        schema_objects = {row[0] for row in cursor.fetchall()} | {"sqlite_master", "sqlite_schema"}
+        conn.set_authorizer(_make_authorizer(schema_objects - READABLE_TABLES))
+
+        conn.set_progress_handler(lambda: int(time.monotonic() > deadline), PROGRESS_INTERVAL)
+
+        try:
+            cursor.execute(query, tuple(params or ()))
+            rows = cursor.fetchmany(max_rows + 1)
+        except sqlite3.OperationalError as e:
+            if time.monotonic() > deadline:
+                raise QueryLimitError(f"Query exceeded the {timeout_seconds}s time limit") from e
+            raise
+
+        if len(rows) > max_rows:
+            raise QueryLimitError(
+                f"Query returned more than {max_rows} rows; aggregate or filter in SQL instead"
+            )
+
+        columns = [description[0] for description in cursor.description or []]
+        return pd.DataFrame(rows, columns=columns)
+    finally:
+        conn.close()
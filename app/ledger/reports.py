@@ -0,0 +1,247 @@
+import json
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ledger.archive import read_transactions
+from ledger.version import ledger_version
+
+# Stored reports kept per name (older ones are pruned)
+REPORTS_KEPT = 5
+# Window for the top-categories report
+TOP_CATEGORY_DAYS = 90
+TOP_CATEGORY_LIMIT = 5
+
+
+def ensure_report_schema(conn: sqlite3.Connection) -> None:
+    """
+    Create the `report_jobs` (scheduler state) and `reports` (results) tables.
+
+    Reports are computed from the whole ledger, which is shared by all users, so they are not per-user.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_jobs (
+            name TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'pending',
+            ledger_version INTEGER,
+            last_run_at DATETIME,
+            last_success_at DATETIME,
+            duration_ms REAL,
+            last_error TEXT,
+            runs INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            ledger_version INTEGER NOT NULL,
+            generated_at DATETIME NOT NULL,
+            duration_ms REAL,
+            payload TEXT NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_name ON reports (name, id)")
+    # A job left 'running' by a crash or restart will simply run again
+    cursor.execute("UPDATE report_jobs SET status = 'interrupted' WHERE status = 'running'")
+
+
+def _load_frame(db_path: str, archive_dir: str, start_date: Optional[str] = None) -> pd.DataFrame:
+    rows = read_transactions(
+        db_path, archive_dir, start_date=start_date,
+        columns=["transaction_date", "category", "transaction_type", "amount_cents", "balance_cents"],
+    )
+    df = pd.DataFrame(rows, columns=["transaction_date", "category", "transaction_type", "amount_cents", "balance_cents"])
+    df["month"] = df["transaction_date"].str[:7]
+    return df
+
+
+def _table(df: pd.DataFrame, summary: str) -> Dict[str, Any]:
+    # Same shape as a chat table artifact so clients can render both the same way
+    payload = json.loads(df.to_json(orient="split", index=False))
+    return {"columns": payload["columns"], "rows": payload["data"], "summary": summary}
+
+
+def monthly_pnl(db_path: str, archive_dir: str) -> Dict[str, Any]:
+    """Income, expenses and net result per month (cents)."""
+    df = _load_frame(db_path, archive_dir)
+    if df.empty:
+        return _table(pd.DataFrame(columns=["month", "income_cents", "expense_cents", "net_cents"]), "No transactions")
+
+    df["income_cents"] = df["amount_cents"].where(df["amount_cents"] > 0, 0)
+    df["expense_cents"] = df["amount_cents"].where(df["amount_cents"] < 0, 0)
+    pnl = (
+        df.groupby("month")[["income_cents", "expense_cents", "amount_cents"]].sum()
+        .rename(columns={"amount_cents": "net_cents"}).astype(np.int64).reset_index()
+        .sort_values("month")
+    )
+    best = pnl.loc[pnl["net_cents"].idxmax()]
+    worst = pnl.loc[pnl["net_cents"].idxmin()]
+    summary = (
+        f"{len(pnl)} months; best month {best['month']} (net ${best['net_cents'] / 100:,.2f}), "
+        f"worst month {worst['month']} (net ${worst['net_cents'] / 100:,.2f})"
+    )
+    return _table(pnl, summary)
+
+
+def top_categories(db_path: str, archive_dir: str) -> Dict[str, Any]:
+    """Largest income and expense categories over the trailing window (cents)."""
+    start = (date.today() - timedelta(days=TOP_CATEGORY_DAYS)).isoformat()
+    df = _load_frame(db_path, archive_dir, start_date=start)
+    totals = df.groupby(["transaction_type", "category"])["amount_cents"].agg(["sum", "count"]).reset_index()
+    totals.columns = ["transaction_type", "category", "total_cents", "transaction_count"]
+    totals["abs_total"] = totals["total_cents"].abs()
+    top = (
+        totals.sort_values("abs_total", ascending=False).groupby("transaction_type").head(TOP_CATEGORY_LIMIT)
+        .drop(columns="abs_total").reset_index(drop=True)
+    )
+    top[["total_cents", "transaction_count"]] = top[["total_cents", "transaction_count"]].astype(np.int64)
+    leaders = ", ".join(
+        f"{row.transaction_type}: {row.category} (${row.total_cents / 100:,.2f})"
+        for row in top.groupby("transaction_type").head(1).itertuples()
+    )
+    return _table(top, f"Last {TOP_CATEGORY_DAYS} days since {start}; largest {leaders or 'none'}")
+
+
+def cash_flow_trend(db_path: str, archive_dir: str) -> Dict[str, Any]:
+    """Monthly net cash flow, closing balance, 3-month moving average and linear trend."""
+    df = _load_frame(db_path, archive_dir)
+    if df.empty:
+        return _table(pd.DataFrame(columns=["month", "net_cents", "closing_balance_cents"]), "No transactions")
+
+    # Rows come newest first (date, id); reverse so "last" is each month's closing row
+    df = df.iloc[::-1]
+    trend = df.groupby("month").agg(net_cents=("amount_cents", "sum"), closing_balance_cents=("balance_cents", "last"))
+    trend["net_3m_avg_cents"] = trend["net_cents"].rolling(3, min_periods=1).mean().round().astype(np.int64)
+    trend = trend.astype(np.int64).reset_index()
+
+    slope = np.polyfit(np.arange(len(trend)), trend["net_cents"], 1)[0] if len(trend) > 1 else 0.0
+    direction = "improving" if slope > 0 else "declining" if slope < 0 else "flat"
+    summary = (
+        f"Net cash flow is {direction} by about ${abs(slope) / 100:,.2f} per month; "
+        f"latest closing balance ${trend['closing_balance_cents'].iloc[-1] / 100:,.2f}"
+    )
+    return _table(trend, summary)
+
+
+# Standard analyses the scheduler keeps up to date
+STANDARD_REPORTS: Dict[str, Callable[[str, str], Dict[str, Any]]] = {
+    "monthly_pnl": monthly_pnl,
+    "top_categories": top_categories,
+    "cash_flow_trend": cash_flow_trend,
+}
+
+
+def configured_reports() -> List[str]:
+    """Report names enabled by REPORTS_ENABLED (comma separated, default: all standard reports)."""
+    enabled = os.getenv("REPORTS_ENABLED")
+    if not enabled:
+        return list(STANDARD_REPORTS)
+    return [name.strip() for name in enabled.split(",") if name.strip() in STANDARD_REPORTS]
+
+
+def run_report(db_path: str, archive_dir: str, name: str) -> Dict[str, Any]:
+    """
+    Compute one report and store it, recording the job's state in `report_jobs`.
+
+    Args:
+        db_path: Path to the SQLite database
+        archive_dir: Parquet archive root
+        name: Report name (a key of STANDARD_REPORTS)
+
+    Returns:
+        The stored report payload
+
+    Raises:
+        KeyError: If the report name is unknown
+        Exception: Whatever the analysis raised (also recorded on the job)
+    """
+    analysis = STANDARD_REPORTS[name]
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        version = ledger_version(conn)
+        now = datetime.now().isoformat(timespec="seconds")
+        cursor.execute(
+            "INSERT INTO report_jobs (name, status, last_run_at) VALUES (?, 'running', ?) "
+            "ON CONFLICT(name) DO UPDATE SET status = 'running', last_run_at = excluded.last_run_at",
+            (name, now)
+        )
+        conn.commit()
+
+        started = time.perf_counter()
+        try:
+            payload = analysis(db_path, archive_dir)
+        except Exception as e:
+            cursor.execute(
+                "UPDATE report_jobs SET status = 'failed', last_error = ?, runs = runs + 1 WHERE name = ?",
+                (str(e), name)
+            )
+            conn.commit()
+            raise
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        cursor.execute(
+            "INSERT INTO reports (name, ledger_version, generated_at, duration_ms, payload) VALUES (?, ?, ?, ?, ?)",
+            (name, version, datetime.now().isoformat(timespec="seconds"), duration_ms, json.dumps(payload))
+        )
+        cursor.execute(
+            "DELETE FROM reports WHERE name = ? AND id NOT IN "
+            "(SELECT id FROM reports WHERE name = ? ORDER BY id DESC LIMIT ?)",
+            (name, name, REPORTS_KEPT)
+        )
+        cursor.execute(
+            "UPDATE report_jobs SET status = 'succeeded', ledger_version = ?, last_success_at = ?, "
+            "duration_ms = ?, last_error = NULL, runs = runs + 1 WHERE name = ?",
+            (version, datetime.now().isoformat(timespec="seconds"), duration_ms, name)
+        )
+        conn.commit()
+        return payload
+    finally:
+        conn.close()
+
+
+def latest_reports(db_path: str, name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Return the most recent stored report for each name (or just `name`), flagged stale when the
+    ledger has changed since it was computed.
+
+    Args:
+        db_path: Path to the SQLite database
+        name: Only return this report
+
+    Returns:
+        List of dicts with name, ledger_version, generated_at, duration_ms, stale and payload fields
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        current_version = ledger_version(conn)
+        query = (
+            "SELECT name, ledger_version, generated_at, duration_ms, payload FROM reports "
+            "WHERE id IN (SELECT MAX(id) FROM reports GROUP BY name)"
+        )
+        params: List[Any] = []
+        if name:
+            query += " AND name = ?"
+            params.append(name)
+        rows = conn.execute(query + " ORDER BY name", params).fetchall()
+    finally:
+        conn.close()
+
+    return [
+        {
+            "name": report_name,
+            "ledger_version": version,
+            "generated_at": generated_at,
+            "duration_ms": duration_ms,
+            "stale": version != current_version,
+            "payload": json.loads(payload),
+        }
+        for report_name, version, generated_at, duration_ms, payload in rows
+    ]
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from ai_agents.utils import metrics
+from ai_agents.utils.log import get_logger
+from ledger.reports import configured_reports, run_report
+from ledger.version import ledger_version
+
+logger = get_logger("ledger.scheduler")
+
+# How often the scheduler checks for work (plus up to REPORTS_JITTER_SECONDS of jitter)
+POLL_SECONDS = float(os.getenv("REPORTS_POLL_SECONDS", "60"))
+JITTER_SECONDS = float(os.getenv("REPORTS_JITTER_SECONDS", "10"))
+# Wait this long after the last ledger write before recomputing, so bursts of edits cost one run
+SETTLE_SECONDS = float(os.getenv("REPORTS_SETTLE_SECONDS", "5"))
+# Jobs only start when no API request has been seen for this long
+IDLE_SECONDS = float(os.getenv("REPORTS_IDLE_SECONDS", "2"))
+# Maximum reports computed at the same time
+MAX_CONCURRENCY = int(os.getenv("REPORTS_MAX_CONCURRENCY", "1"))
+# Local hours (start-end, end exclusive) in which every report is refreshed once a day
+OFF_PEAK_HOURS = os.getenv("REPORTS_OFF_PEAK_HOURS", "1-5")
+
+
+def _in_off_peak(now: datetime, hours: str = OFF_PEAK_HOURS) -> bool:
+    start, end = (int(h) for h in hours.split("-"))
+    if start <= end:
+        return start <= now.hour < end
+    return now.hour >= start or now.hour < end
+
+
+class ReportScheduler:
+    """
+    In-process scheduler that keeps the standard reports up to date.
+
+    A report is recomputed when the ledger version moved since its last successful run
+    (after writes have settled), and once a day during off-peak hours. Jobs run in worker
+    threads, limited by a semaphore, with random jitter, and only while the API is idle,
+    so they do not compete with interactive requests. Job state lives in `report_jobs`.
+    """
+
+    def __init__(self, db_path: str, archive_dir: str, reports: Optional[List[str]] = None):
+        self.db_path = db_path
+        self.archive_dir = archive_dir
+        self.reports = reports if reports is not None else configured_reports()
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[str] = set()
+        self._jobs: Set[asyncio.Task] = set()
+        self._last_activity = 0.0
+        self._last_change = 0.0
+
+    def start(self) -> None:
+        """Start the scheduler loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            # Check for missing or stale reports right away instead of after the first poll
+            self._wake.set()
+            logger.info(f"Report scheduler started for {', '.join(self.reports)}")
+
+    async def stop(self) -> None:
+        """Cancel the scheduler loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def note_activity(self) -> None:
+        """Record interactive traffic; jobs wait until the API has been idle for IDLE_SECONDS."""
+        self._last_activity = time.monotonic()
+
+    def notify_ledger_changed(self) -> None:
+        """Wake the scheduler after a ledger write so stale reports are refreshed soon."""
+        self._last_change = time.monotonic()
+        self._wake.set()
+
+    def due_reports(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Return the reports that need recomputing.
+
+        A report is due if it never succeeded, its ledger version is behind the current one,
+        or it is off-peak and it has not succeeded today.
+        """
+        now = now or datetime.now()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            current_version = ledger_version(conn)
+            jobs: Dict[str, tuple] = {
+                name: (version, last_success_at)
+                for name, version, last_success_at in conn.execute(
+                    "SELECT name, ledger_version, last_success_at FROM report_jobs"
+                ).fetchall()
+            }
+        finally:
+            conn.close()
+
+        due = []
+        for name in self.reports:
+            version, last_success_at = jobs.get(name, (None, None))
+            if version is None or version != current_version:
+                due.append(name)
+            elif _in_off_peak(now) and (last_success_at or "")[:10] != now.date().isoformat():
+                due.append(name)
+        return due
+
+    async def run_now(self, name: str) -> None:
+        """Compute one report in a worker thread, within the concurrency limit."""
+        if name in self._running:
+            return
+        self._running.add(name)
+        try:
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    await asyncio.to_thread(run_report, self.db_path, self.archive_dir, name)
+                except Exception as e:
+                    metrics.increment("reports.failures", report=name)
+                    logger.error(f"Report {name} failed: {e}")
+                    return
+                duration_ms = round((time.perf_counter() - started) * 1000, 2)
+                metrics.observe("reports.duration_ms", duration_ms, report=name)
+                logger.info(f"Report {name} refreshed in {duration_ms}ms", extra={"report": name, "latency_ms": duration_ms})
+        finally:
+            self._running.discard(name)
+
+    async def _wait_for_quiet(self) -> None:
+        # Let bursts of writes settle and interactive requests drain before starting work
+        while True:
+            now = time.monotonic()
+            wait = max(self._last_change + SETTLE_SECONDS - now, self._last_activity + IDLE_SECONDS - now)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=POLL_SECONDS + random.uniform(0, JITTER_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            try:
+                due = await asyncio.to_thread(self.due_reports)
+            except sqlite3.Error as e:
+                logger.error(f"Report scheduler could not read job state: {e}")
+                continue
+
+            for name in due:
+                await self._wait_for_quiet()
+                await asyncio.sleep(random.uniform(0, JITTER_SECONDS))
+                job = asyncio.create_task(self.run_now(name))
+                self._jobs.add(job)
+                job.add_done_callback(self._jobs.discard)
@@ -0,0 +1,31 @@
+import sqlite3
+
+LEDGER_VERSION_KEY = "ledger_version"
+
+
+def ensure_version_schema(conn: sqlite3.Connection) -> None:
+    """
+    Create the `ledger_meta` key/value table holding the ledger version counter.
+
+    The version is bumped by every write to the transactions, so anything derived from the
+    ledger (reports, export caches) can tell whether it is stale by comparing versions.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ledger_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO ledger_meta (key, value) VALUES (?, 0)", (LEDGER_VERSION_KEY,))
+
+
+def bump_ledger_version(conn: sqlite3.Connection) -> None:
+    """Increment the ledger version (the caller commits, together with the write it versions)."""
+    conn.execute("UPDATE ledger_meta SET value = value + 1 WHERE key = ?", (LEDGER_VERSION_KEY,))
+
+
+def ledger_version(conn: sqlite3.Connection) -> int:
+    """Return the current ledger version (0 if the meta table is empty)."""
+    row = conn.execute("SELECT value FROM ledger_meta WHERE key = ?", (LEDGER_VERSION_KEY,)).fetchone()
+    return row[0] if row else 0
@@ -1,20 +1,53 @@
+import asyncio
 import json
 import logging
+import math
 import os
 import sqlite3
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import bcrypt
+from agents import MaxTurnsExceeded
 from ai_agents.banksie.banksie import BanksieAgent
-from ai_agents.utils.log import setup_logging
+from ai_agents.banksie.budget import INCOMPLETE_ANSWER_NOTE, events_until_deadline
+from ai_agents.banksie.profiling import ensure_slow_analysis_schema, slowest_analyses
+from ai_agents.banksie.routing import record_run
+from ai_agents.utils import metrics
+from ai_agents.utils.chat_store import (CHAT_MAX_PAGE_SIZE, CHAT_PAGE_SIZE, chat_history_page, ensure_chat_schema,
+                                        get_chat_message, save_chat_message)
+from ai_agents.utils.knowledge_store import ensure_knowledge_schema, get_knowledge_store
+from ai_agents.utils.llm_client import create_llm_client
+from ai_agents.utils.log import correlation_id_var, new_correlation_id, setup_logging
 from ai_agents.utils.state import StateContext
+from ai_agents.utils.trace_store import (GROUP_COLUMNS, SPAN_KINDS, TraceWriter, ensure_trace_schema, message_spans,
+                                         span_stats)
+from auth.passwords import PasswordHasher, PasswordHasherBusy
+from auth.throttle import LOGIN_MAX_FAILURES_PER_IP, LoginThrottle
+from auth.tokens import TokenCache
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException, WebSocket
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
+from ledger.archive import (archive_closed_months, archive_cutoff, archived_amount_totals, clear_archive,
+                            load_manifest, migrate_archive, read_transactions)
+from ledger.balances import (balance_as_of, delete_transaction, ensure_balance_schema, insert_transaction,
+                             rebuild_balances, update_transaction)
+from ledger.changes import ChangeFeed, current_seq, ensure_change_schema, read_changes, reset_change_log
+from ledger.counterparties import (backfill_counterparties, counterparty_id_for, counterparty_rollup,
+                                   ensure_counterparty_schema)
+from ledger.export import (EXPORT_BATCH_ROWS, EXPORT_FORMATS, EXPORT_SCHEMA, iter_transaction_batches, result_table,
+                           spool_export)
+from ledger.insights import DIMENSIONS, ensure_insight_schema, insight_summary, rebuild_insights
+from ledger.loader import TransactionSource
+from ledger.money import from_cents, migrate_transactions_to_cents, present_transaction, to_cents
+from ledger.reports import STANDARD_REPORTS, ensure_report_schema, latest_reports
+from ledger.scheduler import ReportScheduler
+from ledger.version import ensure_version_schema, ledger_version
 from openai.types.responses import ResponseTextDeltaEvent
 from pydantic import BaseModel
 
@@ -74,12 +107,58 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Change-Seq"],
 )
 
 # Configuration
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-key")
 DATABASE_PATH = os.getenv("DATABASE_PATH", "./database.sqlite")
 FORCE_DB_REFRESH = os.getenv("FORCE_DB_REFRESH", "false").lower() == "true"
+# Closed months older than ARCHIVE_HOT_MONTHS are moved to Parquet partitions (0 disables archiving)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
+ARCHIVE_HOT_MONTHS = int(os.getenv("ARCHIVE_HOT_MONTHS", "6"))
+# Exports are spooled here once per ledger version and served with Range support
+EXPORT_DIR = os.getenv("EXPORT_DIR", "./exports")
+# Change stream subscribers re-check for writes from other processes this often
+CHANGES_PUSH_POLL_SECONDS = float(os.getenv("CHANGES_PUSH_POLL_SECONDS", "15"))
+# Share of routine request/data logs that are kept; slow requests and errors are always logged
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+# Background refresh of the standard reports (monthly P&L, top categories, cash-flow trend)
+REPORTS_SCHEDULER_ENABLED = os.getenv("REPORTS_SCHEDULER_ENABLED", "true").lower() == "true"
+
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    """
+    Tag each request with a correlation ID and log its latency.
+    
+    The ID is taken from the X-Request-ID header when present and echoed back on the response,
+    so every log record written while handling the request can be joined on it.
+    """
+    # Background report jobs hold off while interactive requests are coming in
+    report_scheduler.note_activity()
+    
+    correlation_id = request.headers.get("X-Request-ID")
+    if correlation_id:
+        correlation_id_var.set(correlation_id)
+    else:
+        correlation_id = new_correlation_id()
+    
+    started = time.perf_counter()
+    response = await call_next(request)
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    
+    response.headers["X-Request-ID"] = correlation_id
+    fields = {
+        "method": request.method,
+        "path": request.url.path,
+        "status": response.status_code,
+        "latency_ms": latency_ms,
+    }
+    if response.status_code < 500 and latency_ms < SLOW_REQUEST_MS:
+        fields["sample_rate"] = LOG_SAMPLE_RATE
+    logger.info(f"{request.method} {request.url.path} -> {response.status_code} in {latency_ms}ms", extra=fields)
+    return response
 
 # Security
 security = HTTPBearer()
@@ -103,6 +182,28 @@ class ChatResponse(BaseModel):
     response: str
     created_at: str
 
+class KnowledgeDocument(BaseModel):
+    title: str
+    content: str
+
+class TransactionCreate(BaseModel):
+    transaction_date: str
+    description: str
+    category: str
+    transaction_type: str
+    amount: float
+    reference_number: Optional[str] = None
+    status: str = "Completed"
+
+class TransactionUpdate(BaseModel):
+    transaction_date: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    transaction_type: Optional[str] = None
+    amount: Optional[float] = None
+    reference_number: Optional[str] = None
+    status: Optional[str] = None
+
 # Database initialization
 def init_database():
     """
@@ -137,8 +238,8 @@ def init_database():
             description TEXT NOT NULL,
             category TEXT NOT NULL,
             transaction_type TEXT NOT NULL,
-            amount DECIMAL(10,2) NOT NULL,
-            balance DECIMAL(10,2) NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            balance_cents INTEGER NOT NULL,
             reference_number TEXT,
             status TEXT NOT NULL DEFAULT 'Completed',
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP
@@ -153,18 +254,61 @@ def init_database():
             message TEXT NOT NULL,
             response TEXT,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            artifacts TEXT,
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
     
+    # Tables/series shown alongside a response, stored as a JSON list
+    cursor.execute("PRAGMA table_info(chat_messages)")
+    if "artifacts" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE chat_messages ADD COLUMN artifacts TEXT")
+    
+    # History previews, and zlib compression of long responses and artifacts
+    ensure_chat_schema(conn)
+    
+    # Money is stored as integer cents; upgrade databases and archives written with REAL columns
+    if migrate_transactions_to_cents(conn):
+        logger.info("💱 Migrated transactions table to integer cents")
+    
+    # Counterparty dimension, normalized from descriptions at ingest
+    ensure_counterparty_schema(conn)
+    migrate_archive(ARCHIVE_DIR, lambda description: counterparty_id_for(cursor, description))
+    
+    # Ledger version counter, bumped by every transaction write
+    ensure_version_schema(conn)
+    
+    # Per-month balance checkpoints and the balance-corrected read view
+    ensure_balance_schema(conn)
+    
+    # Sequenced change log on transactions (maintained by triggers) for incremental dashboard sync
+    ensure_change_schema(conn)
+    
+    # Precomputed standard reports and their scheduler state
+    ensure_report_schema(conn)
+    
+    # Streaming statistics per category and counterparty, maintained on every transaction write
+    ensure_insight_schema(conn)
+    
+    # Slow analysis executions (opt-in profiling)
+    ensure_slow_analysis_schema(conn)
+    
+    # Per-run trace spans (model calls, tool executions), linked to chat_messages
+    ensure_trace_schema(conn)
+    
+    # Business documents and embedded chunks of documents and earlier answers for retrieval
+    ensure_knowledge_schema(conn)
+    
     # Insert sample transaction data if empty
     cursor.execute("SELECT COUNT(*) FROM transactions")
     transaction_count = cursor.fetchone()[0]
+    archive_empty = not load_manifest(ARCHIVE_DIR)
     
-    if transaction_count == 0 or FORCE_DB_REFRESH:
-        if FORCE_DB_REFRESH and transaction_count > 0:
+    if (transaction_count == 0 and archive_empty) or FORCE_DB_REFRESH:
+        if FORCE_DB_REFRESH and (transaction_count > 0 or not archive_empty):
             logger.info("🔄 FORCE_DB_REFRESH=true - Clearing existing transaction data")
             cursor.execute("DELETE FROM transactions")
+            clear_archive(ARCHIVE_DIR)
         
         import random
         from datetime import datetime, timedelta
@@ -322,12 +466,25 @@ def init_database():
                 ))
                 transaction_id += 1
         
-        # Insert all transactions
+        # Insert all transactions, converting dollar amounts to integer cents
         cursor.executemany(
-            "INSERT INTO transactions (transaction_date, description, category, transaction_type, amount, balance, reference_number, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            sample_transactions
+            "INSERT INTO transactions (transaction_date, description, category, transaction_type, amount_cents, balance_cents, reference_number, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (date_str, description, category, trans_type, to_cents(amount), to_cents(balance), reference, status)
+                for date_str, description, category, trans_type, amount, balance, reference, status in sample_transactions
+            ]
         )
     
+    # Normalize counterparties for seeded rows and rows written before the counterparty column existed
+    backfill_counterparties(conn)
+    
+    # Build balance checkpoints for freshly seeded data or databases created before checkpoints existed
+    cursor.execute("SELECT COUNT(*) FROM balance_checkpoints")
+    if transaction_count == 0 or FORCE_DB_REFRESH or cursor.fetchone()[0] == 0:
+        rebuild_balances(conn, archived_amount_totals(ARCHIVE_DIR))
+        # Bulk rewrites are not worth shipping as deltas: every client resyncs instead
+        reset_change_log(conn)
+    
     # Create default admin user if no users exist
     cursor.execute("SELECT COUNT(*) FROM users")
     if cursor.fetchone()[0] == 0:
@@ -338,11 +495,36 @@ def init_database():
         )
     
     conn.commit()
+    
+    # Build the insight statistics for freshly seeded data or databases created before they existed
+    cursor.execute("SELECT COUNT(*) FROM insight_stats")
+    if transaction_count == 0 or FORCE_DB_REFRESH or cursor.fetchone()[0] == 0:
+        replayed = rebuild_insights(conn, read_transactions(
+            DATABASE_PATH, ARCHIVE_DIR, columns=["id", "transaction_date", "category", "amount_cents", "counterparty_id"]
+        ))
+        conn.commit()
+        logger.info(f"📈 Built insight statistics from {replayed} transactions")
+    
     conn.close()
 
 # Initialize database on startup
 init_database()
 
+# Move closed months out of SQLite into the Parquet archive
+try:
+    archived_count = archive_closed_months(DATABASE_PATH, ARCHIVE_DIR, ARCHIVE_HOT_MONTHS)
+    if archived_count:
+        logger.info(f"🗄️ Archived {archived_count} transactions to {ARCHIVE_DIR}")
+        # Archived rows left SQLite but not the ledger; clients resync rather than delete them
+        conn = sqlite3.connect(DATABASE_PATH)
+        try:
+            reset_change_log(conn)
+            conn.commit()
+        finally:
+            conn.close()
+except Exception as e:
+    logger.error(f"❌ Failed to archive closed months: {e}")
+
 # Initialize AI Agent with proper error handling and logging
 try:
     # Load OpenAI API key from project root .env file
@@ -366,8 +548,11 @@ try:
         logger.error("Expected format: OPENAI_API_KEY=sk-proj-your-actual-key-here")
         raise ValueError("Invalid or missing OpenAI API key")
     
+    # One pooled model client for the whole process, shared by every chat run
+    llm_client = create_llm_client(api_key=openai_key)
+    
     # Initialize the BanksieAgent
-    ai_agent = BanksieAgent()
+    ai_agent = BanksieAgent(openai_client=llm_client)
     logger.info("✓ Successfully initialized OpenAI-powered BanksieAgent")
     
 except Exception as e:
@@ -375,47 +560,121 @@ except Exception as e:
     logger.error("The chat functionality will not work without a valid OpenAI API key")
     logger.error("Please ensure your .env file contains: OPENAI_API_KEY=sk-proj-your-actual-key-here")
     ai_agent = None
+    llm_client = None
+
+# Keeps the standard reports fresh in the background
+report_scheduler = ReportScheduler(DATABASE_PATH, ARCHIVE_DIR)
+
+@app.on_event("startup")
+async def start_report_scheduler():
+    """Start the background report scheduler on the server's event loop."""
+    if REPORTS_SCHEDULER_ENABLED:
+        report_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_report_scheduler():
+    """Stop the background report scheduler."""
+    await report_scheduler.stop()
+
+# Vector retrieval over earlier answers and business documents (shared with the agent's search_knowledge tool)
+knowledge_store = get_knowledge_store(DATABASE_PATH)
+
+# Startup indexing task, and the flag that ends its worker thread early at shutdown
+knowledge_sync_task: Optional[asyncio.Task] = None
+knowledge_sync_stop = threading.Event()
+
+@app.on_event("startup")
+async def index_earlier_chat_messages():
+    """Load the vector index and index chat answers saved before it existed, off the event loop."""
+    global knowledge_sync_task
+    async def sync():
+        try:
+            await asyncio.to_thread(knowledge_store.sync_chat_messages, knowledge_sync_stop)
+        except Exception as e:
+            logger.error(f"❌ Failed to index earlier chat messages: {e}")
+    knowledge_sync_stop.clear()
+    knowledge_sync_task = asyncio.create_task(sync())
+
+@app.on_event("shutdown")
+async def stop_indexing_earlier_chat_messages():
+    """Stop the startup indexing task if it is still running."""
+    global knowledge_sync_task
+    if knowledge_sync_task is not None:
+        knowledge_sync_stop.set()
+        knowledge_sync_task.cancel()
+        try:
+            await knowledge_sync_task
+        except asyncio.CancelledError:
+            pass
+        knowledge_sync_task = None
+
+# Wakes dashboard change subscribers after writes and compacts the change log
+change_feed = ChangeFeed(DATABASE_PATH)
 
-# Add this helper function after the existing database functions
-def get_transaction_data() -> List[Dict[str, Any]]:
-    """Fetch all transaction data from the database"""
+@app.on_event("startup")
+async def start_change_feed():
+    """Start background compaction of the transaction change log."""
+    change_feed.start()
+
+@app.on_event("shutdown")
+async def stop_change_feed():
+    """Stop change log compaction."""
+    await change_feed.stop()
+
+# Batches trace spans into agent_spans in the background
+trace_writer = TraceWriter(DATABASE_PATH)
+
+@app.on_event("startup")
+async def start_trace_writer():
+    """Start the background trace span writer."""
+    trace_writer.start()
+
+@app.on_event("shutdown")
+async def stop_trace_writer():
+    """Write any buffered trace spans and stop the writer."""
+    await trace_writer.stop()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    """Close the pooled model client's connections on shutdown."""
+    if llm_client is not None:
+        await llm_client.close()
+
+# Password hashing runs in its own bounded pool; failed logins are throttled per username from each
+# client address, and addresses with many failures get a small share of the pool
+password_hasher = PasswordHasher()
+login_throttle = LoginThrottle()
+client_login_throttle = LoginThrottle(max_failures=LOGIN_MAX_FAILURES_PER_IP)
+# Claims of recently verified tokens, so repeat requests skip JWT verification
+token_cache = TokenCache()
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    """Stop the password hashing pool."""
+    password_hasher.shutdown()
+
+async def check_password(password: str, hashed: str, limited: bool = False) -> bool:
+    """Verify a password in the hashing pool (on the throttled budget if `limited`), answering 503 when it is saturated."""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM transactions ORDER BY transaction_date DESC")
-        rows = cursor.fetchall()
-        conn.close()
-        
-        data = []
-        for row in rows:
-            data.append({
-                "id": row[0],
-                "transaction_date": row[1],
-                "description": row[2],
-                "category": row[3],
-                "transaction_type": row[4],
-                "amount": row[5],
-                "balance": row[6],
-                "reference_number": row[7],
-                "status": row[8],
-                "created_at": row[9]
-            })
-        
-        return data
-    
-    except sqlite3.Error as e:
-        logger.error(f"Database error in get_transaction_data: {e}")
-        return []
-    except Exception as e:
-        logger.error(f"Unexpected error in get_transaction_data: {e}")
-        return []
+        return await password_hasher.verify(password, hashed, limited=limited)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many sign-ins, try again shortly", headers={"Retry-After": "1"})
+
+async def hash_password(password: str) -> str:
+    """Hash a password in the hashing pool, answering 503 when the pool is saturated."""
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many sign-ins, try again shortly", headers={"Retry-After": "1"})
 
 # Authentication functions
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
     """
     Verify and decode a JWT authentication token.
     
+    Verified claims are cached (until the token expires, at most TOKEN_CACHE_TTL_SECONDS),
+    so only the first request with a token pays for signature verification.
+    
     Args:
         credentials: HTTP Bearer token credentials from the request header
         
@@ -425,6 +684,10 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security))
     Raises:
         HTTPException: If token is invalid, expired, or malformed
     """
+    cached = token_cache.get(credentials.credentials)
+    if cached is not None:
+        return cached
+    
     try:
         logger.debug(f"Verifying token: {credentials.credentials[:20]}...")
         payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=["HS256"])
@@ -436,7 +699,9 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security))
             raise HTTPException(status_code=401, detail="Invalid token - missing user ID")
             
         logger.debug(f"Token verified for user: {username} (ID: {user_id})")
-        return {"id": user_id, "username": username}
+        claims = {"id": user_id, "username": username}
+        token_cache.put(credentials.credentials, claims, exp=payload.get("exp"))
+        return claims
         
     except JWTError as e:
         logger.warning(f"JWT error: {e}")
@@ -484,19 +749,41 @@ manager = ConnectionManager()
 
 # API Routes
 @app.post("/api/login")
-async def login(user: UserLogin):
+async def login(user: UserLogin, request: Request):
     """
     Authenticate a user and return a JWT token.
     
+    The bcrypt check runs in the password hashing pool, off the event loop. After too many
+    failed attempts for a username from one client address, attempts for it from there are
+    rejected without checking the password until the window passes; failures from elsewhere
+    cannot lock the real user out. A client address with too many failures overall still has
+    its passwords checked, but only on a small share of the pool, so a correct password is
+    never refused because of other users' failures behind the same address.
+    
     Args:
         user: UserLogin model containing username and password
+        request: Incoming request (for the client address)
         
     Returns:
         Dict containing JWT token and user information
         
     Raises:
-        HTTPException: If credentials are invalid (401)
+        HTTPException: If credentials are invalid (401), attempts are throttled (429)
+            or the hashing pool (or a throttled client's share of it) is saturated (503)
     """
+    # The client address comes from X-Forwarded-For when the proxy is trusted (FORWARDED_ALLOW_IPS)
+    client_key = request.client.host if request.client else "unknown"
+    # Keyed exactly as the lookup below matches the username
+    user_key = f"{client_key}:{user.username}"
+    retry_after = login_throttle.retry_after(user_key)
+    if retry_after:
+        metrics.increment("auth.login_throttled")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
     
@@ -504,8 +791,14 @@ async def login(user: UserLogin):
     db_user = cursor.fetchone()
     conn.close()
     
-    if not db_user or not bcrypt.checkpw(user.password.encode('utf-8'), db_user[2].encode('utf-8')):
+    limited = client_login_throttle.retry_after(client_key) > 0
+    if limited:
+        metrics.increment("auth.login_limited")
+    if not db_user or not await check_password(user.password, db_user[2], limited=limited):
+        login_throttle.record_failure(user_key)
+        client_login_throttle.record_failure(client_key)
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    login_throttle.reset(user_key)
     
     token = jwt.encode(
         {"id": db_user[0], "username": db_user[1], "exp": datetime.utcnow() + timedelta(days=1)},
@@ -530,7 +823,7 @@ async def register(user: UserRegister):
         Dict containing JWT token and user information for the newly created user
         
     Raises:
-        HTTPException: If username or email already exists (400)
+        HTTPException: If username or email already exists (400) or the hashing pool is saturated (503)
     """
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
@@ -541,13 +834,21 @@ async def register(user: UserRegister):
     if cursor.fetchone():
         conn.close()
         raise HTTPException(status_code=400, detail="Username or email already exists")
+    conn.close()
     
-    # Hash password and create user
-    hashed_password = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt())
-    cursor.execute(
-        "INSERT INTO users (username, password, email) VALUES (?, ?, ?)",
-        (user.username, hashed_password.decode('utf-8'), user.email)
-    )
+    # Hash password (in the hashing pool, without holding the connection) and create user
+    hashed_password = await hash_password(user.password)
+    conn = sqlite3.connect(DATABASE_PATH)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT INTO users (username, password, email) VALUES (?, ?, ?)",
+            (user.username, hashed_password, user.email)
+        )
+    except sqlite3.IntegrityError:
+        # Registered concurrently while the password was being hashed
+        conn.close()
+        raise HTTPException(status_code=400, detail="Username or email already exists")
     
     user_id = cursor.lastrowid
     conn.commit()
@@ -565,11 +866,24 @@ async def register(user: UserRegister):
     }
 
 @app.get("/api/data")
-async def get_data(current_user: Dict[str, Any] = Depends(verify_token)):
+async def get_data(
+    response: Response,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: Dict[str, Any] = Depends(verify_token),
+):
     """
-    Retrieve all transaction data for authenticated users.
+    Retrieve transaction data for authenticated users.
+    
+    Recent months are read from SQLite and closed months from the Parquet archive;
+    archive partitions outside the requested date range are never opened.
+    
+    The `X-Change-Seq` response header is the change sequence the data is at least as new as;
+    clients pass it to /api/data/changes to sync deltas instead of refetching.
     
     Args:
+        start_date: Optional inclusive lower bound on transaction_date (YYYY-MM-DD)
+        end_date: Optional inclusive upper bound on transaction_date (YYYY-MM-DD)
         current_user: Authenticated user information from JWT token
         
     Returns:
@@ -579,31 +893,29 @@ async def get_data(current_user: Dict[str, Any] = Depends(verify_token)):
         HTTPException: If database error occurs (500)
     """
     try:
-        logger.info(f"Data request from user: {current_user.get('username', 'unknown')}")
+        started = time.perf_counter()
+        logger.debug(f"Data request from user: {current_user.get('username', 'unknown')}")
         
+        # Read before the rows: changes racing this request are replayed by the next delta (deltas are idempotent)
         conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        try:
+            response.headers["X-Change-Seq"] = str(current_seq(conn))
+        finally:
+            conn.close()
         
-        cursor.execute("SELECT * FROM transactions ORDER BY transaction_date DESC")
-        rows = cursor.fetchall()
-        conn.close()
+        data = [
+            present_transaction(row)
+            for row in read_transactions(DATABASE_PATH, ARCHIVE_DIR, start_date=start_date, end_date=end_date)
+        ]
         
-        logger.info(f"Successfully retrieved {len(rows)} transactions")
-        
-        data = []
-        for row in rows:
-            data.append({
-                "id": row[0],
-                "transaction_date": row[1],
-                "description": row[2],
-                "category": row[3],
-                "transaction_type": row[4],
-                "amount": row[5],
-                "balance": row[6],
-                "reference_number": row[7],
-                "status": row[8],
-                "created_at": row[9]
-            })
+        logger.info(
+            f"Successfully retrieved {len(data)} transactions",
+            extra={
+                "rows": len(data),
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                "sample_rate": LOG_SAMPLE_RATE,
+            },
+        )
         
         return data
     
@@ -614,38 +926,597 @@ async def get_data(current_user: Dict[str, Any] = Depends(verify_token)):
         logger.error(f"Unexpected error in get_data: {e}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
-@app.get("/api/chat/history")
-async def get_chat_history(current_user: Dict[str, Any] = Depends(verify_token)):
+@app.get("/api/data/changes")
+async def get_data_changes(
+    since: int = Query(..., ge=0),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: Dict[str, Any] = Depends(verify_token),
+):
     """
-    Retrieve chat message history for the authenticated user.
+    Transactions changed since a change sequence number, for applying to a local copy.
+    
+    Upserts are current rows (balances included, so back-dated writes also refresh the
+    affected later months); deletes are ids to drop. Pass the returned `seq` as the next
+    `since`. When the client is further behind than the compacted log, or the delta would be
+    larger than a refetch, `resync` is true and the client should reload /api/data.
     
     Args:
+        since: Last applied sequence (the `X-Change-Seq` header of /api/data, or a previous `seq`)
+        start_date: Inclusive lower bound of the client's copy (as passed to /api/data)
+        end_date: Inclusive upper bound of the client's copy
         current_user: Authenticated user information from JWT token
         
     Returns:
-        List of chat message dictionaries ordered by creation time (oldest first)
+        Dict with since, seq, resync, upserts and deletes
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    try:
+        delta = await asyncio.to_thread(read_changes, DATABASE_PATH, since, start_date, end_date)
+    except sqlite3.Error as e:
+        logger.error(f"Database error in get_data_changes: {e}")
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    
+    metrics.increment("changes.requests", resync=delta["resync"])
+    metrics.observe("changes.rows", len(delta["upserts"]) + len(delta["deletes"]))
+    return delta
+
+@app.get("/api/data/changes/stream")
+async def stream_data_changes(
+    request: Request,
+    since: int = Query(..., ge=0),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: Dict[str, Any] = Depends(verify_token),
+):
+    """
+    Push channel for /api/data/changes as server-sent events.
+    
+    Each event carries a delta in the same shape; a comment line is sent as a keep-alive
+    when nothing changed. The stream ends after a `resync` event, since the client has to
+    reload /api/data and reconnect with the new `X-Change-Seq`.
+    
+    Args:
+        request: Used to stop when the client disconnects
+        since: Last applied sequence
+        start_date: Inclusive lower bound of the client's copy
+        end_date: Inclusive upper bound of the client's copy
+        current_user: Authenticated user information from JWT token
+    """
+    async def generate_stream():
+        cursor = since
+        while not await request.is_disconnected():
+            waiter = change_feed.waiter()
+            try:
+                delta = await asyncio.to_thread(read_changes, DATABASE_PATH, cursor, start_date, end_date)
+            except sqlite3.Error as e:
+                logger.error(f"Database error in change stream: {e}")
+                delta = {"since": cursor, "seq": cursor, "resync": True, "upserts": [], "deletes": []}
+            
+            if delta["resync"] or delta["seq"] != cursor:
+                yield f"data: {json.dumps(delta)}\n\n"
+                if delta["resync"]:
+                    return
+                cursor = delta["seq"]
+            else:
+                yield ": keep-alive\n\n"
+            await change_feed.wait(waiter, CHANGES_PUSH_POLL_SECONDS)
     
-    cursor.execute(
-        "SELECT * FROM chat_messages WHERE user_id = ? ORDER BY created_at ASC",
-        (current_user["id"],)
+    return StreamingResponse(
+        generate_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Access-Control-Allow-Origin": "*",
+        }
     )
-    rows = cursor.fetchall()
-    conn.close()
+
+def export_response(path: str, fmt: str, filename: str) -> FileResponse:
+    """Serve a spooled export; FileResponse answers Range/If-Range requests so large downloads can resume."""
+    media_type, extension = EXPORT_FORMATS[fmt]
+    return FileResponse(path, media_type=media_type, filename=f"{filename}.{extension}")
+
+def check_export_format(fmt: str):
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+
+@app.get("/api/export/transactions")
+async def export_transactions(
+    format: str = "csv",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    categories: Optional[List[str]] = Query(None),
+    current_user: Dict[str, Any] = Depends(verify_token),
+):
+    """
+    Download transactions as CSV, XLSX or Parquet, oldest first.
+    
+    Rows are streamed from the Parquet archive and SQLite in fixed-size batches and written
+    incrementally (Parquet row groups, write-only XLSX sheets), so memory does not grow with the
+    export size. The file is spooled once per filter set and ledger version and then served
+    from disk, so repeated downloads are instant and interrupted ones resume with Range requests.
+    
+    Args:
+        format: csv, xlsx or parquet
+        start_date: Optional inclusive lower bound on transaction_date (YYYY-MM-DD)
+        end_date: Optional inclusive upper bound on transaction_date (YYYY-MM-DD)
+        categories: Only export these categories (repeat the parameter for several)
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        The export file (amounts and balances in dollars with exact decimals)
+        
+    Raises:
+        HTTPException: If the format is unknown (400) or the export fails (500)
+    """
+    check_export_format(format)
+    
+    try:
+        conn = sqlite3.connect(DATABASE_PATH)
+        version = ledger_version(conn)
+        conn.close()
+        
+        key = {
+            "kind": "transactions",
+            "start_date": start_date,
+            "end_date": end_date,
+            "categories": sorted(categories) if categories else None,
+            "ledger_version": version,
+        }
+        path = await asyncio.to_thread(
+            spool_export,
+            EXPORT_DIR,
+            key,
+            format,
+            EXPORT_SCHEMA,
+            lambda: iter_transaction_batches(DATABASE_PATH, ARCHIVE_DIR, start_date, end_date, categories),
+        )
+    except sqlite3.Error as e:
+        logger.error(f"Database error in export_transactions: {e}")
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    except Exception as e:
+        logger.error(f"Unexpected error in export_transactions: {e}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred")
+    
+    return export_response(path, format, f"transactions_{start_date or 'start'}_{end_date or 'end'}")
+
+async def export_result(key: Dict[str, Any], result: Dict[str, Any], fmt: str, filename: str) -> FileResponse:
+    """Spool a saved analysis result (artifact or report) and serve it."""
+    table = result_table(result)
+    path = await asyncio.to_thread(
+        spool_export, EXPORT_DIR, key, fmt, table.schema, lambda: table.to_batches(max_chunksize=EXPORT_BATCH_ROWS)
+    )
+    return export_response(path, fmt, filename)
+
+def ensure_open_month(transaction_date: str):
+    """
+    Reject writes that land in a month already moved to the Parquet archive.
+    
+    Args:
+        transaction_date: Transaction date (YYYY-MM-DD) being written
+        
+    Raises:
+        HTTPException: If the date is malformed or falls in an archived month (400)
+    """
+    try:
+        datetime.strptime(transaction_date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="transaction_date must be YYYY-MM-DD")
+    
+    if ARCHIVE_HOT_MONTHS > 0 and transaction_date < archive_cutoff(ARCHIVE_HOT_MONTHS):
+        raise HTTPException(status_code=400, detail="Cannot modify transactions in an archived month")
+
+@app.post("/api/transactions")
+async def create_transaction(transaction: TransactionCreate, current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    Add a transaction, including back-dated ones, keeping running balances consistent.
+    
+    Only the balances of the transaction's own month are rewritten; later months are
+    corrected through their balance checkpoints.
+    
+    Args:
+        transaction: TransactionCreate model with the new transaction's fields
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        Dict containing the new transaction ID
+    """
+    ensure_open_month(transaction.transaction_date)
+    
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        values = transaction.model_dump()
+        values["amount_cents"] = to_cents(values.pop("amount"))
+        values["counterparty_id"] = counterparty_id_for(conn.cursor(), values["description"])
+        transaction_id = insert_transaction(conn, values)
+        conn.commit()
+    finally:
+        conn.close()
+    
+    report_scheduler.notify_ledger_changed()
+    change_feed.notify()
+    logger.info(f"Transaction {transaction_id} created by user: {current_user.get('username', 'unknown')}")
+    return {"id": transaction_id}
+
+@app.put("/api/transactions/{transaction_id}")
+async def edit_transaction(
+    transaction_id: int,
+    changes: TransactionUpdate,
+    current_user: Dict[str, Any] = Depends(verify_token),
+):
+    """
+    Correct an existing transaction and update the affected balances.
+    
+    Args:
+        transaction_id: ID of the transaction to edit
+        changes: TransactionUpdate model; only the fields provided are changed
+        current_user: Authenticated user information from JWT token
+        
+    Raises:
+        HTTPException: If the transaction does not exist (404) or is archived (400)
+    """
+    updates = changes.model_dump(exclude_none=True)
+    if "amount" in updates:
+        updates["amount_cents"] = to_cents(updates.pop("amount"))
+    
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT transaction_date FROM transactions WHERE id = ?", (transaction_id,))
+        row = cursor.fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Transaction not found")
+        
+        ensure_open_month(row[0])
+        if "transaction_date" in updates:
+            ensure_open_month(updates["transaction_date"])
+        if "description" in updates:
+            updates["counterparty_id"] = counterparty_id_for(cursor, updates["description"])
+        
+        update_transaction(conn, transaction_id, updates)
+        conn.commit()
+    finally:
+        conn.close()
+    
+    report_scheduler.notify_ledger_changed()
+    change_feed.notify()
+    logger.info(f"Transaction {transaction_id} updated by user: {current_user.get('username', 'unknown')}")
+    return {"id": transaction_id}
+
+@app.delete("/api/transactions/{transaction_id}")
+async def remove_transaction(transaction_id: int, current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    Delete a transaction and update the affected balances.
+    
+    Args:
+        transaction_id: ID of the transaction to delete
+        current_user: Authenticated user information from JWT token
+        
+    Raises:
+        HTTPException: If the transaction does not exist (404)
+    """
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        delete_transaction(conn, transaction_id)
+        conn.commit()
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    finally:
+        conn.close()
     
-    messages = []
-    for row in rows:
-        messages.append({
-            "id": row[0],
-            "user_id": row[1],
-            "message": row[2],
-            "response": row[3],
-            "created_at": row[4]
-        })
+    report_scheduler.notify_ledger_changed()
+    change_feed.notify()
+    logger.info(f"Transaction {transaction_id} deleted by user: {current_user.get('username', 'unknown')}")
+    return {"id": transaction_id}
+
+@app.get("/api/balance")
+async def get_balance(as_of: Optional[str] = None, current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    Return the account balance at the end of a given date.
     
-    return messages
+    Args:
+        as_of: Date (YYYY-MM-DD); defaults to today
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        Dict containing the date and the balance at the end of that day
+    """
+    as_of = as_of or datetime.now().strftime("%Y-%m-%d")
+    try:
+        datetime.strptime(as_of, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="as_of must be YYYY-MM-DD")
+    
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        balance_cents = balance_as_of(conn, as_of)
+    finally:
+        conn.close()
+    
+    # Rows of an archived month live in Parquet, so add the archived part of that month
+    balance_cents += sum(archived_amount_totals(ARCHIVE_DIR, start_date=f"{as_of[:7]}-01", end_date=as_of).values())
+    
+    return {"as_of": as_of, "balance": from_cents(balance_cents)}
+
+@app.get("/api/counterparties")
+async def get_counterparties(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    transaction_type: Optional[str] = None,
+    limit: Optional[int] = None,
+    current_user: Dict[str, Any] = Depends(verify_token),
+):
+    """
+    Per-counterparty totals (suppliers and customers) across live and archived transactions.
+    
+    Args:
+        start_date: Optional inclusive lower bound on transaction_date (YYYY-MM-DD)
+        end_date: Optional inclusive upper bound on transaction_date (YYYY-MM-DD)
+        transaction_type: Optional 'Credit' (customers) or 'Debit' (suppliers) filter
+        limit: Optional number of top counterparties to return
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        List of counterparty rollups ordered by absolute total, largest first
+    """
+    try:
+        rollup = counterparty_rollup(
+            DATABASE_PATH, ARCHIVE_DIR,
+            start_date=start_date, end_date=end_date, transaction_type=transaction_type, limit=limit,
+        )
+        # Convert the exact cents totals to dollars at the API edge
+        for entry in rollup:
+            for key in ("total", "credit", "debit"):
+                entry[key] = from_cents(entry.pop(f"{key}_cents"))
+        
+        return rollup
+    
+    except sqlite3.Error as e:
+        logger.error(f"Database error in get_counterparties: {e}")
+        raise HTTPException(status_code=500, detail="Database error occurred")
+
+@app.get("/api/reports")
+async def get_reports(name: Optional[str] = None, current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    Return the latest precomputed standard reports.
+    
+    Reports are computed in the background from the shared ledger after data changes and
+    during off-peak hours, so they are served instantly. A report is `stale` when the ledger
+    changed after it was computed (a refresh is then already scheduled).
+    
+    Args:
+        name: Only return this report (monthly_pnl, top_categories or cash_flow_trend)
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        List of reports with name, ledger_version, generated_at, duration_ms, stale and payload
+        (columns, rows and summary; money in cents)
+        
+    Raises:
+        HTTPException: If the report name is unknown (404)
+    """
+    if name and name not in STANDARD_REPORTS:
+        raise HTTPException(status_code=404, detail="Unknown report")
+    return latest_reports(DATABASE_PATH, name)
+
+@app.get("/api/insights")
+async def get_insights(
+    dimension: Optional[str] = None,
+    limit: int = 10,
+    days: int = 90,
+    current_user: Dict[str, Any] = Depends(verify_token)
+):
+    """
+    Return the insight engine's precomputed findings without rescanning the ledger.
+    
+    Statistics per category and counterparty are updated as transactions are written:
+    outliers and trend shifts are flagged on write, seasonal deviations compare last month
+    with its baseline.
+    
+    Args:
+        dimension: Only "category" or "counterparty" findings (default: both)
+        limit: Maximum entries per section
+        days: Window for recent outliers and shifts
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        Dict with outliers, shifts, seasonal, trends and baselines (money in cents)
+        
+    Raises:
+        HTTPException: If the dimension is unknown (400) or on database errors (500)
+    """
+    if dimension and dimension not in DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"dimension must be one of {', '.join(DIMENSIONS)}")
+    
+    try:
+        return insight_summary(DATABASE_PATH, dimension=dimension, limit=max(1, min(limit, 100)), days=days)
+    except sqlite3.Error as e:
+        logger.error(f"Database error in get_insights: {e}")
+        raise HTTPException(status_code=500, detail="Database error occurred")
+
+@app.post("/api/reports/{name}/refresh")
+async def refresh_report(name: str, current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    Recompute a report now (still within the scheduler's concurrency limit) and return it.
+    
+    Args:
+        name: Report name
+        current_user: Authenticated user information from JWT token
+        
+    Raises:
+        HTTPException: If the report name is unknown (404)
+    """
+    if name not in STANDARD_REPORTS:
+        raise HTTPException(status_code=404, detail="Unknown report")
+    await report_scheduler.run_now(name)
+    return latest_reports(DATABASE_PATH, name)
+
+@app.get("/api/export/reports/{name}")
+async def export_report(name: str, format: str = "csv", current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    Download the latest computed standard report as CSV, XLSX or Parquet.
+    
+    Args:
+        name: Report name
+        format: csv, xlsx or parquet
+        current_user: Authenticated user information from JWT token
+        
+    Raises:
+        HTTPException: If the format is unknown (400) or the report has not been computed yet (404)
+    """
+    check_export_format(format)
+    if name not in STANDARD_REPORTS:
+        raise HTTPException(status_code=404, detail="Unknown report")
+    reports = latest_reports(DATABASE_PATH, name)
+    if not reports:
+        raise HTTPException(status_code=404, detail="Report has not been computed yet")
+    
+    report = reports[0]
+    key = {"kind": "report", "name": name, "generated_at": report["generated_at"]}
+    return await export_result(key, report["payload"], format, f"{name}_{report['generated_at'][:10]}")
+
+@app.get("/api/admin/slow-analyses")
+async def get_slow_analyses(
+    limit: int = 20,
+    days: Optional[int] = None,
+    current_user: Dict[str, Any] = Depends(verify_token)
+):
+    """
+    List the slowest analysis executions logged by the opt-in profiler (admin only).
+    
+    Each entry has the generated code, the user and prompt it ran for, the ledger version it ran
+    against, wall/CPU time and, for sampled executions, peak memory and a top-N cProfile summary.
+    
+    Args:
+        limit: Maximum number of executions (1-200)
+        days: Only include executions from the last `days` days
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        List of slow analyses, slowest first
+        
+    Raises:
+        HTTPException: If the user is not the admin (403) or on database errors (500)
+    """
+    if current_user.get("username") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        return slowest_analyses(DATABASE_PATH, limit=max(1, min(limit, 200)), days=days)
+    except sqlite3.Error as e:
+        logger.error(f"Database error in get_slow_analyses: {e}")
+        raise HTTPException(status_code=500, detail="Database error occurred")
+
+@app.get("/api/chat/history")
+async def get_chat_history(
+    before: Optional[int] = None,
+    limit: int = CHAT_PAGE_SIZE,
+    current_user: Dict[str, Any] = Depends(verify_token)
+):
+    """
+    Retrieve one page of chat history for the authenticated user, newest first.
+    
+    Only previews are returned; fetch a full response and its artifacts with
+    `/api/chat/messages/{id}` when the entry is `truncated` or `has_artifacts`.
+    
+    Args:
+        before: Cursor from the previous page's `next_before` (omit for the newest page)
+        limit: Messages per page (1-100)
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        Dict with `messages` (id, message, preview, created_at, has_artifacts, truncated)
+        and `next_before` (None when there are no older messages)
+    """
+    limit = max(1, min(limit, CHAT_MAX_PAGE_SIZE))
+    return chat_history_page(DATABASE_PATH, current_user["id"], before=before, limit=limit)
+
+@app.get("/api/chat/messages/{message_id}")
+async def get_chat_message_detail(message_id: int, current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    Return one of the user's chat messages with its full response and artifacts.
+    
+    Args:
+        message_id: chat_messages.id
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        Dict with id, user_id, message, response, created_at and artifacts
+        
+    Raises:
+        HTTPException: If the message does not exist or belongs to another user (404)
+    """
+    message = get_chat_message(DATABASE_PATH, message_id)
+    if not message or message["user_id"] != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return message
+
+@app.post("/api/knowledge/documents")
+async def add_knowledge_document(document: KnowledgeDocument, current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    Add a business document (plain text or markdown) for the AI agent to search.
+    
+    The document is split into passages, embedded and added to the vector index right away.
+    
+    Args:
+        document: KnowledgeDocument model with the title and content
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        Dict with the document id, title and number of indexed passages
+        
+    Raises:
+        HTTPException: If the title or content is empty (400)
+    """
+    if not document.title.strip() or not document.content.strip():
+        raise HTTPException(status_code=400, detail="Title and content are required")
+    
+    added = await asyncio.to_thread(knowledge_store.add_document, current_user["id"], document.title.strip(), document.content)
+    logger.info(f"Knowledge document {added['id']} added by user: {current_user.get('username', 'unknown')}")
+    return added
+
+@app.get("/api/knowledge/documents")
+async def list_knowledge_documents(current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    List the user's business documents, newest first.
+    
+    Returns:
+        List of dicts with id, title, created_at and chunks
+    """
+    return knowledge_store.list_documents(current_user["id"])
+
+@app.delete("/api/knowledge/documents/{document_id}")
+async def delete_knowledge_document(document_id: int, current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    Delete one of the user's business documents and remove its passages from the index.
+    
+    Raises:
+        HTTPException: If the document does not exist or belongs to another user (404)
+    """
+    if not await asyncio.to_thread(knowledge_store.delete_document, current_user["id"], document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"id": document_id}
+
+@app.get("/api/knowledge/search")
+async def search_knowledge_passages(
+    q: str,
+    source: Optional[str] = None,
+    limit: int = 5,
+    current_user: Dict[str, Any] = Depends(verify_token),
+):
+    """
+    Search the user's earlier answers and documents, as the agent's `search_knowledge` tool does.
+    
+    Args:
+        q: Search text
+        source: Optional "chat" or "document"
+        limit: Maximum passages (1-20)
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        List of passages with source, source_id, title, text, created_at and score, best first
+    """
+    return await asyncio.to_thread(knowledge_store.search, current_user["id"], q, max(1, min(limit, 20)), source)
 
 @app.post("/api/chat/stream")
 async def chat_stream(chat_message: ChatMessage, current_user: Dict[str, Any] = Depends(verify_token)):
@@ -669,6 +1540,7 @@ async def chat_stream(chat_message: ChatMessage, current_user: Dict[str, Any] =
             
     Response Format:
         - Each chunk: {"chunk": "text", "done": false}
+        - Each artifact: {"artifact": {"id", "kind", "title", ...}, "done": false}
         - Completion: {"done": true, "message_id": int, "created_at": "ISO timestamp"}
         - Error: {"error": true, "message": "error description"}
         
@@ -678,6 +1550,9 @@ async def chat_stream(chat_message: ChatMessage, current_user: Dict[str, Any] =
     """
     async def generate_stream():
         response_parts = []
+        started = time.perf_counter()
+        first_chunk_ms = None
+        state_context = None
         
         try:
             # Check if AI agent is properly initialized
@@ -686,14 +1561,12 @@ async def chat_stream(chat_message: ChatMessage, current_user: Dict[str, Any] =
                 yield f"data: {json.dumps({'error': True, 'message': 'AI service is not available. Please check server configuration.'})}\n\n"
                 return
             
-            # Get transaction data from database
-            transaction_data = get_transaction_data()
-            logger.info(f"Loaded {len(transaction_data)} transactions for StateContext")
-            
-            # Create state context with transaction data
+            # Create state context with a lazy transaction handle; rows are only read if a tool needs them
             state_context = StateContext(
                 prompt=chat_message.message,
-                transaction_data=transaction_data
+                user_id=current_user["id"],
+                username=current_user.get("username", ""),
+                transactions=TransactionSource(DATABASE_PATH, ARCHIVE_DIR),
             )
             
             # Get streamed result from BanksieAgent
@@ -705,40 +1578,87 @@ async def chat_stream(chat_message: ChatMessage, current_user: Dict[str, Any] =
                 raise Exception("Failed to get response from AI agent")
             
             # Stream the response using the correct pattern
-            async for event in result.stream_events():
-                if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
-                    # Check if event.data has delta attribute (for text streaming)
-                    try:
-                        delta = getattr(event.data, 'delta', None)
-                        if delta:
-                            chunk = delta
-                            if chunk:  # Only send non-empty chunks
-                                response_parts.append(chunk)
-                                # Send each chunk as JSON
-                                yield f"data: {json.dumps({'chunk': chunk, 'done': False})}\n\n"
-                    except AttributeError:
-                        # Handle cases where event.data doesn't have delta
-                        continue
+            artifacts_sent = 0
+            cut_short = False
+            try:
+                async for event in events_until_deadline(result, state_context):
+                    # Artifacts registered by a tool call go straight to the client, not through the model
+                    while artifacts_sent < len(state_context.artifacts):
+                        yield f"data: {json.dumps({'artifact': state_context.artifacts[artifacts_sent], 'done': False})}\n\n"
+                        artifacts_sent += 1
+                
+                    if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                        # Check if event.data has delta attribute (for text streaming)
+                        try:
+                            delta = getattr(event.data, 'delta', None)
+                            if delta:
+                                chunk = delta
+                                if chunk:  # Only send non-empty chunks
+                                    if first_chunk_ms is None:
+                                        first_chunk_ms = round((time.perf_counter() - started) * 1000, 2)
+                                    response_parts.append(chunk)
+                                    # Send each chunk as JSON
+                                    yield f"data: {json.dumps({'chunk': chunk, 'done': False})}\n\n"
+                        except AttributeError:
+                            # Handle cases where event.data doesn't have delta
+                            continue
+            except MaxTurnsExceeded:
+                logger.warning(f"Run exceeded its turn limit after {state_context.step} tool calls")
+                cut_short = True
+            
+            # Degrade gracefully: keep what was streamed and say the answer may be incomplete
+            if cut_short or state_context.budget_exhausted == "stream_deadline":
+                response_parts.append(INCOMPLETE_ANSWER_NOTE)
+                yield f"data: {json.dumps({'chunk': INCOMPLETE_ANSWER_NOTE, 'done': False})}\n\n"
             
             # Get complete response for database storage
             complete_response = ''.join(response_parts)
+            logger.info(
+                f"Chat turn loaded {state_context.transactions.rows_loaded} transactions",
+                extra={
+                    "user_id": current_user["id"],
+                    "rows_loaded": state_context.transactions.rows_loaded,
+                    "first_chunk_ms": first_chunk_ms,
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "response_chars": len(complete_response),
+                    "tier": state_context.model_tier,
+                    "escalated": state_context.escalated,
+                },
+            )
+            record_run(
+                state_context.model_tier,
+                latency_ms=(time.perf_counter() - started) * 1000,
+                usage=result.context_wrapper.usage,
+                escalated=state_context.escalated,
+            )
             
             # Save to database
             conn = sqlite3.connect(DATABASE_PATH)
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO chat_messages (user_id, message, response) VALUES (?, ?, ?)",
-                (current_user["id"], chat_message.message, complete_response)
+            message_id = save_chat_message(
+                conn, current_user["id"], chat_message.message, complete_response, state_context.artifacts
             )
-            message_id = cursor.lastrowid
             conn.commit()
             conn.close()
             
+            # Make the answer retrievable by later questions
+            try:
+                await asyncio.to_thread(
+                    knowledge_store.index_chat_message, message_id, current_user["id"], chat_message.message, complete_response
+                )
+            except Exception as e:
+                logger.error(f"Failed to index chat message {message_id}: {e}")
+            
+            if state_context.trace:
+                status = "incomplete" if cut_short or state_context.budget_exhausted else "ok"
+                trace_writer.submit(state_context.trace.finish(message_id, status=status, first_token_ms=first_chunk_ms))
+            
             # Send final completion message
             yield f"data: {json.dumps({'done': True, 'message_id': message_id, 'created_at': datetime.now().isoformat()})}\n\n"
             
         except Exception as e:
             logger.error(f"Error in chat stream: {e}")
+            if state_context is not None and state_context.trace:
+                trace_writer.submit(state_context.trace.finish(status="error", first_token_ms=first_chunk_ms))
             # Send error message if something goes wrong
             yield f"data: {json.dumps({'error': True, 'message': 'An error occurred while processing your request'})}\n\n"
     
@@ -770,6 +1690,115 @@ async def health_check():
     
     return response
 
+@app.get("/api/metrics")
+async def get_metrics(current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    Report in-process metrics such as per-tier model latency, token usage, cost and escalations.
+    
+    Args:
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        Dict with counters and observation summaries (count, mean, p50, p95, max)
+    """
+    return metrics.snapshot()
+
+@app.get("/api/traces/stats")
+async def get_trace_stats(
+    group_by: str = "model",
+    kind: str = "model",
+    days: Optional[int] = None,
+    current_user: Dict[str, Any] = Depends(verify_token)
+):
+    """
+    Latency and cost percentiles from the persisted agent trace spans (admin only).
+    
+    Args:
+        group_by: "model" (tool name for tool spans), "tier", "prompt_type" or "user"
+        kind: "run" (whole chat turns), "model" (single model calls) or "tool" (tool executions)
+        days: Only include spans from the last `days` days
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        One entry per group with count, latency_ms / first_token_ms / cost_usd percentiles
+        (p50, p95, p99), total cost and total tokens
+        
+    Raises:
+        HTTPException: If the user is not the admin (403), on unknown group_by/kind (400)
+                      or database errors (500)
+    """
+    if current_user.get("username") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if group_by not in GROUP_COLUMNS or kind not in SPAN_KINDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"group_by must be one of {', '.join(GROUP_COLUMNS)}; kind one of {', '.join(SPAN_KINDS)}"
+        )
+    
+    try:
+        return span_stats(DATABASE_PATH, group_by=group_by, kind=kind, days=days)
+    except sqlite3.Error as e:
+        logger.error(f"Database error in get_trace_stats: {e}")
+        raise HTTPException(status_code=500, detail="Database error occurred")
+
+@app.get("/api/chat/messages/{message_id}/trace")
+async def get_message_trace(message_id: int, current_user: Dict[str, Any] = Depends(verify_token)):
+    """
+    Return the trace spans (run, model calls, tool executions) recorded for one of the user's chat messages.
+    
+    Args:
+        message_id: chat_messages.id
+        current_user: Authenticated user information from JWT token
+        
+    Returns:
+        List of spans in start order; recent spans may take a few seconds to be written
+        
+    Raises:
+        HTTPException: If the message does not exist or belongs to another user (404)
+    """
+    conn = sqlite3.connect(DATABASE_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT user_id FROM chat_messages WHERE id = ?", (message_id,))
+    row = cursor.fetchone()
+    conn.close()
+    
+    if not row or row[0] != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Message not found")
+    
+    return message_spans(DATABASE_PATH, message_id)
+
+@app.get("/api/export/artifacts/{message_id}/{artifact_id}")
+async def export_artifact(
+    message_id: int,
+    artifact_id: str,
+    format: str = "csv",
+    current_user: Dict[str, Any] = Depends(verify_token)
+):
+    """
+    Download a table or series an analysis showed in one of the user's chat messages.
+    
+    Args:
+        message_id: chat_messages.id
+        artifact_id: Artifact reference, e.g. "a1"
+        format: csv, xlsx or parquet
+        current_user: Authenticated user information from JWT token
+        
+    Raises:
+        HTTPException: If the format is unknown (400), or the message or artifact does not exist
+            or belongs to another user (404)
+    """
+    check_export_format(format)
+    
+    message = get_chat_message(DATABASE_PATH, message_id)
+    if not message or message["user_id"] != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Message not found")
+    artifact = next((a for a in message["artifacts"] if a["id"] == artifact_id), None)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    
+    key = {"kind": "artifact", "message_id": message_id, "artifact_id": artifact_id}
+    return await export_result(key, artifact, format, f"message_{message_id}_{artifact_id}")
+
 @app.get("/api/test")
 async def test_endpoint():
     """Simple test endpoint to verify API connectivity"""
@@ -777,4 +1806,4 @@ async def test_endpoint():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, proxy_headers=True, forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")) 
\ No newline at end of file
@@ -72,7 +72,10 @@ def start_debug_server():
             reload_dirs=["/app"] if debug else None,
             log_level="debug" if debug else "info",
             access_log=debug,
-            use_colors=True
+            use_colors=True,
+            # Trust X-Forwarded-For from these proxies for the client address (e.g. the React dev server)
+            proxy_headers=True,
+            forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
         )
         
     except Exception as e:
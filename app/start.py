@@ -14,6 +14,8 @@ if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", 8000))
     debug = os.getenv("DEBUG", "False").lower() == "true"
+    # Proxies whose X-Forwarded-For is trusted for the client address (e.g. the React dev server)
+    forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
     
     print(f"🚀 Starting AI Chatbot Python Backend")
     print(f"📍 Server: http://{host}:{port}")
@@ -26,5 +28,7 @@ if __name__ == "__main__":
         host=host,
         port=port,
         reload=debug,
-        log_level="info" if not debug else "debug"
+        log_level="info" if not debug else "debug",
+        proxy_headers=True,
+        forwarded_allow_ips=forwarded_allow_ips,
     ) 
\ No newline at end of file
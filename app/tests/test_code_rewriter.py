@@ -0,0 +1,161 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ai_agents.banksie.code_rewriter import FRAME_HELPER, FrameCache, rewrite_analysis_code
+
+ROWS = [
+    {"transaction_date": "2025-01-31", "category": "Rent", "amount_cents": -150000, "balance_cents": 1000000},
+    {"transaction_date": "2025-02-03", "category": "Sales", "amount_cents": 42050, "balance_cents": 1042050},
+    {"transaction_date": "2025-02-14", "category": "Fees", "amount_cents": -999, "balance_cents": 1041051},
+]
+
+
+@pytest.mark.parametrize(
+    "code, expected, rules",
+    [
+        (
+            "df['transaction_date'].apply(lambda x: datetime.strptime(x, '%Y-%m-%d'))",
+            "pd.to_datetime(df['transaction_date'].fillna('<missing>').astype(str), format='%Y-%m-%d')",
+            ["date_parse"],
+        ),
+        (
+            "df['transaction_date'].apply(lambda x: datetime.strptime(x, '%Y-%m-%d').month)",
+            "pd.to_datetime(df['transaction_date'].fillna('<missing>').astype(str), format='%Y-%m-%d').dt.month",
+            ["date_parse"],
+        ),
+        (
+            "df['transaction_date'].apply(lambda x: datetime.strptime(x, '%Y-%m-%d').strftime('%Y-%m'))",
+            "pd.to_datetime(df['transaction_date'].fillna('<missing>').astype(str), format='%Y-%m-%d').dt.strftime('%Y-%m')",
+            ["date_parse"],
+        ),
+        (
+            "df['transaction_date'].map(lambda x: pd.to_datetime(x).weekday())",
+            "pd.to_datetime(df['transaction_date']).dt.weekday",
+            ["date_parse"],
+        ),
+        ("df['amount_cents'].apply(lambda x: x * 100)", "df['amount_cents'] * 100", ["vectorize_apply"]),
+        ("df['amount_cents'].apply(lambda x: abs(x) / 100)", "df['amount_cents'].abs() / 100", ["vectorize_apply"]),
+        ("df['category'].map(lambda x: x == 'Rent')", "df['category'] == 'Rent'", ["vectorize_apply"]),
+        (
+            "df.apply(lambda row: row['balance_cents'] - row['amount_cents'], axis=1)",
+            "(df['balance_cents'] - df['amount_cents']).rename(None)",
+            ["vectorize_row_apply"],
+        ),
+        (
+            "a = pd.DataFrame(transaction_data)\nb = pd.DataFrame(transaction_data)",
+            f"a = {FRAME_HELPER}()\nb = {FRAME_HELPER}()",
+            ["frame_cache", "frame_cache"],
+        ),
+        ("for m in months:\n    df = pd.DataFrame(data)", f"for m in months:\n    df = {FRAME_HELPER}()", ["frame_cache"]),
+    ],
+)
+def test_rewrites(code, expected, rules):
+    result = rewrite_analysis_code(code)
+    assert result.code == expected
+    assert result.rewrites == rules
+
+
+def test_imports_of_preloaded_modules():
+    code = "import pandas as pd\nimport numpy\nfrom pandas import DataFrame\nfrom datetime import datetime\nimport os"
+    result = rewrite_analysis_code(code)
+    assert result.code == "numpy = np\nDataFrame = pd.DataFrame\nimport os"
+    assert result.imports_rewritten == 4
+    assert result.hint_kinds == ["import"]
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        # Rebound names: `pd` / `datetime` / `str` may no longer be what the rewrite would call
+        "pd = None\ndf['transaction_date'].apply(lambda x: pd.to_datetime(x))",
+        "datetime = None\ndf['transaction_date'].apply(lambda x: datetime.strptime(x, '%Y-%m-%d'))",
+        "str = None\ndf['transaction_date'].apply(lambda x: datetime.strptime(x, '%Y-%m-%d'))",
+        "def f(pd):\n    return df['amount_cents'].apply(lambda x: pd.to_datetime(x))",
+        # Conditionals, method calls and other names in the lambda
+        "df['amount_cents'].apply(lambda x: 1 if x > 0 else 0)",
+        "df['category'].apply(lambda x: x.upper())",
+        "df['amount_cents'].apply(lambda x: x * rate)",
+        "df.apply(lambda row: row['amount_cents'] if row['category'] == 'Rent' else 0, axis=1)",
+        # Division where Python raises ZeroDivisionError and pandas would not
+        "df['amount_cents'].apply(lambda x: x / 0)",
+        "df['amount_cents'].apply(lambda x: 100 // x)",
+        "df.apply(lambda row: row['amount_cents'] / row['balance_cents'], axis=1)",
+        # Not a single column, or not row-wise
+        "df.apply(lambda col: col * 2)",
+        "df[['a', 'b']].apply(lambda x: x * 2)",
+        "df['amount_cents'].apply(lambda x: x * 2, convert_dtype=False)",
+        # Frame cache: a single build, or rows used in any other way or rebound
+        "df = pd.DataFrame(transaction_data)",
+        "a = pd.DataFrame(transaction_data)\nb = pd.DataFrame(transaction_data)\nprint(len(transaction_data))",
+        "a = pd.DataFrame(data)\nb = pd.DataFrame(data)\nrows = data",
+        "data = data[:10]\na = pd.DataFrame(data)\nb = pd.DataFrame(data)",
+        "a = pd.DataFrame(data, columns=['amount_cents'])\nb = pd.DataFrame(data, columns=['amount_cents'])",
+        f"{FRAME_HELPER} = None\na = pd.DataFrame(data)\nb = pd.DataFrame(data)",
+    ],
+)
+def test_left_unchanged(code):
+    result = rewrite_analysis_code(code)
+    assert result.code == code
+    assert result.rewrites == []
+
+
+def test_unsafe_repeated_frame_gets_a_hint():
+    code = "a = pd.DataFrame(transaction_data)\nb = pd.DataFrame(transaction_data)\nprint(len(transaction_data))"
+    assert rewrite_analysis_code(code).hint_kinds == ["repeated_frame"]
+
+
+def test_syntax_error_is_left_for_execution():
+    result = rewrite_analysis_code("df = (")
+    assert result.code == "df = (" and not result.parsed
+
+
+def _run(code: str) -> dict:
+    namespace = {
+        "pd": pd, "np": np, "datetime": datetime, "date": date, "timedelta": timedelta,
+        "data": ROWS, "transaction_data": ROWS, FRAME_HELPER: FrameCache(ROWS),
+    }
+    exec(code, namespace)
+    return namespace
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "df = pd.DataFrame(data)\nresult = df['transaction_date'].apply(lambda x: datetime.strptime(x, '%Y-%m-%d'))",
+        "df = pd.DataFrame(data)\nresult = df['transaction_date'].apply(lambda x: datetime.strptime(x, '%Y-%m-%d').day)",
+        "df = pd.DataFrame(data)\nresult = df['transaction_date'].map(lambda x: pd.to_datetime(x).strftime('%b %Y'))",
+        "df = pd.DataFrame(data)\nresult = df['amount_cents'].apply(lambda x: -x % 7 + abs(x) // 3 - x / 100)",
+        "df = pd.DataFrame(data)\nresult = df['category'].apply(lambda x: x != 'Fees')",
+        "df = pd.DataFrame(data)\nresult = df.apply(lambda row: row['balance_cents'] - row['amount_cents'], axis=1)",
+        "df = pd.DataFrame(data)\ndf['x'] = 1\nresult = pd.DataFrame(data)\nresult['y'] = 2\nresult = pd.DataFrame(data)",
+    ],
+)
+def test_rewritten_code_gives_the_same_result(code):
+    result = rewrite_analysis_code(code)
+    assert result.rewrites
+    expected, actual = _run(code)["result"], _run(result.code)["result"]
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(actual, expected)
+    else:
+        assert actual.tolist() == expected.tolist()
+        assert actual.name == expected.name
+
+
+def test_missing_date_still_raises():
+    code = "df = pd.DataFrame({'d': ['2025-01-01', None]})\nresult = df['d'].apply(lambda x: datetime.strptime(x, '%Y-%m-%d'))"
+    rewritten = rewrite_analysis_code(code).code
+    assert rewritten != code
+    for source in (code, rewritten):
+        with pytest.raises((TypeError, ValueError)):
+            _run(source)
+
+
+def test_frame_cache_returns_independent_copies():
+    frames = FrameCache(ROWS)
+    first = frames()
+    first["amount_cents"] = 0
+    assert frames()["amount_cents"].tolist() == [row["amount_cents"] for row in ROWS]
+    assert frames.calls == 2
@@ -0,0 +1,126 @@
+import asyncio
+from typing import AsyncIterator, List, Tuple
+
+import httpx
+
+from ai_agents.utils.llm_client import ResilientTransport
+
+
+class _StubBody(httpx.AsyncByteStream):
+    def __init__(self, stub: "StubTransport", chunks: List[bytes], first_chunk_delay: float):
+        self._stub = stub
+        self._chunks = chunks
+        self._first_chunk_delay = first_chunk_delay
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        await asyncio.sleep(self._first_chunk_delay)
+        for chunk in self._chunks:
+            yield chunk
+
+    async def aclose(self) -> None:
+        self._stub.closed += 1
+
+
+class StubTransport(httpx.AsyncBaseTransport):
+    """
+    Fake model API: each request gets the next scripted (status, first chunk delay, body) reply.
+
+    Headers come back at once and the body's first chunk after the delay, like a streamed
+    response whose first token is slow. Opened and closed responses are counted.
+    """
+
+    def __init__(self, script: List[tuple]):
+        self.script = list(script)
+        self.calls = 0
+        self.opened = 0
+        self.closed = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        status, first_chunk_delay, body = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        self.opened += 1
+        headers = {"retry-after": "0"} if status == 429 else {}
+        return httpx.Response(status, headers=headers, stream=_StubBody(self, [body], first_chunk_delay))
+
+
+def _hedging_transport(stub: StubTransport, hedge_after: float = 0.05) -> ResilientTransport:
+    transport = ResilientTransport(stub, max_retries=2, hedge_enabled=True, hedge_min_samples=1, hedge_min_delay=hedge_after)
+    # Seed the first-byte history so the next request hedges after `hedge_after`
+    transport._first_byte_seconds.append(0.001)
+    return transport
+
+
+async def _read(transport: ResilientTransport) -> Tuple[int, bytes]:
+    response = await transport.handle_async_request(httpx.Request("POST", "http://stub/v1/responses"))
+    body = b"".join([chunk async for chunk in response.stream])
+    await response.stream.aclose()
+    return response.status_code, body
+
+
+def test_retries_429_then_succeeds():
+    stub = StubTransport([(429, 0, b"slow down"), (200, 0, b"ok")])
+    transport = ResilientTransport(stub, max_retries=2)
+
+    assert asyncio.run(_read(transport)) == (200, b"ok")
+    assert stub.calls == 2
+    assert stub.opened == stub.closed
+
+
+def test_gives_up_after_max_retries():
+    stub = StubTransport([(429, 0, b"slow down")])
+    transport = ResilientTransport(stub, max_retries=1)
+
+    assert asyncio.run(_read(transport)) == (429, b"slow down")
+    assert stub.calls == 2
+    assert stub.opened == stub.closed
+
+
+def test_hedge_wins_and_slow_primary_is_closed():
+    stub = StubTransport([(200, 5.0, b"primary"), (200, 0, b"hedge")])
+
+    assert asyncio.run(_read(_hedging_transport(stub))) == (200, b"hedge")
+    assert stub.calls == 2
+    assert stub.opened == stub.closed
+
+
+def test_primary_wins_and_hedge_is_closed():
+    stub = StubTransport([(200, 0.2, b"primary"), (200, 5.0, b"hedge")])
+
+    assert asyncio.run(_read(_hedging_transport(stub))) == (200, b"primary")
+    assert stub.calls == 2
+    assert stub.opened == stub.closed
+
+
+def test_cancelled_caller_closes_primary_and_hedge():
+    stub = StubTransport([(200, 5.0, b"primary"), (200, 5.0, b"hedge")])
+
+    async def cancel_mid_hedge():
+        task = asyncio.create_task(_read(_hedging_transport(stub)))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # Checked before asyncio.run() tears down the loop, which would cancel leftover requests itself
+        return stub.calls, stub.opened, stub.closed
+
+    assert asyncio.run(cancel_mid_hedge()) == (2, 2, 2)
+
+
+def test_cancelled_caller_closes_arrived_response():
+    # The primary's headers and first chunk arrive just as the caller is cancelled
+    stub = StubTransport([(200, 0.1, b"primary"), (200, 5.0, b"hedge")])
+
+    async def cancel_at_first_chunk():
+        task = asyncio.create_task(_read(_hedging_transport(stub)))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return stub.opened, stub.closed
+
+    opened, closed = asyncio.run(cancel_at_first_chunk())
+    assert opened == closed
@@ -13,13 +13,22 @@ const ChatPanel = ({ user }) => {
   const [isLoading, setIsLoading] = useState(false);
   const [isLoadingHistory, setIsLoadingHistory] = useState(true);
   const [streamingMessage, setStreamingMessage] = useState('');
+  const [streamingArtifacts, setStreamingArtifacts] = useState([]);
+  const [nextBefore, setNextBefore] = useState(null);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
   const messagesEndRef = useRef(null);
+  // Set when messages change without a new message at the bottom (older page, expanded response)
+  const skipScrollRef = useRef(false);
 
   useEffect(() => {
     fetchChatHistory();
   }, []);
 
   useEffect(() => {
+    if (skipScrollRef.current) {
+      skipScrollRef.current = false;
+      return;
+    }
     scrollToBottom();
   }, [messages, streamingMessage]);
 
@@ -27,14 +36,16 @@ const ChatPanel = ({ user }) => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   };
 
-  const fetchChatHistory = async () => {
+  // History pages are newest first and hold previews; full responses are fetched on demand
+  const fetchChatHistory = async (before = null) => {
     try {
       const token = localStorage.getItem('token');
       const response = await axios.get('/api/chat/history', {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}` },
+        params: before ? { before } : {}
       });
       
-      const formattedMessages = response.data.flatMap(chat => [
+      const formattedMessages = [...response.data.messages].reverse().flatMap(chat => [
         {
           id: `${chat.id}-user`,
           text: chat.message,
@@ -43,13 +54,22 @@ const ChatPanel = ({ user }) => {
         },
         {
           id: `${chat.id}-ai`,
-          text: chat.response,
+          chatId: chat.id,
+          text: chat.preview,
           sender: 'ai',
-          timestamp: chat.created_at
+          timestamp: chat.created_at,
+          artifacts: [],
+          truncated: chat.truncated || chat.has_artifacts
         }
       ]);
       
-      setMessages(formattedMessages);
+      if (before) {
+        skipScrollRef.current = true;
+        setMessages(prev => [...formattedMessages, ...prev]);
+      } else {
+        setMessages(formattedMessages);
+      }
+      setNextBefore(response.data.next_before);
     } catch (error) {
       console.error('Error fetching chat history:', error);
     } finally {
@@ -57,9 +77,34 @@ const ChatPanel = ({ user }) => {
     }
   };
 
+  const loadOlderMessages = async () => {
+    setIsLoadingOlder(true);
+    await fetchChatHistory(nextBefore);
+    setIsLoadingOlder(false);
+  };
+
+  const expandMessage = async (message) => {
+    try {
+      const token = localStorage.getItem('token');
+      const response = await axios.get(`/api/chat/messages/${message.chatId}`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      
+      skipScrollRef.current = true;
+      setMessages(prev => prev.map(m => m.id === message.id
+        ? { ...m, text: response.data.response, artifacts: response.data.artifacts, truncated: false }
+        : m
+      ));
+    } catch (error) {
+      console.error('Error fetching chat message:', error);
+    }
+  };
+
   const startNewChat = () => {
     setMessages([]);
+    setNextBefore(null);
     setStreamingMessage('');
+    setStreamingArtifacts([]);
     setInputMessage('');
     setIsLoading(false);
   };
@@ -81,6 +126,7 @@ const ChatPanel = ({ user }) => {
     setInputMessage('');
     setIsLoading(true);
     setStreamingMessage('');
+    setStreamingArtifacts([]);
 
     // Set a timeout to prevent infinite loading
     const timeoutId = setTimeout(() => {
@@ -124,6 +170,7 @@ const ChatPanel = ({ user }) => {
       const reader = response.body.getReader();
       const decoder = new TextDecoder();
       let accumulatedResponse = '';
+      let artifacts = [];
       let buffer = '';
       let hasReceivedData = false;
 
@@ -175,13 +222,19 @@ const ChatPanel = ({ user }) => {
                       id: data.message_id || Date.now() + 1,
                       text: filterJsonContent(accumulatedResponse) || 'No response received',
                       sender: 'ai',
-                      timestamp: data.created_at || new Date().toISOString()
+                      timestamp: data.created_at || new Date().toISOString(),
+                      artifacts
                     };
                     
                     setMessages(prev => [...prev, aiMessage]);
                     setStreamingMessage('');
+                    setStreamingArtifacts([]);
                     setIsLoading(false);
                     return; // Exit the function
+                  } else if (data.artifact) {
+                    // Tables/series from the analysis are rendered directly, not re-typed by the model
+                    artifacts = [...artifacts, data.artifact];
+                    setStreamingArtifacts(artifacts);
                   } else if (data.chunk) {
                     // Update streaming message
                     accumulatedResponse += data.chunk;
@@ -211,11 +264,13 @@ const ChatPanel = ({ user }) => {
             id: Date.now() + 1,
             text: accumulatedResponse,
             sender: 'ai',
-            timestamp: new Date().toISOString()
+            timestamp: new Date().toISOString(),
+            artifacts
           };
           
           setMessages(prev => [...prev, aiMessage]);
           setStreamingMessage('');
+          setStreamingArtifacts([]);
           setIsLoading(false);
         } else {
           // No data received at all
@@ -295,6 +350,49 @@ const ChatPanel = ({ user }) => {
     });
   };
 
+  const formatCell = (value) => {
+    if (value === null || value === undefined) return '';
+    if (typeof value === 'number') {
+      return value.toLocaleString('en-US', { maximumFractionDigits: 2 });
+    }
+    return String(value);
+  };
+
+  // Render a table or series artifact streamed from the analysis tool
+  const renderArtifact = (artifact) => {
+    const columns = artifact.kind === 'series' ? ['', artifact.name] : artifact.columns;
+    const rows = artifact.kind === 'series'
+      ? artifact.index.map((label, i) => [label, artifact.values[i]])
+      : artifact.rows;
+
+    return (
+      <div key={artifact.id} className="message-text artifact">
+        {artifact.title && <div className="artifact-title">{artifact.title}</div>}
+        <div className="artifact-scroll">
+          <table className="markdown-table">
+            <thead>
+              <tr>
+                {columns.map((column, i) => <th key={i}>{column}</th>)}
+              </tr>
+            </thead>
+            <tbody>
+              {rows.map((row, i) => (
+                <tr key={i}>
+                  {row.map((value, j) => (
+                    <td key={j} className={typeof value === 'number' ? 'numeric' : ''}>{formatCell(value)}</td>
+                  ))}
+                </tr>
+              ))}
+            </tbody>
+          </table>
+        </div>
+        {artifact.truncated && (
+          <div className="artifact-note">Showing {rows.length} of {artifact.total_rows} rows</div>
+        )}
+      </div>
+    );
+  };
+
   // Custom components for markdown rendering
   const MarkdownComponents = {
     code({ node, inline, className, children, ...props }) {
@@ -359,7 +457,7 @@ const ChatPanel = ({ user }) => {
       </div>
 
       <div className="chat-messages">
-        {messages.length === 0 && !streamingMessage ? (
+        {messages.length === 0 && !streamingMessage && streamingArtifacts.length === 0 ? (
           <div className="empty-chat">
             <Bot size={48} className="empty-chat-icon" />
             <p>Start a conversation with Banksie!</p>
@@ -380,6 +478,11 @@ const ChatPanel = ({ user }) => {
           </div>
         ) : (
           <>
+            {nextBefore && (
+              <button onClick={loadOlderMessages} disabled={isLoadingOlder} className="load-older-button">
+                {isLoadingOlder ? 'Loading...' : 'Load earlier messages'}
+              </button>
+            )}
             {messages.map((message) => (
               <div
                 key={message.id}
@@ -393,6 +496,7 @@ const ChatPanel = ({ user }) => {
                   )}
                 </div>
                 <div className="message-content">
+                  {message.artifacts && message.artifacts.map(renderArtifact)}
                   <div className="message-text">
                     <ReactMarkdown
                       remarkPlugins={[remarkGfm]}
@@ -401,6 +505,11 @@ const ChatPanel = ({ user }) => {
                       {message.text}
                     </ReactMarkdown>
                   </div>
+                  {message.truncated && (
+                    <button onClick={() => expandMessage(message)} className="show-full-button">
+                      Show full response
+                    </button>
+                  )}
                   <div className="message-time">
                     {formatTime(message.timestamp)}
                   </div>
@@ -409,12 +518,13 @@ const ChatPanel = ({ user }) => {
             ))}
             
             {/* Streaming message */}
-            {streamingMessage && (
+            {(streamingMessage || streamingArtifacts.length > 0) && (
               <div className="message ai streaming">
                 <div className="message-avatar">
                   <Bot size={18} />
                 </div>
                 <div className="message-content">
+                  {streamingArtifacts.map(renderArtifact)}
                   <div className="message-text">
                     <ReactMarkdown
                       remarkPlugins={[remarkGfm]}
@@ -429,7 +539,7 @@ const ChatPanel = ({ user }) => {
             )}
             
             {/* Typing indicator when loading but no streaming content yet */}
-            {isLoading && !streamingMessage && (
+            {isLoading && !streamingMessage && streamingArtifacts.length === 0 && (
               <div className="message ai typing">
                 <div className="message-avatar">
                   <Bot size={18} />
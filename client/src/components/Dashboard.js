@@ -1,19 +1,112 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import DataTable from './DataTable';
 import ChatPanel from './ChatPanel';
 import Header from './Header';
 import './Dashboard.css';
 
+// Same order as /api/data: newest first
+const newestFirst = (a, b) =>
+  a.transaction_date === b.transaction_date
+    ? b.id - a.id
+    : (a.transaction_date < b.transaction_date ? 1 : -1);
+
+// Apply a /api/data/changes delta to the local copy (upserts are current rows, so replays are harmless)
+const applyChanges = (rows, delta) => {
+  const byId = new Map(rows.map((row) => [row.id, row]));
+  delta.deletes.forEach((id) => byId.delete(id));
+  delta.upserts.forEach((row) => byId.set(row.id, row));
+  return Array.from(byId.values()).sort(newestFirst);
+};
+
+const STREAM_RETRY_MS = 5000;
+
 const Dashboard = ({ user, onLogout }) => {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  // Change sequence the local copy is at; null until the first full fetch
+  const seqRef = useRef(null);
+  const streamRef = useRef(null);
 
   useEffect(() => {
     fetchData();
+    return () => streamRef.current?.abort();
   }, []);
 
+  const applyDelta = (delta) => {
+    if (delta.resync) {
+      // Too far behind the change log: reload everything
+      fetchData();
+      return;
+    }
+    if (delta.upserts.length || delta.deletes.length) {
+      setData((rows) => applyChanges(rows, delta));
+    }
+    seqRef.current = delta.seq;
+  };
+
+  // Push channel: server-sent deltas, read with fetch so the bearer token can be sent
+  const startChangeStream = async () => {
+    streamRef.current?.abort();
+    const controller = new AbortController();
+    streamRef.current = controller;
+
+    try {
+      const token = localStorage.getItem('token');
+      const response = await fetch(`/api/data/changes/stream?since=${seqRef.current}`, {
+        headers: { Authorization: `Bearer ${token}` },
+        signal: controller.signal
+      });
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const event of events) {
+          if (!event.startsWith('data: ')) continue;
+          const delta = JSON.parse(event.slice(6));
+          applyDelta(delta);
+          if (delta.resync) return;
+        }
+      }
+    } catch (error) {
+      if (controller.signal.aborted) return;
+      console.error('Change stream error:', error.message);
+    }
+
+    // Dropped connection: catch up by polling once, then reconnect
+    if (!controller.signal.aborted) {
+      setTimeout(() => {
+        if (streamRef.current === controller) {
+          syncChanges().then(startChangeStream);
+        }
+      }, STREAM_RETRY_MS);
+    }
+  };
+
+  const syncChanges = async () => {
+    try {
+      const token = localStorage.getItem('token');
+      const response = await axios.get('/api/data/changes', {
+        params: { since: seqRef.current },
+        headers: { Authorization: `Bearer ${token}` },
+        timeout: 10000
+      });
+      applyDelta(response.data);
+    } catch (error) {
+      console.error('Error syncing changes:', error.message);
+    }
+  };
+
   const fetchData = async () => {
     try {
       const token = localStorage.getItem('token');
@@ -28,6 +121,12 @@ const Dashboard = ({ user, onLogout }) => {
       setData(response.data);
       setError(''); // Clear any previous errors
       
+      const seq = response.headers['x-change-seq'];
+      if (seq !== undefined) {
+        seqRef.current = Number(seq);
+        startChangeStream();
+      }
+      
     } catch (error) {
       console.error('Detailed error fetching data:', {
         message: error.message,
@@ -71,6 +170,11 @@ const Dashboard = ({ user, onLogout }) => {
   };
 
   const refreshData = () => {
+    // With a synced copy only the changes are fetched
+    if (seqRef.current !== null && !error) {
+      syncChanges();
+      return;
+    }
     setLoading(true);
     fetchData();
   };
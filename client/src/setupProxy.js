@@ -11,6 +11,7 @@ module.exports = function(app) {
     createProxyMiddleware({
       target: target,
       changeOrigin: true,
+      xfwd: true, // Send X-Forwarded-For so the backend sees each browser's address, not the proxy's
       ws: true, // Enable WebSocket proxying
       logLevel: 'debug',
       onError: (err, req, res) => {